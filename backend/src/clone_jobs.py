@@ -0,0 +1,280 @@
+"""Background clone jobs with progress reporting."""
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional
+from urllib.parse import urlparse
+from git import RemoteProgress
+from src.config import config
+from src.github_client import github_client
+
+# Human readable names of GitPython progress stages
+STAGE_NAMES = {
+    RemoteProgress.COUNTING: 'counting',
+    RemoteProgress.COMPRESSING: 'compressing',
+    RemoteProgress.WRITING: 'writing',
+    RemoteProgress.RECEIVING: 'receiving',
+    RemoteProgress.RESOLVING: 'resolving',
+    RemoteProgress.FINDING_SOURCES: 'finding sources',
+    RemoteProgress.CHECKING_OUT: 'checking out'
+}
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+
+class CloneQueueFull(Exception):
+    """Raised when the clone queue has no room for another job."""
+
+
+class CloneJob:
+    """State of a single background clone."""
+    
+    def __init__(self, url: str, owner: str, repo: str, force: bool, options: Dict[str, Any],
+                 kind: str = 'clone'):
+        self.id = uuid.uuid4().hex
+        # 'clone', or 'rehydrate' to restore an evicted repository from its manifest
+        self.kind = kind
+        self.url = url
+        self.owner = owner
+        self.repo = repo
+        self.force = force
+        self.options = options
+        self.status = 'queued'
+        self.stage = None
+        self.progress = 0.0
+        self.message = ''
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        # Incremented on every change so event streams can wait for updates
+        self.version = 0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert job to a JSON-serializable dictionary."""
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'url': self.url,
+            'owner': self.owner,
+            'repo': self.repo,
+            'options': self.options,
+            'status': self.status,
+            'stage': self.stage,
+            'progress': round(self.progress, 1),
+            'message': self.message,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+
+
+class _JobProgress(RemoteProgress):
+    """Forwards GitPython clone progress to a job."""
+    
+    def __init__(self, manager: 'CloneJobManager', job: CloneJob):
+        super().__init__()
+        self.manager = manager
+        self.job = job
+    
+    def update(self, op_code, cur_count, max_count=None, message=''):
+        stage = STAGE_NAMES.get(op_code & RemoteProgress.OP_MASK, self.job.stage)
+        percent = None
+        if max_count:
+            percent = min(float(cur_count) / float(max_count) * 100, 100.0)
+        self.manager._update(self.job, stage=stage, progress=percent, message=message or None)
+
+
+class CloneJobManager:
+    """Bounded pool of background clone workers.
+    
+    At most ``clone.max_workers`` clones run at once and at most
+    ``clone.per_host_limit`` of them against the same host. Requests for a
+    repository that already has an active job get that job back instead of
+    starting a second clone. Finished jobs are kept for
+    ``clone.job_retention`` seconds so clients can read their outcome.
+    """
+    
+    def __init__(self):
+        """Initialize clone job manager with configuration."""
+        self.max_workers = config.get('clone.max_workers', 2)
+        self.max_pending = config.get('clone.max_pending', 20)
+        self.per_host_limit = config.get('clone.per_host_limit', 2)
+        self.job_retention = config.get('clone.job_retention', 3600)
+        
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='clone')
+        self._jobs: Dict[str, CloneJob] = {}
+        self._active: Dict[str, str] = {}
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._changed = threading.Condition()
+    
+    @staticmethod
+    def _host(url: str) -> str:
+        """Get the host a clone URL points at."""
+        if url.startswith('git@'):
+            return url[4:].split(':', 1)[0]
+        return urlparse(url).hostname or ''
+    
+    def _host_slot(self, host: str) -> threading.BoundedSemaphore:
+        """Get the semaphore limiting concurrent clones from a host."""
+        with self._changed:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return slot
+    
+    def _prune(self) -> None:
+        """Forget finished jobs older than the retention period."""
+        cutoff = time.time() - self.job_retention
+        for job_id, job in list(self._jobs.items()):
+            if job.finished_at and job.finished_at < cutoff:
+                del self._jobs[job_id]
+    
+    def _update(self, job: CloneJob, **changes) -> None:
+        """Apply changes to a job and wake anyone waiting on it."""
+        with self._changed:
+            for name, value in changes.items():
+                if value is not None:
+                    setattr(job, name, value)
+            job.version += 1
+            self._changed.notify_all()
+    
+    def submit(self, url: str, force: bool = False, options: Optional[Dict[str, Any]] = None) -> CloneJob:
+        """Queue a clone, or get the active job cloning the same repository.
+        
+        Args:
+            url: GitHub repository URL
+            force: Whether to overwrite existing repository
+            options: Clone options resolved by GitHubClient.clone_options
+        
+        Returns:
+            The queued or already active job
+        
+        Raises:
+            ValueError: If the URL is not a GitHub repository URL
+            CloneQueueFull: If too many jobs are already waiting
+        """
+        owner, repo = github_client.parse_github_url(url)
+        options = options or github_client.clone_options()
+        return self._enqueue(CloneJob(url, owner, repo, force, options))
+    
+    def rehydrate(self, owner: str, repo: str) -> CloneJob:
+        """Queue restoring an evicted repository, or get the active job for it.
+        
+        Args:
+            owner: Repository owner
+            repo: Repository name
+        
+        Returns:
+            The queued or already active job
+        
+        Raises:
+            CloneQueueFull: If too many jobs are already waiting
+        """
+        url = f'https://github.com/{owner}/{repo}'
+        return self._enqueue(CloneJob(url, owner, repo, False, {}, kind='rehydrate'))
+    
+    def _enqueue(self, job: CloneJob) -> CloneJob:
+        """Queue a job unless the same repository already has an active one."""
+        key = f'{job.owner}/{job.repo}'.lower()
+        
+        with self._changed:
+            self._prune()
+            
+            active_id = self._active.get(key)
+            if active_id and self._jobs[active_id].status in ACTIVE_STATUSES:
+                return self._jobs[active_id]
+            
+            pending = sum(1 for job in self._jobs.values() if job.status in ACTIVE_STATUSES)
+            if pending >= self.max_pending:
+                raise CloneQueueFull(f'Too many clone jobs in progress ({pending})')
+            
+            self._jobs[job.id] = job
+            self._active[key] = job.id
+        
+        self._executor.submit(self._run, job, key)
+        return job
+    
+    def _run(self, job: CloneJob, key: str) -> None:
+        """Run a clone job on a worker thread."""
+        slot = self._host_slot(self._host(job.url))
+        try:
+            with slot:
+                self._update(job, status='running', started_at=time.time(), message='Cloning')
+                if job.kind == 'rehydrate':
+                    result = github_client.rehydrate_repository(job.owner, job.repo,
+                                                                progress=_JobProgress(self, job))
+                else:
+                    result = github_client.clone_repository(
+                        job.url,
+                        force=job.force,
+                        progress=_JobProgress(self, job),
+                        depth=job.options['depth'],
+                        filter_spec=job.options['filter'],
+                        sparse_paths=job.options['sparse_paths'],
+                        shared_objects=job.options['shared_objects'],
+                        dissociate=job.options['dissociate']
+                    )
+            
+            if result.get('success'):
+                self._update(job, status='succeeded', progress=100.0, result=result,
+                             message=result.get('message'), finished_at=time.time())
+            else:
+                self._update(job, status='failed', error=result.get('error'),
+                             message='Clone failed', finished_at=time.time())
+        except Exception as e:
+            self._update(job, status='failed', error=f'Failed to clone repository: {str(e)}',
+                         message='Clone failed', finished_at=time.time())
+        finally:
+            with self._changed:
+                if self._active.get(key) == job.id:
+                    del self._active[key]
+    
+    def get(self, job_id: str) -> Optional[CloneJob]:
+        """Get a job by id.
+        
+        Args:
+            job_id: Job identifier
+        
+        Returns:
+            The job, or None if unknown or pruned
+        """
+        with self._changed:
+            return self._jobs.get(job_id)
+    
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        """Get all retained jobs, newest first.
+        
+        Returns:
+            List of job dictionaries
+        """
+        with self._changed:
+            self._prune()
+            jobs = sorted(self._jobs.values(), key=lambda job: job.created_at, reverse=True)
+            return [job.to_dict() for job in jobs]
+    
+    def wait_for_change(self, job: CloneJob, version: int, timeout: float) -> Dict[str, Any]:
+        """Wait until a job changes past a version.
+        
+        Args:
+            job: Job to watch
+            version: Last version the caller has seen
+            timeout: Maximum seconds to wait
+        
+        Returns:
+            Job dictionary including its current 'version'
+        """
+        with self._changed:
+            self._changed.wait_for(lambda: job.version != version, timeout=timeout)
+            snapshot = job.to_dict()
+            snapshot['version'] = job.version
+            return snapshot
+
+
+# Global clone job manager instance
+clone_jobs = CloneJobManager()
@@ -0,0 +1,183 @@
+"""Response cache for identical chat completions."""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Tuple
+from src.config import config
+
+
+class CompletionCache:
+    """LRU + TTL cache of chat completion responses.
+    
+    The in-memory tier is bounded by ``chat_cache.max_bytes`` of serialized
+    responses. When ``chat_cache.persistent_path`` is set, entries are also
+    written to an SQLite file so they survive restarts; disk hits are
+    promoted back into memory.
+    """
+    
+    def __init__(self):
+        """Initialize completion cache with configuration."""
+        self.enabled = config.get('chat_cache.enabled', False)
+        self.ttl = config.get('chat_cache.ttl', 3600)
+        self.max_bytes = config.get('chat_cache.max_bytes', 32 * 1024 * 1024)
+        self.persistent_path = config.get('chat_cache.persistent_path', '') if self.enabled else ''
+        
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        
+        if self.enabled and self.persistent_path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.persistent_path)), exist_ok=True)
+            self._execute(
+                'CREATE TABLE IF NOT EXISTS completions ('
+                'key TEXT PRIMARY KEY, expires_at REAL NOT NULL, response TEXT NOT NULL)'
+            )
+    
+    def _execute(self, sql: str, params: tuple = ()) -> List[tuple]:
+        """Run a statement against the persistent tier and commit."""
+        conn = sqlite3.connect(self.persistent_path, timeout=30)
+        try:
+            rows = conn.execute(sql, params).fetchall()
+            conn.commit()
+            return rows
+        finally:
+            conn.close()
+    
+    @staticmethod
+    def make_key(
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: int
+    ) -> str:
+        """Build the cache key of a completion request.
+        
+        Message content is normalized (line endings, surrounding
+        whitespace) so cosmetic differences still hit the cache.
+        
+        Args:
+            messages: List of message objects with 'role' and 'content'
+            model: Model identifier
+            temperature: Sampling temperature
+            max_tokens: Maximum tokens in response
+        
+        Returns:
+            Hex digest identifying the request
+        """
+        normalized = [
+            {'role': msg['role'], 'content': msg['content'].replace('\r\n', '\n').strip()}
+            for msg in messages
+        ]
+        payload = json.dumps({
+            'messages': normalized,
+            'model': model,
+            'temperature': temperature,
+            'max_tokens': max_tokens
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def _store_memory(self, key: str, expires_at: float, serialized: str) -> None:
+        """Insert an entry into the memory tier and evict down to max_bytes."""
+        old = self._entries.pop(key, None)
+        if old:
+            self._size -= len(old[1])
+        
+        if len(serialized) > self.max_bytes:
+            return
+        
+        self._entries[key] = (expires_at, serialized)
+        self._size += len(serialized)
+        while self._size > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get a cached response.
+        
+        Args:
+            key: Cache key from make_key
+        
+        Returns:
+            Cached response dictionary, or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return json.loads(entry[1])
+            if entry:
+                self._entries.pop(key)
+                self._size -= len(entry[1])
+        
+        if self.persistent_path:
+            rows = self._execute(
+                'SELECT expires_at, response FROM completions WHERE key = ? AND expires_at > ?',
+                (key, now)
+            )
+            if rows:
+                row = rows[0]
+                with self._lock:
+                    self._store_memory(key, row[0], row[1])
+                    self.hits += 1
+                return json.loads(row[1])
+        
+        with self._lock:
+            self.misses += 1
+        return None
+    
+    def put(self, key: str, response: Dict[str, Any]) -> None:
+        """Store a response.
+        
+        Args:
+            key: Cache key from make_key
+            response: Completion response dictionary
+        """
+        expires_at = time.time() + self.ttl
+        serialized = json.dumps(response, ensure_ascii=False)
+        
+        with self._lock:
+            self._store_memory(key, expires_at, serialized)
+        
+        if self.persistent_path:
+            self._execute(
+                'INSERT OR REPLACE INTO completions (key, expires_at, response) VALUES (?, ?, ?)',
+                (key, expires_at, serialized)
+            )
+            self._execute('DELETE FROM completions WHERE expires_at <= ?', (time.time(),))
+    
+    def clear(self) -> None:
+        """Remove every cached response from both tiers."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+        
+        if self.persistent_path:
+            self._execute('DELETE FROM completions')
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get cache counters.
+        
+        Returns:
+            Dictionary with hit/miss counts and memory tier size
+        """
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'bytes': self._size
+            }
+
+
+# Global completion cache instance
+completion_cache = CompletionCache()
@@ -106,6 +106,11 @@ class Config:
         """Get repositories directory."""
         return self.get('github.repos_directory', './repos')
     
+    @property
+    def index_directory(self) -> str:
+        """Get directory for per-repository search indexes."""
+        return self.get('search.index_directory') or os.path.join(self.repos_directory, '.index')
+    
     @property
     def app_host(self) -> str:
         """Get application host."""
@@ -0,0 +1,159 @@
+"""Persistent trigram index for repository content search."""
+
+import os
+import sqlite3
+from typing import List, Optional, Set
+from src.config import config
+from src.file_index import FileIndex
+
+
+class ContentIndex(FileIndex):
+    """Per-repository trigram inverted index stored next to the clone.
+    
+    Every indexed file is lowercased and split into overlapping byte
+    trigrams. A query can only match files that contain all of its own
+    trigrams, so content search opens the candidate files instead of
+    reading the whole repository.
+    """
+    
+    db_name = 'trigrams.db'
+    
+    def __init__(self):
+        """Initialize content index with configuration."""
+        super().__init__()
+        self.max_query_trigrams = config.get('search.max_query_trigrams', 16)
+    
+    def _create_schema(self, conn: sqlite3.Connection) -> None:
+        """Create the files and postings tables."""
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS files ('
+            'id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, mtime REAL, size INTEGER)'
+        )
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS postings ('
+            'trigram BLOB NOT NULL, file_id INTEGER NOT NULL, '
+            'PRIMARY KEY (trigram, file_id)) WITHOUT ROWID'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS postings_file ON postings(file_id)')
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(files)')}
+        if 'skipped' not in columns:
+            # Files too large or not UTF-8 are recorded without postings
+            conn.execute('ALTER TABLE files ADD COLUMN skipped INTEGER NOT NULL DEFAULT 0')
+    
+    @staticmethod
+    def trigrams(text: str) -> Set[bytes]:
+        """Get the distinct lowercase byte trigrams of a text.
+        
+        Args:
+            text: Text to split
+        
+        Returns:
+            Set of 3-byte trigrams
+        """
+        data = text.lower().encode('utf-8')
+        return {data[i:i + 3] for i in range(len(data) - 2)}
+    
+    def _read_trigrams(self, full_path: str) -> Optional[Set[bytes]]:
+        """Read a file and get its trigrams, or None if it cannot be indexed."""
+        max_size = config.get('filesystem.max_file_size', 10) * 1024 * 1024
+        try:
+            if os.path.getsize(full_path) > max_size:
+                return None
+            with open(full_path, 'r', encoding='utf-8') as f:
+                return self.trigrams(f.read())
+        except (OSError, UnicodeDecodeError):
+            return None
+    
+    def _index_file(self, conn: sqlite3.Connection, repo_path: str, file_path: str) -> None:
+        """Replace the postings of a single file inside an open transaction."""
+        full_path = os.path.join(repo_path, file_path)
+        row = conn.execute('SELECT id FROM files WHERE path = ?', (file_path,)).fetchone()
+        if row:
+            conn.execute('DELETE FROM postings WHERE file_id = ?', (row[0],))
+        
+        grams = self._read_trigrams(full_path)
+        try:
+            stat = os.stat(full_path)
+        except OSError:
+            if row:
+                conn.execute('DELETE FROM files WHERE id = ?', (row[0],))
+            return
+        
+        # Unindexable files keep a row so sync does not read them again until they change
+        skipped = 1 if grams is None else 0
+        if row:
+            file_id = row[0]
+            conn.execute('UPDATE files SET mtime = ?, size = ?, skipped = ? WHERE id = ?',
+                         (stat.st_mtime, stat.st_size, skipped, file_id))
+        else:
+            cursor = conn.execute('INSERT INTO files (path, mtime, size, skipped) VALUES (?, ?, ?, ?)',
+                                  (file_path, stat.st_mtime, stat.st_size, skipped))
+            file_id = cursor.lastrowid
+        
+        if grams:
+            conn.executemany('INSERT INTO postings (trigram, file_id) VALUES (?, ?)',
+                             ((gram, file_id) for gram in grams))
+    
+    def _delete_file(self, conn: sqlite3.Connection, file_path: str) -> None:
+        """Remove a file and its postings inside an open transaction."""
+        row = conn.execute('SELECT id FROM files WHERE path = ?', (file_path,)).fetchone()
+        if row:
+            conn.execute('DELETE FROM postings WHERE file_id = ?', (row[0],))
+            conn.execute('DELETE FROM files WHERE id = ?', (row[0],))
+    
+    def candidates(self, repo_path: str, query: str) -> Optional[List[str]]:
+        """Get files that may contain the query.
+        
+        Args:
+            repo_path: Path to local repository
+            query: Search text
+        
+        Returns:
+            Sorted candidate paths, including every file the index had to
+            skip, or None if the index cannot narrow the search (index not
+            ready or query shorter than a trigram)
+        """
+        if not self.is_ready(repo_path):
+            return None
+        
+        grams = list(self.trigrams(query))
+        if not grams:
+            return None
+        
+        conn = self._connect(repo_path)
+        try:
+            if len(grams) > self.max_query_trigrams:
+                grams = self._rarest(conn, grams)
+            placeholders = ','.join('?' * len(grams))
+            rows = conn.execute(
+                f'SELECT f.path FROM postings p JOIN files f ON f.id = p.file_id '
+                f'WHERE p.trigram IN ({placeholders}) '
+                f'GROUP BY p.file_id HAVING COUNT(*) = ? '
+                f'UNION SELECT path FROM files WHERE skipped = 1 ORDER BY 1',
+                (*grams, len(grams))
+            ).fetchall()
+        finally:
+            conn.close()
+        
+        return [row[0] for row in rows]
+    
+    def _rarest(self, conn: sqlite3.Connection, grams: List[bytes]) -> List[bytes]:
+        """Keep the query trigrams found in the fewest files.
+        
+        Any subset of the trigrams still finds every matching file, and the
+        rarest ones narrow the candidates the most.
+        """
+        # Long queries are sampled first so counting stays cheap too
+        step = max(1, len(grams) // (self.max_query_trigrams * 4))
+        sample = grams[::step]
+        counts = dict.fromkeys(sample, 0)
+        placeholders = ','.join('?' * len(sample))
+        for gram, count in conn.execute(
+                f'SELECT trigram, COUNT(*) FROM postings WHERE trigram IN ({placeholders}) GROUP BY trigram',
+                sample):
+            counts[gram] = count
+        return sorted(sample, key=counts.get)[:self.max_query_trigrams]
+
+
+# Global content index instance
+content_index = ContentIndex()
@@ -0,0 +1,262 @@
+"""Parallel content search over a repository's working tree."""
+
+import mmap
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, List, Any, Iterator, Optional, Tuple
+from src.config import config
+
+# Bytes inspected for NUL bytes before a file is treated as binary
+BINARY_SNIFF_BYTES = 8192
+
+
+class ContentSearcher:
+    """Scans files on a shared thread pool and yields matches as they are found.
+    
+    Files are read as bytes, memory mapped above ``search.mmap_threshold``
+    bytes, and skipped as binary when their first bytes contain a NUL.
+    ASCII queries are matched case-insensitively on the raw bytes so
+    nothing is decoded except the lines that are reported; other queries
+    are matched on the decoded text, where case folding covers all of
+    Unicode. At most ``search.max_workers`` files are scanned at once.
+    """
+    
+    def __init__(self):
+        """Initialize content searcher with configuration."""
+        self.max_workers = config.get('search.max_workers', 4)
+        self.mmap_threshold = config.get('search.mmap_threshold', 256 * 1024)
+        self.max_file_size = config.get('search.max_file_size', 64) * 1024 * 1024
+        self.max_line_length = config.get('search.max_line_length', 500)
+        self.max_lines_per_file = config.get('search.max_lines_per_file', 20)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='search')
+    
+    def _line_text(self, data, start: int, end: int) -> str:
+        """Decode a line, shortened to the maximum reported length."""
+        text = data[start:min(end, start + self.max_line_length)]
+        if not isinstance(text, str):
+            text = bytes(text).decode('utf-8', errors='replace')
+        return text.rstrip('\r')
+    
+    def _context(self, data, start: int, end: int, count: int, before: bool) -> List[str]:
+        """Get up to count lines before a line start or after a line end."""
+        newline = '\n' if isinstance(data, str) else b'\n'
+        lines = []
+        size = len(data)
+        for _ in range(count):
+            if before:
+                if start == 0:
+                    break
+                line_end = start - 1
+                start = data.rfind(newline, 0, line_end) + 1
+                lines.insert(0, self._line_text(data, start, line_end))
+            else:
+                if end >= size:
+                    break
+                line_start = end + 1
+                end = data.find(newline, line_start)
+                if end == -1:
+                    end = size
+                if line_start == size:
+                    break
+                lines.append(self._line_text(data, line_start, end))
+        return lines
+    
+    def _scan(
+        self,
+        data,
+        pattern: re.Pattern,
+        context_lines: int,
+        limit: int,
+        stop: threading.Event
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """Find the matching lines of a file's bytes or decoded text.
+        
+        Returns:
+            Records of up to limit matching lines, and the number of
+            matches in the whole file
+        """
+        is_text = isinstance(data, str)
+        newline = '\n' if is_text else b'\n'
+        matches = []
+        count = 0
+        size = len(data)
+        line_number = 1
+        counted_to = 0
+        pos = 0
+        
+        while len(matches) < limit and not stop.is_set():
+            match = pattern.search(data, pos)
+            if match is None:
+                break
+            
+            start = data.rfind(newline, 0, match.start()) + 1
+            end = data.find(newline, match.start())
+            if end == -1:
+                end = size
+            
+            line_number += data[counted_to:start].count(newline)
+            counted_to = start
+            
+            prefix = data[start:match.start()]
+            line_matches = len(pattern.findall(data, start, end))
+            count += line_matches
+            matches.append({
+                'line': line_number,
+                'column': (len(prefix) if is_text else len(prefix.decode('utf-8', errors='replace'))) + 1,
+                'matches': line_matches,
+                'text': self._line_text(data, start, end),
+                'before': self._context(data, start, end, context_lines, True),
+                'after': self._context(data, start, end, context_lines, False)
+            })
+            # One record per line, however often it matches
+            pos = end + 1
+        
+        # Past the reported lines only the matches are counted
+        if not stop.is_set():
+            count += sum(1 for _ in pattern.finditer(data, min(pos, size)))
+        
+        return matches, count
+    
+    def _search_file(
+        self,
+        repo_path: str,
+        path: str,
+        pattern: re.Pattern,
+        context_lines: int,
+        limit: int,
+        stop: threading.Event
+    ) -> Optional[Dict[str, Any]]:
+        """Search one file, returning its result record or None."""
+        if stop.is_set():
+            return None
+        
+        full_path = os.path.join(repo_path, path)
+        try:
+            size = os.path.getsize(full_path)
+            if size == 0 or size > self.max_file_size:
+                return None
+            
+            with open(full_path, 'rb') as f:
+                if b'\0' in f.read(BINARY_SNIFF_BYTES):
+                    return None
+                f.seek(0)
+                if isinstance(pattern.pattern, str):
+                    data = f.read().decode('utf-8', errors='replace')
+                    lines, count = self._scan(data, pattern, context_lines, limit, stop)
+                elif size >= self.mmap_threshold:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                        lines, count = self._scan(data, pattern, context_lines, limit, stop)
+                else:
+                    lines, count = self._scan(f.read(), pattern, context_lines, limit, stop)
+        except (OSError, ValueError):
+            return None
+        
+        if not lines:
+            return None
+        return {
+            'type': 'file',
+            'name': os.path.basename(path),
+            'path': path,
+            'size': size,
+            'matches': count,
+            'lines': lines
+        }
+    
+    def search(
+        self,
+        repo_path: str,
+        query: str,
+        paths: List[str],
+        max_results: Optional[int] = 50,
+        context_lines: int = 2,
+        max_files: Optional[int] = None,
+        max_lines_per_file: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Search files for a case-insensitive literal, yielding files as they finish.
+        
+        Args:
+            repo_path: Path to local repository
+            query: Text to search for
+            paths: Relative paths of the files to scan
+            max_results: Maximum number of matching lines to report
+                (None for no limit)
+            context_lines: Lines of context before and after each match
+            max_files: Maximum number of matching files to report (None
+                for no limit)
+            max_lines_per_file: Maximum matching lines reported per file
+                (defaults to search.max_lines_per_file)
+        
+        Yields:
+            A 'file' record with the matching lines of every file that has
+            any and its total number of matches, then a final 'done' record
+            with the totals. Files are reported in completion order, not
+            path order.
+        """
+        if query.isascii():
+            pattern = re.compile(re.escape(query.encode('utf-8')), re.IGNORECASE)
+        else:
+            # Byte patterns only fold ASCII case
+            pattern = re.compile(re.escape(query), re.IGNORECASE)
+        limit = max_lines_per_file or self.max_lines_per_file
+        if max_results is not None:
+            limit = min(limit, max_results)
+        stop = threading.Event()
+        pending = set()
+        remaining = iter(paths)
+        found = 0
+        files_found = 0
+        scanned = 0
+        
+        def submit_next() -> bool:
+            path = next(remaining, None)
+            if path is None:
+                return False
+            pending.add(self._executor.submit(
+                self._search_file, repo_path, path, pattern, context_lines, limit, stop
+            ))
+            return True
+        
+        def full() -> bool:
+            return ((max_results is not None and found >= max_results) or
+                    (max_files is not None and files_found >= max_files))
+        
+        try:
+            # Keep a bounded window of files in flight rather than queueing them all
+            for _ in range(self.max_workers * 4):
+                if not submit_next():
+                    break
+            
+            while pending and not full():
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    scanned += 1
+                    submit_next()
+                    
+                    result = future.result()
+                    if result is None or full():
+                        continue
+                    
+                    if max_results is not None:
+                        result['lines'] = result['lines'][:max_results - found]
+                    found += len(result['lines'])
+                    files_found += 1
+                    yield result
+            
+            yield {
+                'type': 'done',
+                'files_scanned': scanned,
+                'files_found': files_found,
+                'total_found': found,
+                'truncated': full()
+            }
+        finally:
+            # Also reached when the client disconnects mid-stream
+            stop.set()
+            for future in pending:
+                future.cancel()
+
+
+# Global content searcher instance
+content_search = ContentSearcher()
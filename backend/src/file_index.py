@@ -0,0 +1,224 @@
+"""Shared lifecycle of the per-repository SQLite file indexes."""
+
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Set
+from src.config import config
+
+# Paths looked up per query, below SQLite's older 999-variable limit
+LOOKUP_CHUNK = 500
+
+
+class FileIndex:
+    """Per-repository SQLite index of files, stored next to the clone.
+    
+    The ``files`` table records the mtime and size each file had when it
+    was indexed, so syncs and change batches only re-read files that
+    changed. Subclasses name the database, create the rest of the schema,
+    index and delete single files, and answer queries.
+    """
+    
+    # File name of the index database in the repository's index directory
+    db_name = ''
+    # False when the SQLite build lacks a feature the index needs
+    available = True
+    
+    def __init__(self):
+        """Initialize file index with configuration."""
+        self.index_dir = os.path.abspath(config.index_directory)
+        self._guard = threading.Lock()
+        self._locks: Dict[str, threading.Lock] = {}
+        self._ready: Set[str] = set()
+    
+    def _index_path(self, repo_path: str) -> str:
+        """Get path of the index database for a repository."""
+        return os.path.join(self.index_dir, os.path.basename(os.path.abspath(repo_path)), self.db_name)
+    
+    def _lock_for(self, repo_path: str) -> threading.Lock:
+        """Get the write lock for a repository index."""
+        key = os.path.abspath(repo_path)
+        with self._guard:
+            if key not in self._locks:
+                self._locks[key] = threading.Lock()
+            return self._locks[key]
+    
+    def _connect(self, repo_path: str) -> sqlite3.Connection:
+        """Open the index database, creating the schema if needed."""
+        db_path = self._index_path(repo_path)
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        
+        conn = sqlite3.connect(db_path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        self._create_schema(conn)
+        return conn
+    
+    def _create_schema(self, conn: sqlite3.Connection) -> None:
+        """Create the index tables, including ``files`` with path, mtime and size."""
+        raise NotImplementedError
+    
+    def _index_file(self, conn: sqlite3.Connection, repo_path: str, file_path: str) -> None:
+        """Replace the entries of a single file inside an open transaction."""
+        raise NotImplementedError
+    
+    def _delete_file(self, conn: sqlite3.Connection, file_path: str) -> None:
+        """Remove a file and its entries inside an open transaction."""
+        raise NotImplementedError
+    
+    def sync(self, repo_path: str, file_paths: List[str]) -> Dict[str, int]:
+        """Bring the index up to date with the given set of files.
+        
+        Building a fresh index is a sync against an empty database; later
+        syncs only re-read files whose mtime or size changed.
+        
+        Args:
+            repo_path: Path to local repository
+            file_paths: Relative paths of all files that should be indexed
+        
+        Returns:
+            Counts of indexed and removed files
+        """
+        if not self.available:
+            return {'updated': 0, 'removed': 0}
+        
+        with self._lock_for(repo_path):
+            conn = self._connect(repo_path)
+            try:
+                indexed = {
+                    path: (mtime, size)
+                    for path, mtime, size in conn.execute('SELECT path, mtime, size FROM files')
+                }
+                wanted = set(file_paths)
+                updated = self._update_changed(conn, repo_path, file_paths, indexed)
+                
+                removed = 0
+                for file_path in indexed:
+                    if file_path not in wanted:
+                        self._delete_file(conn, file_path)
+                        removed += 1
+                
+                conn.commit()
+            finally:
+                conn.close()
+        
+        with self._guard:
+            self._ready.add(os.path.abspath(repo_path))
+        
+        return {'updated': updated, 'removed': removed}
+    
+    def _update_changed(
+        self,
+        conn: sqlite3.Connection,
+        repo_path: str,
+        file_paths: List[str],
+        indexed: Dict[str, tuple]
+    ) -> int:
+        """Re-index the files whose mtime or size differs from the indexed one."""
+        updated = 0
+        for file_path in file_paths:
+            try:
+                stat = os.stat(os.path.join(repo_path, file_path))
+            except OSError:
+                continue
+            if indexed.get(file_path) == (stat.st_mtime, stat.st_size):
+                continue
+            self._index_file(conn, repo_path, file_path)
+            updated += 1
+        return updated
+    
+    def _indexed(self, conn: sqlite3.Connection, file_paths: List[str]) -> Dict[str, tuple]:
+        """Get the indexed mtime and size of the given files only."""
+        indexed = {}
+        for i in range(0, len(file_paths), LOOKUP_CHUNK):
+            chunk = file_paths[i:i + LOOKUP_CHUNK]
+            placeholders = ','.join('?' * len(chunk))
+            for path, mtime, size in conn.execute(
+                    f'SELECT path, mtime, size FROM files WHERE path IN ({placeholders})', chunk):
+                indexed[path] = (mtime, size)
+        return indexed
+    
+    def update_files(self, repo_path: str, file_paths: List[str]) -> int:
+        """Re-index those of the given files that changed, leaving all others alone.
+        
+        Args:
+            repo_path: Path to local repository
+            file_paths: Relative paths of files that may have changed
+        
+        Returns:
+            Number of files re-indexed
+        """
+        if not self.available or not os.path.exists(self._index_path(repo_path)):
+            return 0
+        
+        with self._lock_for(repo_path):
+            conn = self._connect(repo_path)
+            try:
+                indexed = self._indexed(conn, file_paths)
+                updated = self._update_changed(conn, repo_path, file_paths, indexed)
+                conn.commit()
+            finally:
+                conn.close()
+        return updated
+    
+    def is_ready(self, repo_path: str) -> bool:
+        """Check whether the index has been synced in this process."""
+        with self._guard:
+            return os.path.abspath(repo_path) in self._ready
+    
+    def update_file(self, repo_path: str, file_path: str) -> None:
+        """Re-index a single file after it was written.
+        
+        Args:
+            repo_path: Path to local repository
+            file_path: Relative path to file within repository
+        """
+        if not self.available or not os.path.exists(self._index_path(repo_path)):
+            return
+        
+        with self._lock_for(repo_path):
+            conn = self._connect(repo_path)
+            try:
+                self._index_file(conn, repo_path, file_path)
+                conn.commit()
+            finally:
+                conn.close()
+    
+    def remove_file(self, repo_path: str, file_path: str) -> None:
+        """Drop a deleted file, or every file below a deleted directory, from the index.
+        
+        Args:
+            repo_path: Path to local repository
+            file_path: Relative path to file or directory within repository
+        """
+        if not self.available or not os.path.exists(self._index_path(repo_path)):
+            return
+        
+        with self._lock_for(repo_path):
+            conn = self._connect(repo_path)
+            try:
+                prefix = file_path.rstrip('/') + '/'
+                rows = conn.execute('SELECT path FROM files WHERE path = ? OR substr(path, 1, ?) = ?',
+                                    (file_path, len(prefix), prefix)).fetchall()
+                for row in rows:
+                    self._delete_file(conn, row[0])
+                conn.commit()
+            finally:
+                conn.close()
+    
+    def drop(self, repo_path: str) -> None:
+        """Delete the whole index of a repository.
+        
+        Args:
+            repo_path: Path to local repository
+        """
+        db_path = self._index_path(repo_path)
+        with self._lock_for(repo_path):
+            for suffix in ('', '-wal', '-shm'):
+                try:
+                    os.remove(db_path + suffix)
+                except FileNotFoundError:
+                    pass
+        
+        with self._guard:
+            self._ready.discard(os.path.abspath(repo_path))
@@ -0,0 +1,513 @@
+"""In-memory file tree cache for local repositories."""
+
+import bisect
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Any, Optional, Tuple
+from src.config import config
+
+# Directory entries never shown in the file tree
+IGNORED_NAMES = {'node_modules', '__pycache__', '.git', 'venv', 'env'}
+VISIBLE_DOTFILES = {'.gitignore', '.env'}
+
+# (name, is_directory, size)
+Entry = Tuple[str, bool, Optional[int]]
+
+# (version, 'added'|'removed'|'resized', path, is_directory, size)
+Change = Tuple[int, str, str, bool, Optional[int]]
+
+
+def page_listing(
+    entries: List[Entry],
+    cursor: Optional[str],
+    limit: int,
+    child_count: Callable[[str], Optional[int]]
+) -> Dict[str, Any]:
+    """Cut one page out of a sorted directory listing.
+    
+    Args:
+        entries: Directory entries sorted by name
+        cursor: Name of the last entry of the previous page, if any
+        limit: Maximum number of entries on the page
+        child_count: Number of visible children of a subdirectory name
+    
+    Returns:
+        Dictionary with the page's (name, is_directory, size, children)
+        rows, directory totals and the cursor of the next page (None on
+        the last page)
+    """
+    start = 0
+    if cursor:
+        start = bisect.bisect_right([entry[0] for entry in entries], cursor)
+    page = entries[start:start + limit]
+    
+    directories = sum(1 for entry in entries if entry[1])
+    return {
+        'rows': [
+            (name, is_dir, size, child_count(name) if is_dir else None)
+            for name, is_dir, size in page
+        ],
+        'total': len(entries),
+        'directories': directories,
+        'files': len(entries) - directories,
+        'next_cursor': page[-1][0] if page and start + limit < len(entries) else None
+    }
+
+
+def encode_compact(file_tree: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Encode a flat file tree as parent-index rows instead of full paths.
+    
+    Args:
+        file_tree: Flat file tree in traversal order, parents first
+    
+    Returns:
+        Dictionary with the row 'fields' and the 'entries' rows; 'parent'
+        is the row index of the containing directory, or -1 at the root
+    """
+    index_of: Dict[str, int] = {}
+    rows = []
+    for item in file_tree:
+        path = item['path'].replace(os.sep, '/')
+        parent = path.rpartition('/')[0]
+        is_dir = item['type'] == 'directory'
+        if is_dir:
+            index_of[path] = len(rows)
+        rows.append([index_of.get(parent, -1), item['name'], int(is_dir), item['size']])
+    return {'fields': ['parent', 'name', 'directory', 'size'], 'entries': rows}
+
+
+class _RepoTree:
+    """Cached directory listings of a single repository."""
+    
+    def __init__(self, root: str, max_changes: int, version: int):
+        self.root = root
+        self.listings: Dict[str, Tuple[int, List[Entry]]] = {}
+        self.flattened: Dict[int, List[Dict[str, Any]]] = {}
+        self.validated_at = 0.0
+        self.version = version
+        # Deltas can be served to clients at any version from here on
+        self.oldest_version = self.version
+        self.changes: "deque[Change]" = deque(maxlen=max_changes)
+
+
+class FileTreeCache:
+    """Per-repository file tree cache built from ``os.scandir`` results.
+    
+    Each directory listing is stored with the directory's mtime. Listings
+    are revalidated at most every ``filesystem.tree_revalidate_interval``
+    seconds, and only directories whose mtime changed are scanned again.
+    Writes and deletes made through the backend update the cache directly.
+    
+    Every change to a cached listing bumps the repository's tree version
+    and is kept in a bounded log (``filesystem.tree_change_log`` entries),
+    so clients holding the tree at some version can catch up with the
+    entries added, removed and resized since.
+    """
+    
+    def __init__(self):
+        """Initialize file tree cache with configuration."""
+        self.revalidate_interval = config.get('filesystem.tree_revalidate_interval', 2)
+        self.max_changes = config.get('filesystem.tree_change_log', 2000)
+        self._last_version = 0
+        self._trees: Dict[str, _RepoTree] = {}
+        self._lock = threading.RLock()
+    
+    @staticmethod
+    def should_include(name: str, is_dir: bool) -> bool:
+        """Check if a directory entry belongs in the file tree."""
+        if name.startswith('.') and name not in VISIBLE_DOTFILES:
+            return False
+        if name in IGNORED_NAMES:
+            return False
+        if is_dir:
+            return True
+        
+        allowed_extensions = config.get('filesystem.allowed_extensions', [])
+        if not allowed_extensions:
+            return True
+        
+        _, ext = os.path.splitext(name)
+        return ext.lower() in allowed_extensions
+    
+    def _scan(self, tree: _RepoTree, rel_dir: str) -> Optional[List[Entry]]:
+        """Scan a directory and store its listing."""
+        dir_path = os.path.join(tree.root, rel_dir) if rel_dir else tree.root
+        entries: List[Entry] = []
+        
+        try:
+            mtime = os.stat(dir_path).st_mtime_ns
+            with os.scandir(dir_path) as it:
+                for entry in it:
+                    try:
+                        is_dir = entry.is_dir()
+                        if not is_dir and not entry.is_file():
+                            continue
+                        if not self.should_include(entry.name, is_dir):
+                            continue
+                        size = None if is_dir else entry.stat().st_size
+                    except OSError:
+                        # Skip files that can't be accessed
+                        continue
+                    entries.append((entry.name, is_dir, size))
+        except OSError:
+            # Skip directories that vanished or lack permission
+            tree.listings.pop(rel_dir, None)
+            return None
+        
+        entries.sort()
+        self._store(tree, rel_dir, mtime, entries)
+        return entries
+    
+    def _subtree_added(self, tree: _RepoTree, rel_dir: str, version: int) -> None:
+        """Log the contents of a new directory as added."""
+        if rel_dir.count(os.sep) >= 10:
+            return
+        entries = self._listing(tree, rel_dir)
+        for name, is_dir, size in entries or []:
+            item_relative = os.path.join(rel_dir, name)
+            tree.changes.append((version, 'added', item_relative, is_dir, size))
+            if is_dir:
+                self._subtree_added(tree, item_relative, version)
+    
+    def _store(self, tree: _RepoTree, rel_dir: str, mtime: int, entries: List[Entry]) -> None:
+        """Store a directory listing, logging how it differs from the cached one."""
+        old = tree.listings.get(rel_dir)
+        tree.listings[rel_dir] = (mtime, entries)
+        if old is None:
+            # First listing of the directory, nothing a client could hold
+            return
+        
+        before = {name: (is_dir, size) for name, is_dir, size in old[1]}
+        after = {name: (is_dir, size) for name, is_dir, size in entries}
+        if before == after:
+            return
+        
+        tree.version += 1
+        version = tree.version
+        for name, (is_dir, size) in before.items():
+            if name not in after or after[name][0] != is_dir:
+                item_relative = os.path.join(rel_dir, name)
+                tree.changes.append((version, 'removed', item_relative, is_dir, size))
+                if is_dir:
+                    prefix = item_relative + os.sep
+                    for cached_dir in [d for d in tree.listings if d == item_relative or d.startswith(prefix)]:
+                        del tree.listings[cached_dir]
+        
+        for name, (is_dir, size) in after.items():
+            item_relative = os.path.join(rel_dir, name)
+            if name not in before or before[name][0] != is_dir:
+                tree.changes.append((version, 'added', item_relative, is_dir, size))
+                if is_dir:
+                    self._subtree_added(tree, item_relative, version)
+            elif before[name][1] != size:
+                tree.changes.append((version, 'resized', item_relative, is_dir, size))
+        
+        if len(tree.changes) == tree.changes.maxlen:
+            # The log is full, clients older than its first entry must reload
+            tree.oldest_version = max(tree.oldest_version, tree.changes[0][0])
+    
+    def _revalidate(self, tree: _RepoTree) -> None:
+        """Rescan every cached directory whose mtime changed."""
+        changed = False
+        for rel_dir, (mtime, _) in list(tree.listings.items()):
+            dir_path = os.path.join(tree.root, rel_dir) if rel_dir else tree.root
+            try:
+                current = os.stat(dir_path).st_mtime_ns
+            except OSError:
+                current = None
+            if current != mtime:
+                changed = True
+                if current is None:
+                    tree.listings.pop(rel_dir, None)
+                else:
+                    self._scan(tree, rel_dir)
+        
+        if changed:
+            tree.flattened.clear()
+        tree.validated_at = time.monotonic()
+    
+    def _flatten(self, tree: _RepoTree, max_depth: int) -> List[Dict[str, Any]]:
+        """Build the flat file tree list from cached listings."""
+        file_tree: List[Dict[str, Any]] = []
+        
+        def traverse_directory(rel_dir: str, depth: int):
+            if depth > max_depth:
+                return
+            
+            entries = self._listing(tree, rel_dir)
+            if entries is None:
+                return
+            
+            for name, is_dir, size in entries:
+                item_relative = os.path.join(rel_dir, name) if rel_dir else name
+                file_tree.append({
+                    'name': name,
+                    'path': item_relative,
+                    'type': 'directory' if is_dir else 'file',
+                    'size': size
+                })
+                if is_dir:
+                    traverse_directory(item_relative, depth + 1)
+        
+        traverse_directory('', 0)
+        return file_tree
+    
+    def _tree_for(self, repo_path: str) -> _RepoTree:
+        """Get the cached tree of a repository, revalidated if due."""
+        key = os.path.abspath(repo_path)
+        tree = self._trees.get(key)
+        if tree is None:
+            # Start past every version handed out before, including those of
+            # a dropped tree or an earlier process (clock in milliseconds)
+            version = max(time.time_ns() // 1000000, self._last_version + 1)
+            tree = self._trees[key] = _RepoTree(key, self.max_changes, version)
+        elif time.monotonic() - tree.validated_at >= self.revalidate_interval:
+            self._revalidate(tree)
+        return tree
+    
+    def _listing(self, tree: _RepoTree, rel_dir: str) -> Optional[List[Entry]]:
+        """Get a directory listing from the cache, scanning it on a miss."""
+        cached = tree.listings.get(rel_dir)
+        return cached[1] if cached else self._scan(tree, rel_dir)
+    
+    def get_tree(self, repo_path: str, max_depth: int = 10) -> List[Dict[str, Any]]:
+        """Get the flat file tree of a repository.
+        
+        Args:
+            repo_path: Path to local repository
+            max_depth: Maximum directory depth to traverse
+        
+        Returns:
+            List of file/directory information
+        """
+        return self.get_versioned_tree(repo_path, max_depth)[1]
+    
+    def get_versioned_tree(self, repo_path: str, max_depth: int = 10) -> Tuple[int, List[Dict[str, Any]]]:
+        """Get the flat file tree of a repository together with its tree version.
+        
+        Args:
+            repo_path: Path to local repository
+            max_depth: Maximum directory depth to traverse
+        
+        Returns:
+            Tuple of (tree version, list of file/directory information)
+        """
+        if not os.path.exists(repo_path):
+            return 0, []
+        
+        with self._lock:
+            tree = self._tree_for(repo_path)
+            
+            if max_depth not in tree.flattened:
+                tree.flattened[max_depth] = self._flatten(tree, max_depth)
+                tree.validated_at = tree.validated_at or time.monotonic()
+            
+            return tree.version, list(tree.flattened[max_depth])
+    
+    def changes_since(self, repo_path: str, since: int) -> Optional[Dict[str, Any]]:
+        """Get the entries added, removed and resized after a tree version.
+        
+        Args:
+            repo_path: Path to local repository
+            since: Tree version the client holds
+        
+        Returns:
+            Dictionary with the current 'version' and the ordered 'changes',
+            or None if the version is unknown or too old for the change log
+            and the client has to reload the tree
+        """
+        if not os.path.exists(repo_path):
+            return None
+        
+        with self._lock:
+            tree = self._tree_for(repo_path)
+            if since < tree.oldest_version or since > tree.version:
+                return None
+            
+            changes = [
+                {
+                    'change': kind,
+                    'path': path,
+                    'type': 'directory' if is_dir else 'file',
+                    'size': size
+                }
+                for version, kind, path, is_dir, size in tree.changes
+                if version > since
+            ]
+            return {'version': tree.version, 'changes': changes}
+    
+    def list_directory(
+        self,
+        repo_path: str,
+        dir_path: str = '',
+        cursor: Optional[str] = None,
+        limit: int = 500
+    ) -> Optional[Dict[str, Any]]:
+        """Get one page of a single directory's children.
+        
+        Subdirectories on the page are listed too so their child counts
+        are known, which also warms the cache for expanding them next.
+        
+        Args:
+            repo_path: Path to local repository
+            dir_path: Relative directory path ('' for the root)
+            cursor: next_cursor of the previous page
+            limit: Maximum number of entries to return
+        
+        Returns:
+            Page as returned by page_listing, or None if the directory
+            does not exist or is hidden from the tree
+        """
+        rel_dir = os.path.normpath(dir_path) if dir_path else ''
+        if rel_dir == '.':
+            rel_dir = ''
+        if rel_dir.startswith('..') or os.path.isabs(rel_dir):
+            return None
+        if rel_dir and not all(self.should_include(part, True) for part in rel_dir.split(os.sep)):
+            return None
+        
+        with self._lock:
+            tree = self._tree_for(repo_path)
+            entries = self._listing(tree, rel_dir)
+            if entries is None:
+                return None
+            
+            def child_count(name: str) -> Optional[int]:
+                children = self._listing(tree, os.path.join(rel_dir, name))
+                return None if children is None else len(children)
+            
+            page = page_listing(entries, cursor, limit, child_count)
+            page['version'] = tree.version
+            return page
+    
+    def _parent_listing(self, repo_path: str, file_path: str):
+        """Get the cached tree, parent directory and file name of a path."""
+        tree = self._trees.get(os.path.abspath(repo_path))
+        rel_path = os.path.normpath(file_path)
+        rel_dir, name = os.path.split(rel_path)
+        return tree, rel_dir, name
+    
+    def _touch_listing(self, tree: _RepoTree, rel_dir: str, entries: List[Entry]) -> None:
+        """Store an updated listing together with the directory's new mtime."""
+        dir_path = os.path.join(tree.root, rel_dir) if rel_dir else tree.root
+        try:
+            self._store(tree, rel_dir, os.stat(dir_path).st_mtime_ns, entries)
+        except OSError:
+            tree.listings.pop(rel_dir, None)
+        tree.flattened.clear()
+    
+    def file_written(self, repo_path: str, file_path: str) -> None:
+        """Record a file created or saved through the backend.
+        
+        Args:
+            repo_path: Path to local repository
+            file_path: Relative path to file within repository
+        """
+        with self._lock:
+            tree, rel_dir, name = self._parent_listing(repo_path, file_path)
+            if tree is None:
+                return
+            
+            cached = tree.listings.get(rel_dir)
+            if cached is None:
+                # Parent directories may be new; rescan the nearest cached ancestor
+                ancestor = rel_dir
+                while ancestor and ancestor not in tree.listings:
+                    ancestor = os.path.dirname(ancestor)
+                if ancestor in tree.listings:
+                    self._scan(tree, ancestor)
+                tree.flattened.clear()
+                return
+            
+            if not self.should_include(name, False):
+                return
+            
+            try:
+                size = os.path.getsize(os.path.join(tree.root, rel_dir, name))
+            except OSError:
+                return
+            
+            entries = [entry for entry in cached[1] if entry[0] != name]
+            entries.append((name, False, size))
+            entries.sort()
+            self._touch_listing(tree, rel_dir, entries)
+    
+    def file_deleted(self, repo_path: str, file_path: str) -> None:
+        """Record a file deleted through the backend.
+        
+        Args:
+            repo_path: Path to local repository
+            file_path: Relative path to file within repository
+        """
+        with self._lock:
+            tree, rel_dir, name = self._parent_listing(repo_path, file_path)
+            if tree is None:
+                return
+            
+            # Directories left empty may be gone too (e.g. after a git update)
+            while rel_dir and not os.path.isdir(os.path.join(tree.root, rel_dir)):
+                tree.listings.pop(rel_dir, None)
+                rel_dir, name = os.path.split(rel_dir)
+            
+            if rel_dir not in tree.listings:
+                tree.flattened.clear()
+                return
+            
+            entries = [entry for entry in tree.listings[rel_dir][1] if entry[0] != name]
+            self._touch_listing(tree, rel_dir, entries)
+    
+    def paths_changed(self, repo_path: str, file_paths: Optional[Iterable[str]]) -> Optional[int]:
+        """Rescan the cached directories affected by changes seen outside the backend.
+        
+        Args:
+            repo_path: Path to local repository
+            file_paths: Relative paths that changed, or None to rescan every
+                cached directory
+        
+        Returns:
+            Tree version after the rescan, or None if the tree isn't cached
+        """
+        with self._lock:
+            tree = self._trees.get(os.path.abspath(repo_path))
+            if tree is None:
+                return None
+            
+            if file_paths is None:
+                dirs = set(tree.listings)
+            else:
+                dirs = set()
+                for path in file_paths:
+                    rel_path = os.path.normpath(path) if path else ''
+                    rel_path = '' if rel_path == '.' else rel_path
+                    dirs.add(rel_path)
+                    dirs.add(os.path.dirname(rel_path))
+            
+            # Parents first, so listings of removed directories are dropped before their turn
+            for rel_dir in sorted(dirs, key=lambda d: (d.count(os.sep), d) if d else (-1, d)):
+                if rel_dir not in tree.listings:
+                    continue
+                if os.path.isdir(os.path.join(tree.root, rel_dir)):
+                    self._scan(tree, rel_dir)
+                else:
+                    tree.listings.pop(rel_dir, None)
+            
+            tree.flattened.clear()
+            tree.validated_at = time.monotonic()
+            return tree.version
+    
+    def drop(self, repo_path: str) -> None:
+        """Forget everything cached for a repository.
+        
+        Args:
+            repo_path: Path to local repository
+        """
+        with self._lock:
+            tree = self._trees.pop(os.path.abspath(repo_path), None)
+            if tree is not None:
+                self._last_version = max(self._last_version, tree.version)
+
+
+# Global file tree cache instance
+file_tree_cache = FileTreeCache()
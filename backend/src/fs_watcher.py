@@ -0,0 +1,401 @@
+"""File system watchers that publish debounced change batches per repository."""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Dict, List, Any, Optional, Set, Tuple
+from src.config import config
+from src.file_tree_cache import FileTreeCache, file_tree_cache
+from src.github_client import github_client
+
+# inotify(7) event flags
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_ONLYDIR)
+
+EVENT_HEADER = struct.Struct('iIII')
+
+# Paths listed per batch; clients resync the whole tree past this
+MAX_BATCH_PATHS = 1000
+
+
+def _visible(rel_path: str, is_dir: bool) -> bool:
+    """Check if a changed path is part of the file tree."""
+    parts = rel_path.split(os.sep)
+    if not all(FileTreeCache.should_include(part, True) for part in parts[:-1]):
+        return False
+    return FileTreeCache.should_include(parts[-1], is_dir)
+
+
+class _Inotify:
+    """Recursive inotify watch over a directory tree."""
+    
+    _libc = None
+    
+    def __init__(self, root: str):
+        if _Inotify._libc is None:
+            _Inotify._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        
+        self.root = root
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self._paths: Dict[int, str] = {}
+        try:
+            self.add_tree('')
+        except OSError:
+            os.close(self.fd)
+            raise
+    
+    def add_tree(self, rel_dir: str) -> None:
+        """Watch a directory and every visible directory below it.
+        
+        Raises:
+            OSError: If the inotify watch limit is reached
+        """
+        for root, dirs, _ in os.walk(os.path.join(self.root, rel_dir)):
+            rel_root = os.path.relpath(root, self.root)
+            rel_root = '' if rel_root == '.' else rel_root
+            wd = self._libc.inotify_add_watch(self.fd, os.fsencode(root), WATCH_MASK)
+            if wd < 0:
+                error = ctypes.get_errno()
+                if error == errno.ENOSPC:
+                    raise OSError(error, 'inotify watch limit reached')
+                # Vanished in the meantime
+                dirs[:] = []
+                continue
+            self._paths[wd] = rel_root
+            dirs[:] = [name for name in dirs if FileTreeCache.should_include(name, True)]
+    
+    def read(self, timeout: float) -> Optional[Set[str]]:
+        """Wait for events and get the relative paths they touched.
+        
+        Returns:
+            Changed paths ('' for the root), or None if the kernel queue
+            overflowed and events were lost
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        
+        changed: Set[str] = set()
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            name = os.fsdecode(data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b'\0'))
+            offset += EVENT_HEADER.size + length
+            
+            if mask & IN_Q_OVERFLOW:
+                return None
+            if mask & IN_IGNORED:
+                self._paths.pop(wd, None)
+                continue
+            
+            rel_dir = self._paths.get(wd)
+            if rel_dir is None:
+                continue
+            if mask & IN_DELETE_SELF:
+                changed.add(rel_dir)
+                continue
+            
+            rel_path = os.path.join(rel_dir, name) if rel_dir else name
+            is_dir = bool(mask & IN_ISDIR)
+            if not _visible(rel_path, is_dir):
+                continue
+            changed.add(rel_path)
+            
+            if is_dir and mask & (IN_CREATE | IN_MOVED_TO):
+                # Files may land in the new directory before it is watched
+                self.add_tree(rel_path)
+        
+        return changed
+    
+    def close(self) -> None:
+        """Release the inotify instance and all its watches."""
+        os.close(self.fd)
+
+
+class _Poller:
+    """Fallback that diffs mtimes and sizes of the tree at an interval."""
+    
+    def __init__(self, root: str, interval: float):
+        self.root = root
+        self.interval = interval
+        self._stop = threading.Event()
+        self._state = self._snapshot()
+    
+    def _snapshot(self) -> Dict[str, tuple]:
+        """Get the (is_dir, mtime, size) of every visible path."""
+        state = {}
+        for root, dirs, files in os.walk(self.root):
+            rel_root = os.path.relpath(root, self.root)
+            rel_root = '' if rel_root == '.' else rel_root
+            dirs[:] = [name for name in dirs if FileTreeCache.should_include(name, True)]
+            for name, is_dir in [(name, True) for name in dirs] + [(name, False) for name in files]:
+                if not is_dir and not FileTreeCache.should_include(name, False):
+                    continue
+                rel_path = os.path.join(rel_root, name) if rel_root else name
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                state[rel_path] = (is_dir, stat.st_mtime_ns, None if is_dir else stat.st_size)
+        return state
+    
+    def read(self, timeout: float) -> Optional[Set[str]]:
+        """Sleep up to the poll interval and get the paths that changed."""
+        if self._stop.wait(min(timeout, self.interval)):
+            return set()
+        
+        state = self._snapshot()
+        changed = {path for path in state.keys() | self._state.keys()
+                   if state.get(path) != self._state.get(path)}
+        self._state = state
+        return changed
+    
+    def close(self) -> None:
+        """Stop waiting."""
+        self._stop.set()
+
+
+class RepoWatch:
+    """Change feed of one repository shared by all of its subscribers."""
+    
+    def __init__(self, repo_path: str):
+        self.repo_path = repo_path
+        self.subscribers = 0
+        self.idle_since = time.monotonic()
+        self.batches: "deque[Dict[str, Any]]" = deque(maxlen=100)
+        self.last_id = 0
+        # Batch ids restart with every watch, so event ids carry this too
+        self.epoch = uuid.uuid4().hex[:8]
+        self.changed = threading.Condition()
+        self.stopped = False
+    
+    def event_id(self, batch_id: int) -> str:
+        """Get the event stream id of a batch of this watch."""
+        return f'{self.epoch}-{batch_id}'
+
+
+class FileWatcher:
+    """Watches the repositories that have subscribers for changes.
+    
+    Each watched repository gets a thread reading inotify events (or
+    polling every ``watcher.poll_interval`` seconds where inotify is not
+    available or its watch limit is reached). Events are coalesced until
+    no new ones arrived for ``watcher.debounce_ms`` milliseconds, or for
+    at most ``watcher.max_delay_ms``, and then published as one batch.
+    Every batch first refreshes the file tree cache and reindexes the
+    changed paths. A repository stops being watched ``watcher.idle_timeout``
+    seconds after its last subscriber left.
+    """
+    
+    def __init__(self):
+        """Initialize file watcher with configuration."""
+        self.enabled = config.get('watcher.enabled', True)
+        self.backend = config.get('watcher.backend', 'auto')
+        self.debounce = config.get('watcher.debounce_ms', 200) / 1000
+        self.max_delay = config.get('watcher.max_delay_ms', 2000) / 1000
+        self.poll_interval = config.get('watcher.poll_interval', 2)
+        self.idle_timeout = config.get('watcher.idle_timeout', 60)
+        
+        self._watches: Dict[str, RepoWatch] = {}
+        self._lock = threading.Lock()
+    
+    def _open_backend(self, repo_path: str):
+        """Start inotify on a repository, or polling if that is not possible."""
+        if self.backend != 'polling':
+            try:
+                return _Inotify(repo_path)
+            except (OSError, AttributeError) as e:
+                if self.backend == 'inotify':
+                    raise
+                print(f"Watching {repo_path} by polling: {e}")
+        return _Poller(repo_path, self.poll_interval)
+    
+    def subscribe(self, repo_path: str) -> RepoWatch:
+        """Start or join the watch of a repository.
+        
+        Args:
+            repo_path: Path to local repository
+        
+        Returns:
+            The repository's watch, to pass to wait_for_batches and
+            unsubscribe
+        """
+        key = os.path.abspath(repo_path)
+        with self._lock:
+            watch = self._watches.get(key)
+            if watch is None:
+                watch = self._watches[key] = RepoWatch(key)
+                threading.Thread(target=self._run, args=(watch,), daemon=True,
+                                 name=f'watch-{os.path.basename(key)}').start()
+            watch.subscribers += 1
+            return watch
+    
+    def unsubscribe(self, watch: RepoWatch) -> None:
+        """Leave a repository's watch.
+        
+        Args:
+            watch: Watch returned by subscribe
+        """
+        with self._lock:
+            watch.subscribers -= 1
+            if watch.subscribers == 0:
+                watch.idle_since = time.monotonic()
+    
+    def _publish(self, watch: RepoWatch, paths: Optional[Set[str]]) -> None:
+        """Refresh the caches of a repository and publish a change batch."""
+        version = file_tree_cache.paths_changed(watch.repo_path, paths)
+        github_client.index_paths(watch.repo_path, paths)
+        
+        listed = sorted(path.replace(os.sep, '/') for path in paths or ())
+        with watch.changed:
+            watch.last_id += 1
+            watch.batches.append({
+                'id': watch.last_id,
+                'paths': listed[:MAX_BATCH_PATHS],
+                # Lost events or too many paths, clients should reload the tree
+                'overflow': paths is None or len(listed) > MAX_BATCH_PATHS,
+                'version': version,
+                'time': time.time()
+            })
+            watch.changed.notify_all()
+    
+    def _run(self, watch: RepoWatch) -> None:
+        """Read events of a repository, coalescing them into batches."""
+        try:
+            backend = self._open_backend(watch.repo_path)
+        except OSError as e:
+            print(f"Failed to watch {watch.repo_path}: {e}")
+            backend = None
+        
+        pending: Optional[Set[str]] = set()
+        first_at = last_at = 0.0
+        try:
+            while backend is not None:
+                now = time.monotonic()
+                if (pending is None or pending) and (
+                        now - last_at >= self.debounce or now - first_at >= self.max_delay):
+                    self._publish(watch, pending)
+                    pending = set()
+                
+                with self._lock:
+                    if watch.subscribers == 0 and now - watch.idle_since >= self.idle_timeout:
+                        del self._watches[watch.repo_path]
+                        break
+                
+                timeout = self.debounce if pending else 1.0
+                try:
+                    changed = backend.read(timeout)
+                except OSError as e:
+                    # Out of inotify watches for a new directory
+                    print(f"Watching {watch.repo_path} by polling: {e}")
+                    backend.close()
+                    backend = _Poller(watch.repo_path, self.poll_interval)
+                    changed = None
+                if changed is None or changed:
+                    now = time.monotonic()
+                    if not pending:
+                        first_at = now
+                    last_at = now
+                    pending = None if changed is None or pending is None else pending | changed
+        except Exception as e:
+            print(f"Stopped watching {watch.repo_path}: {e}")
+        finally:
+            if backend is not None:
+                backend.close()
+            with self._lock:
+                if self._watches.get(watch.repo_path) is watch:
+                    del self._watches[watch.repo_path]
+            with watch.changed:
+                watch.stopped = True
+                watch.changed.notify_all()
+    
+    @staticmethod
+    def _lost_batch(watch: RepoWatch) -> Dict[str, Any]:
+        """Get a batch telling a client it missed batches and must reload the tree."""
+        return {
+            'id': watch.last_id,
+            'paths': [],
+            'overflow': True,
+            'version': watch.batches[-1]['version'] if watch.batches else None,
+            'time': time.time()
+        }
+    
+    def resume(self, watch: RepoWatch, event_id: Optional[str]) -> Tuple[int, List[Dict[str, Any]]]:
+        """Find where a (re)connecting client continues in a watch's batches.
+        
+        Args:
+            watch: Watch returned by subscribe
+            event_id: Event id of the last batch the client saw, if any
+        
+        Returns:
+            The batch id to wait after, and an overflow batch to send first
+            if the client's id is from an earlier watch of the repository
+        """
+        epoch, _, number = (event_id or '').rpartition('-')
+        with watch.changed:
+            if not number.isdigit():
+                # A new client only needs changes from now on
+                return watch.last_id, []
+            if epoch != watch.epoch or int(number) > watch.last_id:
+                return watch.last_id, [self._lost_batch(watch)]
+            return int(number), []
+    
+    def wait_for_batches(self, watch: RepoWatch, after_id: int, timeout: float) -> List[Dict[str, Any]]:
+        """Wait for change batches newer than an id.
+        
+        Args:
+            watch: Watch returned by subscribe
+            after_id: Id of the last batch the caller has seen
+            timeout: Maximum seconds to wait
+        
+        Returns:
+            Batches after the id, oldest first (empty on timeout). If some
+            of them are no longer kept, a single overflow batch instead.
+        """
+        with watch.changed:
+            watch.changed.wait_for(lambda: watch.last_id > after_id or watch.stopped, timeout=timeout)
+            if watch.batches and watch.batches[0]['id'] > after_id + 1:
+                return [self._lost_batch(watch)]
+            return [batch for batch in watch.batches if batch['id'] > after_id]
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get the watched repositories and their subscriber counts.
+        
+        Returns:
+            Dictionary keyed by repository path
+        """
+        with self._lock:
+            return {
+                path: {'subscribers': watch.subscribers, 'batches': watch.last_id}
+                for path, watch in self._watches.items()
+            }
+
+
+# Global file watcher instance
+file_watcher = FileWatcher()
@@ -0,0 +1,325 @@
+"""Read-only access to trees and blobs at any commit."""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Tuple
+from git import Repo, BadName, GitCommandError
+from git.objects import Tree
+from git.util import hex_to_bin
+from src.config import config
+from src.file_tree_cache import FileTreeCache, page_listing
+
+# (name, is_directory, hex sha, size)
+TreeEntry = Tuple[str, bool, str, Optional[int]]
+
+
+class _ObjectCache:
+    """LRU of decoded git objects keyed by SHA, bounded by approximate bytes."""
+    
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, sha: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(sha)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(sha)
+            self.hits += 1
+            return entry[0]
+    
+    def put(self, sha: str, value: Any, cost: int) -> None:
+        if cost > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(sha, None)
+            if old:
+                self._size -= old[1]
+            self._entries[sha] = (value, cost)
+            self._size += cost
+            while self._size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= evicted
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'bytes': self._size
+            }
+
+
+class GitObjectReader:
+    """Serves tree listings and file contents of any ref from the object database.
+    
+    Objects are immutable, so decoded trees and blobs are cached by SHA
+    without invalidation; only resolving a ref to a commit touches the
+    repository's current state. Nothing here reads or changes the working
+    tree.
+    """
+    
+    def __init__(self):
+        """Initialize object reader with configuration."""
+        self._cache = _ObjectCache(config.get('git_objects.cache_max_bytes', 64 * 1024 * 1024))
+        self.max_open_repos = config.get('git_objects.max_open_repos', 16)
+        self._repos: "OrderedDict[str, Tuple[Repo, threading.Lock]]" = OrderedDict()
+        self._guard = threading.Lock()
+    
+    def _open(self, repo_path: str) -> Tuple[Repo, threading.Lock]:
+        """Get a cached Repo and the lock serializing access to it."""
+        key = os.path.abspath(repo_path)
+        with self._guard:
+            entry = self._repos.get(key)
+            if entry is None:
+                entry = self._repos[key] = (Repo(key), threading.Lock())
+                while len(self._repos) > self.max_open_repos:
+                    _, (evicted, _) = self._repos.popitem(last=False)
+                    evicted.close()
+            else:
+                self._repos.move_to_end(key)
+            return entry
+    
+    def forget(self, repo_path: str) -> None:
+        """Close the cached Repo of a repository that was removed or re-cloned.
+        
+        Args:
+            repo_path: Path to local repository
+        """
+        with self._guard:
+            entry = self._repos.pop(os.path.abspath(repo_path), None)
+        if entry:
+            entry[0].close()
+    
+    def _tree_entries(self, repo: Repo, tree_sha: str) -> List[TreeEntry]:
+        """Get the visible entries of a tree object."""
+        entries = self._cache.get(tree_sha)
+        if entries is not None:
+            return entries
+        
+        entries = []
+        for item in Tree(repo, hex_to_bin(tree_sha), Tree.tree_id << 12, ''):
+            if item.type == 'tree':
+                if FileTreeCache.should_include(item.name, True):
+                    entries.append((item.name, True, item.hexsha, None))
+            elif item.type == 'blob':
+                if FileTreeCache.should_include(item.name, False):
+                    entries.append((item.name, False, item.hexsha, item.size))
+        entries.sort()
+        self._cache.put(tree_sha, entries, 64 + sum(len(entry[0]) + 96 for entry in entries))
+        return entries
+    
+    @staticmethod
+    def _resolve(repo: Repo, ref: str):
+        """Resolve a ref, tag or commit SHA to a commit."""
+        try:
+            return repo.commit(ref)
+        except (BadName, ValueError, GitCommandError):
+            raise ValueError(f'Unknown ref: {ref}')
+    
+    def get_tree(self, repo_path: str, ref: str, max_depth: int = 10) -> Dict[str, Any]:
+        """Get the flat file tree of a repository at a ref.
+        
+        Args:
+            repo_path: Path to local repository
+            ref: Branch, tag or commit SHA
+            max_depth: Maximum directory depth to traverse
+        
+        Returns:
+            Dictionary with the resolved commit and a file tree list shaped
+            like GitHubClient.get_file_tree
+        
+        Raises:
+            ValueError: If the ref does not resolve to a commit
+        """
+        repo, lock = self._open(repo_path)
+        file_tree: List[Dict[str, Any]] = []
+        
+        with lock:
+            commit = self._resolve(repo, ref)
+            
+            def traverse(tree_sha: str, rel_dir: str, depth: int):
+                if depth > max_depth:
+                    return
+                for name, is_dir, sha, size in self._tree_entries(repo, tree_sha):
+                    item_relative = f'{rel_dir}/{name}' if rel_dir else name
+                    file_tree.append({
+                        'name': name,
+                        'path': item_relative,
+                        'type': 'directory' if is_dir else 'file',
+                        'size': size
+                    })
+                    if is_dir:
+                        traverse(sha, item_relative, depth + 1)
+            
+            traverse(commit.tree.hexsha, '', 0)
+        
+        return {'commit': commit.hexsha, 'file_tree': file_tree}
+    
+    def list_directory(
+        self,
+        repo_path: str,
+        ref: str,
+        dir_path: str = '',
+        cursor: Optional[str] = None,
+        limit: int = 500
+    ) -> Optional[Dict[str, Any]]:
+        """Get one page of a single directory's children at a ref.
+        
+        Args:
+            repo_path: Path to local repository
+            ref: Branch, tag or commit SHA
+            dir_path: Relative directory path ('' for the root)
+            cursor: next_cursor of the previous page
+            limit: Maximum number of entries to return
+        
+        Returns:
+            Page as returned by file_tree_cache.page_listing plus the
+            resolved 'commit', or None if the directory does not exist
+        
+        Raises:
+            ValueError: If the ref does not resolve to a commit
+        """
+        parts = [part for part in dir_path.replace(os.sep, '/').split('/') if part and part != '.']
+        repo, lock = self._open(repo_path)
+        
+        with lock:
+            commit = self._resolve(repo, ref)
+            tree_sha = commit.tree.hexsha
+            for part in parts:
+                subdirs = {name: sha for name, is_dir, sha, _ in self._tree_entries(repo, tree_sha) if is_dir}
+                if part not in subdirs:
+                    return None
+                tree_sha = subdirs[part]
+            
+            entries = self._tree_entries(repo, tree_sha)
+            shas = {name: sha for name, _, sha, _ in entries}
+            page = page_listing(
+                [(name, is_dir, size) for name, is_dir, _, size in entries],
+                cursor,
+                limit,
+                lambda name: len(self._tree_entries(repo, shas[name]))
+            )
+        
+        page['commit'] = commit.hexsha
+        return page
+    
+    def read_bytes(self, repo_path: str, ref: str, file_path: str) -> Dict[str, Any]:
+        """Read a file's raw bytes at a ref.
+        
+        Args:
+            repo_path: Path to local repository
+            ref: Branch, tag or commit SHA
+            file_path: Relative path to file within repository
+        
+        Returns:
+            Dictionary with the 'data', its blob 'sha' and the resolved 'commit'
+        """
+        rel_path = os.path.normpath(file_path).replace(os.sep, '/')
+        if rel_path.startswith('../') or rel_path == '..' or os.path.isabs(rel_path):
+            return {
+                'success': False,
+                'error': 'File path outside repository'
+            }
+        
+        try:
+            repo, lock = self._open(repo_path)
+            with lock:
+                commit = self._resolve(repo, ref)
+                try:
+                    item = commit.tree / rel_path
+                except KeyError:
+                    return {
+                        'success': False,
+                        'error': 'File not found'
+                    }
+                
+                if item.type != 'blob':
+                    return {
+                        'success': False,
+                        'error': 'Path is not a file'
+                    }
+                
+                max_size = config.get('filesystem.max_file_size', 10) * 1024 * 1024
+                if item.size > max_size:
+                    return {
+                        'success': False,
+                        'error': f'File too large ({item.size} bytes, max {max_size} bytes)'
+                    }
+                
+                data = self._cache.get(item.hexsha)
+                if data is None:
+                    data = item.data_stream.read()
+                    self._cache.put(item.hexsha, data, len(data))
+            
+            return {
+                'success': True,
+                'data': data,
+                'commit': commit.hexsha,
+                'sha': item.hexsha
+            }
+        
+        except ValueError as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Failed to read file: {str(e)}'
+            }
+    
+    def read_file(self, repo_path: str, ref: str, file_path: str) -> Dict[str, Any]:
+        """Read a file's content at a ref.
+        
+        Args:
+            repo_path: Path to local repository
+            ref: Branch, tag or commit SHA
+            file_path: Relative path to file within repository
+        
+        Returns:
+            File content and metadata, shaped like GitHubClient.read_file
+        """
+        result = self.read_bytes(repo_path, ref, file_path)
+        if not result['success']:
+            return result
+        
+        data = result['data']
+        try:
+            content = data.decode('utf-8')
+        except UnicodeDecodeError:
+            return {
+                'success': False,
+                'error': 'Binary file not supported for editing'
+            }
+        
+        return {
+            'success': True,
+            'content': content,
+            'size': len(data),
+            'encoding': 'utf-8',
+            'binary': False,
+            'commit': result['commit'],
+            'sha': result['sha']
+        }
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get object cache counters.
+        
+        Returns:
+            Dictionary with hit/miss counts and cache size
+        """
+        return self._cache.stats()
+
+
+# Global git object reader instance
+git_objects = GitObjectReader()
@@ -0,0 +1,165 @@
+"""Conditional-request cache for GitHub REST API calls."""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+import requests
+from src.config import config
+
+
+class GitHubRateLimited(Exception):
+    """Raised when the rate limit is too low to send a request."""
+    
+    def __init__(self, reset_at: float):
+        self.reset_at = reset_at
+        super().__init__(f'GitHub API rate limit reached, resets at {time.ctime(reset_at)}')
+
+
+class _CachedResponse:
+    """Body and validators of a cached 200 response."""
+    
+    def __init__(self, body: Any, etag: Optional[str], last_modified: Optional[str]):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = time.monotonic()
+
+
+class GitHubResponseCache:
+    """LRU cache of GitHub API responses revalidated with conditional requests.
+    
+    Responses younger than ``github.cache_ttl`` seconds are served from
+    memory. Older ones are revalidated with If-None-Match/If-Modified-Since;
+    GitHub does not count 304 replies against the rate limit. The
+    X-RateLimit headers of every reply are tracked, and once fewer than
+    ``github.rate_limit_reserve`` requests remain, cached responses are
+    served as they are until the limit resets.
+    """
+    
+    def __init__(self):
+        """Initialize GitHub response cache with configuration."""
+        self.ttl = config.get('github.cache_ttl', 60)
+        self.max_entries = config.get('github.cache_max_entries', 512)
+        self.rate_limit_reserve = config.get('github.rate_limit_reserve', 50)
+        
+        self._entries: "OrderedDict[str, _CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'revalidated': 0, 'misses': 0, 'stale': 0}
+        self.rate_limit: Dict[str, Optional[float]] = {
+            'limit': None,
+            'remaining': None,
+            'reset_at': None
+        }
+    
+    def _track_rate_limit(self, response: requests.Response) -> None:
+        """Record the rate limit headers of a response."""
+        headers = response.headers
+        with self._lock:
+            for key, header in (('limit', 'X-RateLimit-Limit'),
+                                ('remaining', 'X-RateLimit-Remaining'),
+                                ('reset_at', 'X-RateLimit-Reset')):
+                value = headers.get(header)
+                if value is not None:
+                    try:
+                        self.rate_limit[key] = int(value)
+                    except ValueError:
+                        pass
+            
+            retry_after = headers.get('Retry-After')
+            if response.status_code in (403, 429) and retry_after and retry_after.isdigit():
+                # Secondary rate limits only announce a wait time
+                self.rate_limit['remaining'] = 0
+                self.rate_limit['reset_at'] = time.time() + int(retry_after)
+    
+    def _throttled_until(self) -> Optional[float]:
+        """Get the reset time if requests should be held back, else None."""
+        with self._lock:
+            remaining = self.rate_limit['remaining']
+            reset_at = self.rate_limit['reset_at']
+        if remaining is None or reset_at is None or reset_at <= time.time():
+            return None
+        if remaining > self.rate_limit_reserve:
+            return None
+        return reset_at
+    
+    def _count(self, counter: str) -> None:
+        """Increment a cache counter."""
+        with self._lock:
+            self._counters[counter] += 1
+    
+    def get(self, session: requests.Session, url: str, timeout: float = 30) -> Tuple[int, Any, str]:
+        """GET a GitHub API URL through the cache.
+        
+        Args:
+            session: Session used for requests that reach GitHub
+            url: API URL
+            timeout: Request timeout in seconds
+        
+        Returns:
+            Tuple of (status code, decoded JSON body or response text,
+            'hit'|'revalidated'|'miss'|'stale')
+        
+        Raises:
+            GitHubRateLimited: If the rate limit is nearly exhausted and
+                nothing is cached for the URL
+        """
+        with self._lock:
+            cached = self._entries.get(url)
+            if cached is not None:
+                self._entries.move_to_end(url)
+        
+        if cached is not None and time.monotonic() - cached.fetched_at < self.ttl:
+            self._count('hits')
+            return 200, cached.body, 'hit'
+        
+        reset_at = self._throttled_until()
+        if reset_at is not None:
+            if cached is not None:
+                self._count('stale')
+                return 200, cached.body, 'stale'
+            raise GitHubRateLimited(reset_at)
+        
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers['If-None-Match'] = cached.etag
+            if cached.last_modified:
+                headers['If-Modified-Since'] = cached.last_modified
+        
+        response = session.get(url, headers=headers, timeout=timeout)
+        self._track_rate_limit(response)
+        
+        if response.status_code == 304 and cached is not None:
+            cached.fetched_at = time.monotonic()
+            self._count('revalidated')
+            return 200, cached.body, 'revalidated'
+        
+        self._count('misses')
+        if response.status_code != 200:
+            return response.status_code, response.text, 'miss'
+        
+        body = response.json()
+        entry = _CachedResponse(body, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        with self._lock:
+            self._entries[url] = entry
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return 200, body, 'miss'
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get cache counters and the last seen rate limit.
+        
+        Returns:
+            Dictionary with hit/revalidation/miss counts and rate limit state
+        """
+        with self._lock:
+            stats = dict(self._counters)
+            stats['entries'] = len(self._entries)
+            stats['rate_limit'] = dict(self.rate_limit)
+            return stats
+
+
+# Global GitHub response cache instance
+github_cache = GitHubResponseCache()
@@ -1,12 +1,75 @@
 """GitHub integration client for repository management."""
 
+import json
 import os
 import shutil
-import requests
-from git import Repo, GitCommandError
-from typing import List, Dict, Any, Optional, Tuple
+import tarfile
+import threading
+import time
+from git import Repo, GitCommandError, RemoteProgress
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
 from urllib.parse import urlparse
 from src.config import config
+from src.http_session import create_session, session_stats
+from src.github_cache import github_cache, GitHubRateLimited
+from src.content_index import content_index
+from src.file_tree_cache import IGNORED_NAMES, FileTreeCache, file_tree_cache
+from src.retrieval_index import retrieval_index
+from src.repo_registry import repo_registry, SNAPSHOT_MARKER
+from src.git_objects import git_objects
+from src.line_index import line_index
+
+# C-style escapes git uses in quoted path names
+GIT_PATH_ESCAPES = {'a': b'\a', 'b': b'\b', 't': b'\t', 'n': b'\n', 'v': b'\v',
+                    'f': b'\f', 'r': b'\r', '"': b'"', '\\': b'\\'}
+
+
+def _unquote_git_path(name: str) -> str:
+    """Decode a path git quoted because it has special or non-ASCII characters."""
+    if len(name) < 2 or not (name.startswith('"') and name.endswith('"')):
+        return name
+    
+    body = name[1:-1]
+    decoded = bytearray()
+    i = 0
+    while i < len(body):
+        if body[i] == '\\' and i + 1 < len(body):
+            if body[i + 1] in '01234567':
+                # Octal escapes are the raw UTF-8 bytes
+                decoded.append(int(body[i + 1:i + 4], 8))
+                i += 4
+            else:
+                decoded += GIT_PATH_ESCAPES.get(body[i + 1], body[i + 1].encode('utf-8'))
+                i += 2
+        else:
+            decoded += body[i].encode('utf-8')
+            i += 1
+    return decoded.decode('utf-8', errors='replace')
+
+
+def _diff_git_paths(header: str) -> Tuple[str, str]:
+    """Get the old and new path of a 'diff --git a/<old> b/<new>' line.
+    
+    Unquoted names with spaces are ambiguous here; they are split on the
+    assumption that both are the same, which holds unless the file was
+    renamed, and renames are corrected from the 'rename from/to' lines.
+    """
+    rest = header[len('diff --git '):]
+    if rest.startswith('"'):
+        end = 1
+        while rest[end] != '"':
+            end += 2 if rest[end] == '\\' else 1
+        old, new = rest[:end + 1], rest[end + 2:]
+    elif rest.endswith('"'):
+        split = rest.rfind(' "b/')
+        old, new = rest[:split], rest[split + 1:]
+    else:
+        half = (len(rest) - 1) // 2
+        old, new = rest[:half], rest[half + 1:]
+        if old[2:] != new[2:]:
+            old, _, new = rest.partition(' b/')
+            new = 'b/' + new
+    return _unquote_git_path(old)[2:], _unquote_git_path(new)[2:]
 
 
 class GitHubClient:
@@ -24,6 +87,18 @@ class GitHubClient:
         self.headers = {}
         if self.access_token:
             self.headers['Authorization'] = f'token {self.access_token}'
+        
+        # Keep-alive connection pool shared by all GitHub API requests
+        self.session = create_session(self.headers)
+        
+        self._indexing = set()
+        self._reindex = set()
+        self._indexing_lock = threading.Lock()
+        
+        # One lock per clone target so concurrent clones can't race on a path
+        self._clone_locks: Dict[str, threading.Lock] = {}
+        self._clone_locks_lock = threading.Lock()
+        self._budget_lock = threading.Lock()
     
     def parse_github_url(self, url: str) -> Tuple[str, str]:
         """Parse GitHub URL to extract owner and repository name.
@@ -51,12 +126,232 @@ class GitHubClient:
         
         return parts[0], parts[1]
     
-    def clone_repository(self, repo_url: str, force: bool = False) -> Dict[str, Any]:
+    def _clone_url(self, owner: str, repo_name: str) -> str:
+        """Build the clone URL of a repository, with the token if configured."""
+        if self.access_token:
+            # Use token for authentication
+            return f"https://{self.access_token}@github.com/{owner}/{repo_name}.git"
+        return f"https://github.com/{owner}/{repo_name}.git"
+    
+    @property
+    def mirrors_dir(self) -> str:
+        """Get directory holding the bare upstream mirrors."""
+        return os.path.abspath(
+            config.get('clone.mirrors_directory') or os.path.join(self.repos_dir, '.mirrors')
+        )
+    
+    def _upstream_of(self, owner: str, repo_name: str) -> Tuple[str, str]:
+        """Get the root upstream of a fork, or the repository itself."""
+        info = self.get_repository_info(owner, repo_name)
+        source = info.get('source') if isinstance(info, dict) else None
+        if source and source.get('owner'):
+            return source['owner']['login'], source['name']
+        return owner, repo_name
+    
+    def _ensure_mirror(self, owner: str, repo_name: str) -> str:
+        """Create or refresh the bare mirror shared by a repository's forks.
+        
+        Args:
+            owner: Repository owner
+            repo_name: Repository name
+            
+        Returns:
+            Path to the mirror
+        """
+        upstream_owner, upstream_repo = self._upstream_of(owner, repo_name)
+        mirror_path = os.path.join(self.mirrors_dir, f"{upstream_owner}_{upstream_repo}.git")
+        
+        with self._clone_lock(mirror_path):
+            if os.path.exists(mirror_path):
+                # No pruning: clones may still borrow objects of deleted refs
+                Repo(mirror_path).git.fetch('--quiet', 'origin')
+            else:
+                os.makedirs(self.mirrors_dir, exist_ok=True)
+                Repo.clone_from(self._clone_url(upstream_owner, upstream_repo), mirror_path, mirror=True)
+        
+        return mirror_path
+    
+    @staticmethod
+    def _disk_usage(path: str) -> int:
+        """Get the total size in bytes of the files under a directory."""
+        total = 0
+        for root, _, files in os.walk(path):
+            for name in files:
+                try:
+                    total += os.lstat(os.path.join(root, name)).st_size
+                except OSError:
+                    continue
+        return total
+    
+    def maintain_mirrors(self, fetch: bool = True) -> List[Dict[str, Any]]:
+        """Garbage collect the shared mirrors and repack the clones borrowing from them.
+        
+        Mirrors are gc'd without pruning, because clones using them as an
+        alternate may still need objects no mirror ref points to. Clones
+        are repacked with ``-l`` so objects they borrow are dropped from
+        their own packs.
+        
+        Args:
+            fetch: Whether to fetch each mirror before collecting it
+            
+        Returns:
+            One result dictionary per mirror and borrowing clone
+        """
+        results = []
+        
+        mirrors = []
+        if os.path.isdir(self.mirrors_dir):
+            mirrors = sorted(
+                os.path.join(self.mirrors_dir, name) for name in os.listdir(self.mirrors_dir)
+                if name.endswith('.git')
+            )
+        
+        for mirror_path in mirrors:
+            before = self._disk_usage(mirror_path)
+            try:
+                with self._clone_lock(mirror_path):
+                    mirror = Repo(mirror_path)
+                    if fetch:
+                        mirror.git.fetch('--quiet', 'origin')
+                    mirror.git.gc('--prune=never', '--quiet')
+                results.append({
+                    'path': mirror_path,
+                    'kind': 'mirror',
+                    'success': True,
+                    'bytes_before': before,
+                    'bytes_after': self._disk_usage(mirror_path)
+                })
+            except GitCommandError as e:
+                results.append({'path': mirror_path, 'kind': 'mirror', 'success': False, 'error': str(e)})
+        
+        for repo in self.list_local_repositories():
+            repo_path = repo['path']
+            if not os.path.exists(os.path.join(repo_path, '.git', 'objects', 'info', 'alternates')):
+                continue
+            
+            objects_path = os.path.join(repo_path, '.git', 'objects')
+            before = self._disk_usage(objects_path)
+            try:
+                with self._clone_lock(repo_path):
+                    Repo(repo_path).git.repack('-a', '-d', '-l', '-q')
+                results.append({
+                    'path': repo_path,
+                    'kind': 'clone',
+                    'success': True,
+                    'bytes_before': before,
+                    'bytes_after': self._disk_usage(objects_path)
+                })
+            except GitCommandError as e:
+                results.append({'path': repo_path, 'kind': 'clone', 'success': False, 'error': str(e)})
+        
+        return results
+    
+    def _clone_lock(self, local_path: str) -> threading.Lock:
+        """Get the lock serializing clones into a local path."""
+        with self._clone_locks_lock:
+            lock = self._clone_locks.get(local_path)
+            if lock is None:
+                lock = self._clone_locks[local_path] = threading.Lock()
+            return lock
+    
+    @staticmethod
+    def _forget_local_caches(local_path: str) -> None:
+        """Drop every cache and index kept for a clone that is being deleted."""
+        git_objects.forget(local_path)
+        content_index.drop(local_path)
+        retrieval_index.drop(local_path)
+        line_index.drop(local_path)
+        file_tree_cache.drop(local_path)
+    
+    @staticmethod
+    def clone_options(
+        depth: Optional[int] = None,
+        filter_spec: Optional[str] = None,
+        sparse_paths: Optional[List[str]] = None,
+        shared_objects: Optional[bool] = None,
+        dissociate: Optional[bool] = None
+    ) -> Dict[str, Any]:
+        """Resolve clone options against the ``clone`` config defaults.
+        
+        Args:
+            depth: History depth to fetch (0 for full history)
+            filter_spec: Partial clone filter ('blob:none', 'tree:0' or 'blob:limit=<size>')
+            sparse_paths: Directories to check out (empty for the whole tree)
+            shared_objects: Whether to borrow objects from the upstream's bare mirror
+            dissociate: Whether to copy borrowed objects instead of keeping the mirror as an alternate
+            
+        Returns:
+            Dictionary with validated 'depth', 'filter', 'sparse_paths',
+            'shared_objects' and 'dissociate'
+        """
+        if shared_objects is None:
+            shared_objects = config.get('clone.shared_objects', False)
+        if dissociate is None:
+            dissociate = config.get('clone.dissociate', False)
+        if depth is None:
+            depth = config.get('clone.depth', 0)
+        if filter_spec is None:
+            filter_spec = config.get('clone.filter', '')
+        if sparse_paths is None:
+            sparse_paths = config.get('clone.sparse_paths', [])
+        
+        try:
+            depth = int(depth or 0)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid clone depth: {depth}")
+        if depth < 0:
+            raise ValueError(f"Invalid clone depth: {depth}")
+        
+        filter_spec = (filter_spec or '').strip()
+        if filter_spec and not (
+            filter_spec in ('blob:none', 'tree:0') or
+            (filter_spec.startswith('blob:limit=') and filter_spec[len('blob:limit='):].rstrip('kmgKMG').isdigit())
+        ):
+            raise ValueError(f"Unsupported clone filter: {filter_spec}")
+        
+        if isinstance(sparse_paths, str):
+            sparse_paths = [sparse_paths]
+        cleaned_paths = []
+        for path in sparse_paths or []:
+            path = os.path.normpath(str(path).strip().strip('/'))
+            if path in ('', '.'):
+                continue
+            if os.path.isabs(path) or path.startswith('..'):
+                raise ValueError(f"Invalid sparse checkout path: {path}")
+            cleaned_paths.append(path)
+        
+        return {
+            'depth': depth,
+            'filter': filter_spec,
+            'sparse_paths': cleaned_paths,
+            'shared_objects': bool(shared_objects),
+            'dissociate': bool(dissociate)
+        }
+    
+    def clone_repository(
+        self,
+        repo_url: str,
+        force: bool = False,
+        progress: Optional[RemoteProgress] = None,
+        depth: Optional[int] = None,
+        filter_spec: Optional[str] = None,
+        sparse_paths: Optional[List[str]] = None,
+        shared_objects: Optional[bool] = None,
+        dissociate: Optional[bool] = None
+    ) -> Dict[str, Any]:
         """Clone a GitHub repository to local storage.
         
+        Options left as None fall back to the ``clone`` config defaults.
+        
         Args:
             repo_url: GitHub repository URL
             force: Whether to overwrite existing repository
+            progress: Optional GitPython progress handler for the clone
+            depth: History depth to fetch (0 for full history)
+            filter_spec: Partial clone filter, e.g. 'blob:none'
+            sparse_paths: Directories to check out (empty for the whole tree)
+            shared_objects: Whether to borrow objects from the upstream's bare mirror
+            dissociate: Whether to copy borrowed objects into the clone
             
         Returns:
             Dictionary with clone status and information
@@ -64,39 +359,237 @@ class GitHubClient:
         try:
             owner, repo_name = self.parse_github_url(repo_url)
             local_path = os.path.join(self.repos_dir, f"{owner}_{repo_name}")
+            options = self.clone_options(depth, filter_spec, sparse_paths, shared_objects, dissociate)
             
-            # Check if repository already exists
-            if os.path.exists(local_path):
-                if not force:
+            with self._clone_lock(local_path):
+                return self._clone_into(owner, repo_name, local_path, force, progress, options)
+        
+        except GitCommandError as e:
+            return {
+                'success': False,
+                'error': f'Git error: {str(e)}'
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Failed to clone repository: {str(e)}'
+            }
+    
+    def _clone_into(
+        self,
+        owner: str,
+        repo_name: str,
+        local_path: str,
+        force: bool,
+        progress: Optional[RemoteProgress],
+        options: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Clone a repository into its local path while holding the path's lock."""
+        # Check if repository already exists
+        if os.path.exists(local_path):
+            if not force:
+                return {
+                    'success': True,
+                    'message': 'Repository already exists',
+                    'path': local_path,
+                    'owner': owner,
+                    'repo': repo_name,
+                    'existed': True
+                }
+            else:
+                # Remove existing directory and its caches
+                self._forget_local_caches(local_path)
+                shutil.rmtree(local_path)
+                repo_registry.remove(local_path)
+        
+        # Clone repository
+        clone_url = self._clone_url(owner, repo_name)
+        
+        clone_kwargs = {}
+        if options['shared_objects']:
+            # Only objects missing from the upstream's mirror are transferred
+            clone_kwargs['reference'] = self._ensure_mirror(owner, repo_name)
+            if options['dissociate']:
+                clone_kwargs['dissociate'] = True
+        if options['depth']:
+            clone_kwargs['depth'] = options['depth']
+        if options['filter']:
+            clone_kwargs['filter'] = options['filter']
+        if options['sparse_paths']:
+            # Start with only top-level files checked out
+            clone_kwargs['sparse'] = True
+        
+        repo = Repo.clone_from(clone_url, local_path, progress=progress, **clone_kwargs)
+        if options['sparse_paths']:
+            repo.git.sparse_checkout('set', '--cone', *options['sparse_paths'])
+        # Later updates fetch with the same depth
+        repo.git.config('webagent.depth', str(options['depth']))
+        repo_registry.register(owner, repo_name, local_path)
+        self.index_repository(local_path)
+        self.schedule_disk_budget()
+        
+        return {
+            'success': True,
+            'message': 'Repository cloned successfully',
+            'path': local_path,
+            'owner': owner,
+            'repo': repo_name,
+            'branch': repo.active_branch.name,
+            'commit': repo.head.commit.hexsha[:8],
+            'existed': False,
+            'clone_options': options
+        }
+    
+    @staticmethod
+    def _clone_depth(repo: Repo) -> int:
+        """Get the history depth a repository was cloned with (0 for full)."""
+        try:
+            return int(repo.git.config('--get', 'webagent.depth'))
+        except (GitCommandError, ValueError):
+            # Cloned before depths were recorded
+            if os.path.exists(os.path.join(repo.git_dir, 'shallow')):
+                return config.get('clone.depth', 0) or 1
+            return 0
+    
+    def update_repository(
+        self,
+        repo_path: str,
+        rebase: bool = False,
+        progress: Optional[RemoteProgress] = None
+    ) -> Dict[str, Any]:
+        """Fetch upstream changes into an existing clone.
+        
+        The fetch uses the depth the repository was cloned with. When the
+        branch has no local commits it is moved to the fetched commit,
+        keeping uncommitted edits; otherwise it is fast-forwarded, or
+        rebased with ``rebase``. Only the changed paths are refreshed in
+        the file tree cache and search indexes.
+        
+        Args:
+            repo_path: Path to local repository
+            rebase: Whether to rebase local commits onto the upstream branch
+            progress: Optional GitPython progress handler for the fetch
+            
+        Returns:
+            Dictionary with update status and the changed paths
+        """
+        try:
+            with self._clone_lock(repo_path):
+                repo = Repo(repo_path)
+                if repo.head.is_detached:
                     return {
-                        'success': True,
-                        'message': 'Repository already exists',
-                        'path': local_path,
-                        'owner': owner,
-                        'repo': repo_name,
-                        'existed': True
+                        'success': False,
+                        'error': 'Repository HEAD is detached'
                     }
-                else:
-                    # Remove existing directory
-                    shutil.rmtree(local_path)
+                
+                branch = repo.active_branch
+                upstream = branch.tracking_branch()
+                if upstream is None:
+                    return {
+                        'success': False,
+                        'error': f'Branch {branch.name} has no upstream branch'
+                    }
+                
+                old_commit = repo.head.commit.hexsha
+                # A branch merely behind its upstream has nothing of its own to keep
+                had_local_commits = upstream.is_valid() and not repo.is_ancestor(old_commit, upstream.commit.hexsha)
+                
+                fetch_kwargs = {}
+                depth = self._clone_depth(repo)
+                if depth:
+                    fetch_kwargs['depth'] = depth
+                repo.remote(upstream.remote_name).fetch(progress=progress, **fetch_kwargs)
+                
+                new_commit = upstream.commit.hexsha
+                if new_commit != old_commit:
+                    if not had_local_commits:
+                        # Also works for shallow clones, where the old tip has no
+                        # shared history with a fetch truncated at the new one
+                        repo.git.reset('--keep', new_commit)
+                    elif rebase:
+                        repo.git.rebase('--autostash', upstream.name)
+                    else:
+                        repo.git.merge('--ff-only', '--autostash', upstream.name)
+                
+                head_commit = repo.head.commit.hexsha
+                changes = []
+                if head_commit != old_commit:
+                    diff = repo.git.diff('--name-status', '--no-renames', '-z', old_commit, head_commit)
+                    fields = [field for field in diff.split('\0') if field]
+                    for status, path in zip(fields[0::2], fields[1::2]):
+                        changes.append({'status': status, 'path': path})
+            
+            # Refreshed in batches once the clone lock is free for other jobs
+            if changes:
+                changed = [change['path'] for change in changes]
+                file_tree_cache.paths_changed(repo_path, changed)
+                self.index_paths(repo_path, changed)
             
-            # Clone repository
-            clone_url = f"https://github.com/{owner}/{repo_name}.git"
-            if self.access_token:
-                # Use token for authentication
-                clone_url = f"https://{self.access_token}@github.com/{owner}/{repo_name}.git"
+            return {
+                'success': True,
+                'message': 'Repository updated' if changes else 'Repository already up to date',
+                'path': repo_path,
+                'branch': branch.name,
+                'old_commit': old_commit[:8],
+                'commit': head_commit[:8],
+                'changes': changes
+            }
+        
+        except GitCommandError as e:
+            return {
+                'success': False,
+                'error': f'Git error: {str(e)}'
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Failed to update repository: {str(e)}'
+            }
+    
+    def get_status(self, repo_path: str) -> Dict[str, Any]:
+        """Get the working tree status of a repository.
+        
+        Runs ``git status``, which compares files against the stat data in
+        the index and only rehashes the ones whose stat changed.
+        
+        Args:
+            repo_path: Path to local repository
+            
+        Returns:
+            Dictionary with branch, commit and the changed files
+        """
+        try:
+            repo = Repo(repo_path)
+            output = repo.git.status('--porcelain=v1', '-z', '--untracked-files=all')
             
-            repo = Repo.clone_from(clone_url, local_path)
+            files = []
+            fields = output.split('\0')
+            i = 0
+            while i < len(fields):
+                field = fields[i]
+                i += 1
+                if len(field) < 4:
+                    continue
+                
+                index_status, worktree_status, path = field[0], field[1], field[3:]
+                entry = {
+                    'path': path,
+                    'index': index_status.strip(),
+                    'worktree': worktree_status.strip(),
+                    'status': self._describe_status(index_status, worktree_status)
+                }
+                if index_status in 'RC':
+                    # Renames and copies are followed by the original path
+                    entry['old_path'] = fields[i]
+                    i += 1
+                files.append(entry)
             
             return {
                 'success': True,
-                'message': 'Repository cloned successfully',
-                'path': local_path,
-                'owner': owner,
-                'repo': repo_name,
-                'branch': repo.active_branch.name,
+                'branch': None if repo.head.is_detached else repo.active_branch.name,
                 'commit': repo.head.commit.hexsha[:8],
-                'existed': False
+                'clean': not files,
+                'files': files
             }
         
         except GitCommandError as e:
@@ -107,8 +600,641 @@ class GitHubClient:
         except Exception as e:
             return {
                 'success': False,
-                'error': f'Failed to clone repository: {str(e)}'
+                'error': f'Failed to get repository status: {str(e)}'
+            }
+    
+    @staticmethod
+    def _describe_status(index_status: str, worktree_status: str) -> str:
+        """Summarize a porcelain status pair as a single word."""
+        if index_status == '?':
+            return 'untracked'
+        if 'U' in (index_status, worktree_status) or index_status + worktree_status in ('AA', 'DD'):
+            return 'conflicted'
+        for code in (worktree_status, index_status):
+            if code == 'D':
+                return 'deleted'
+        for code in (index_status, worktree_status):
+            if code == 'A':
+                return 'added'
+            if code == 'R':
+                return 'renamed'
+            if code == 'C':
+                return 'copied'
+        return 'modified'
+    
+    def iter_diff(
+        self,
+        repo_path: str,
+        base: str = 'HEAD',
+        paths: Optional[List[str]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Stream the diff of the working tree against a commit.
+        
+        ``git diff`` output is parsed as it arrives, so memory stays flat
+        however large the diff is. Every changed file yields a 'file'
+        record followed by one 'hunk' record per hunk.
+        
+        Args:
+            repo_path: Path to local repository
+            base: Commit or ref to compare the working tree against
+            paths: Optional relative paths to limit the diff to
+            
+        Yields:
+            Dictionaries with a 'type' of 'file' or 'hunk'
+        
+        Raises:
+            ValueError: If the base is unknown or a path points outside the repository
+        """
+        for path in paths or []:
+            normalized = os.path.normpath(path)
+            if os.path.isabs(normalized) or normalized == '..' or normalized.startswith('..' + os.sep):
+                raise ValueError(f'Path outside repository: {path}')
+        
+        repo = Repo(repo_path)
+        try:
+            repo.commit(base)
+        except Exception:
+            raise ValueError(f'Unknown ref: {base}')
+        
+        process = repo.git.diff(
+            '--no-color', '--no-ext-diff', '-M', base, '--', *(paths or []),
+            as_process=True
+        )
+        
+        current_file = None
+        hunk = None
+        try:
+            for raw_line in process.stdout:
+                line = raw_line.decode('utf-8', errors='replace').rstrip('\n')
+                
+                if line.startswith('diff --git '):
+                    if hunk:
+                        yield hunk
+                        hunk = None
+                    if current_file:
+                        yield current_file
+                    a_path, b_path = _diff_git_paths(line)
+                    current_file = {
+                        'type': 'file',
+                        'path': b_path,
+                        'old_path': a_path,
+                        'status': 'modified',
+                        'binary': False
+                    }
+                    continue
+                
+                if hunk is None and current_file is not None:
+                    # Extended header lines between 'diff --git' and the first hunk
+                    if line.startswith('new file mode'):
+                        current_file['status'] = 'added'
+                    elif line.startswith('deleted file mode'):
+                        current_file['status'] = 'deleted'
+                    elif line.startswith('rename from '):
+                        current_file['status'] = 'renamed'
+                        current_file['old_path'] = _unquote_git_path(line[len('rename from '):])
+                    elif line.startswith('rename to '):
+                        current_file['path'] = _unquote_git_path(line[len('rename to '):])
+                    elif line.startswith('Binary files '):
+                        current_file['binary'] = True
+                    elif line.startswith(('--- a/', '--- "a/')):
+                        # Unambiguous, unlike the 'diff --git' line; names with spaces end in a tab
+                        current_file['old_path'] = _unquote_git_path(line[4:].rstrip('\t'))[2:]
+                    elif line.startswith(('+++ b/', '+++ "b/')):
+                        current_file['path'] = _unquote_git_path(line[4:].rstrip('\t'))[2:]
+                
+                if line.startswith('@@'):
+                    if current_file:
+                        b_path = current_file['path']
+                        yield current_file
+                        current_file = None
+                    if hunk:
+                        yield hunk
+                    hunk = {'type': 'hunk', 'path': b_path, 'header': line, 'lines': []}
+                elif hunk is not None and line[:1] in (' ', '+', '-', '\\'):
+                    hunk['lines'].append(line)
+            
+            if hunk:
+                yield hunk
+            if current_file:
+                yield current_file
+            
+            # Raises GitCommandError if git diff failed
+            process.wait()
+        finally:
+            # Stop git if the consumer went away before the end of the diff
+            if process.proc.poll() is None:
+                process.proc.kill()
+                process.proc.wait()
+    
+    def import_snapshot(
+        self,
+        repo_url: str,
+        ref: Optional[str] = None,
+        force: bool = False
+    ) -> Dict[str, Any]:
+        """Import a repository from GitHub's tarball of a ref, without git history.
+        
+        The archive is extracted while it downloads, so it is never held in
+        memory or on disk as a whole. The ref and commit SHA are recorded in
+        the snapshot so it can later be upgraded to a clone in place.
+        
+        Args:
+            repo_url: GitHub repository URL
+            ref: Branch, tag or commit SHA (defaults to the default branch)
+            force: Whether to overwrite existing repository
+            
+        Returns:
+            Dictionary with import status and information
+        """
+        try:
+            owner, repo_name = self.parse_github_url(repo_url)
+            local_path = os.path.join(self.repos_dir, f"{owner}_{repo_name}")
+            
+            with self._clone_lock(local_path):
+                if os.path.exists(local_path):
+                    if not force:
+                        return {
+                            'success': True,
+                            'message': 'Repository already exists',
+                            'path': local_path,
+                            'owner': owner,
+                            'repo': repo_name,
+                            'existed': True
+                        }
+                    self._forget_local_caches(local_path)
+                    shutil.rmtree(local_path)
+                    repo_registry.remove(local_path)
+                
+                if not ref:
+                    info = self.get_repository_info(owner, repo_name)
+                    if 'error' in info:
+                        return {
+                            'success': False,
+                            'error': info['error']
+                        }
+                    ref = info.get('default_branch', 'HEAD')
+                
+                status_code, commit, _ = github_cache.get(
+                    self.session, f"{self.api_base_url}/repos/{owner}/{repo_name}/commits/{ref}"
+                )
+                if status_code != 200:
+                    return {
+                        'success': False,
+                        'error': f'Unknown ref {ref}: GitHub API error {status_code}'
+                    }
+                sha = commit['sha']
+                
+                partial_path = local_path + '.partial'
+                if os.path.exists(partial_path):
+                    shutil.rmtree(partial_path)
+                os.makedirs(partial_path)
+                
+                try:
+                    file_count = self._extract_tarball(
+                        f"{self.api_base_url}/repos/{owner}/{repo_name}/tarball/{sha}", partial_path
+                    )
+                    with open(os.path.join(partial_path, SNAPSHOT_MARKER), 'w', encoding='utf-8') as f:
+                        json.dump({
+                            'owner': owner,
+                            'repo': repo_name,
+                            'ref': ref,
+                            'sha': sha,
+                            'files': file_count
+                        }, f)
+                    os.rename(partial_path, local_path)
+                except BaseException:
+                    shutil.rmtree(partial_path, ignore_errors=True)
+                    raise
+                
+                repo_registry.register(owner, repo_name, local_path)
+                self.index_repository(local_path)
+                self.schedule_disk_budget()
+                
+                return {
+                    'success': True,
+                    'message': 'Repository snapshot imported successfully',
+                    'path': local_path,
+                    'owner': owner,
+                    'repo': repo_name,
+                    'branch': ref,
+                    'commit': sha[:8],
+                    'files': file_count,
+                    'snapshot': True,
+                    'existed': False
+                }
+        
+        except GitHubRateLimited as e:
+            return {
+                'success': False,
+                'error': str(e)
             }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Failed to import repository snapshot: {str(e)}'
+            }
+    
+    def _extract_tarball(self, url: str, target_dir: str) -> int:
+        """Stream a GitHub tarball into a directory, dropping its top-level folder.
+        
+        Args:
+            url: Tarball URL
+            target_dir: Directory to extract into
+            
+        Returns:
+            Number of files extracted
+        """
+        file_count = 0
+        with self.session.get(url, stream=True, timeout=60) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True
+            
+            # 'r|gz' reads the archive sequentially from the socket
+            with tarfile.open(fileobj=response.raw, mode='r|gz') as archive:
+                for member in archive:
+                    # Entries live under '<owner>-<repo>-<sha>/'
+                    _, _, name = member.name.partition('/')
+                    if not name:
+                        continue
+                    member.name = name
+                    if member.islnk():
+                        _, _, member.linkname = member.linkname.partition('/')
+                    
+                    if hasattr(tarfile, 'data_filter'):
+                        try:
+                            archive.extract(member, target_dir, filter='data')
+                        except tarfile.FilterError as e:
+                            print(f"Skipping unsafe tarball entry {member.name}: {e}")
+                            continue
+                    elif self._safe_tar_member(member, target_dir):
+                        archive.extract(member, target_dir)
+                    else:
+                        print(f"Skipping unsafe tarball entry {member.name}")
+                        continue
+                    if member.isfile():
+                        file_count += 1
+        
+        return file_count
+    
+    @staticmethod
+    def _safe_tar_member(member: tarfile.TarInfo, target_dir: str) -> bool:
+        """Check a tarball entry stays inside the target directory.
+        
+        Used where tarfile has no extraction filters (before Python 3.11.4).
+        """
+        if not (member.isfile() or member.isdir() or member.issym() or member.islnk()):
+            return False
+        if os.path.isabs(member.name) or '..' in member.name.split('/'):
+            return False
+        
+        root = os.path.realpath(target_dir)
+        if member.issym():
+            # Symlinks resolve relative to their own directory
+            link_target = os.path.join(root, os.path.dirname(member.name), member.linkname)
+        elif member.islnk():
+            link_target = os.path.join(root, member.linkname)
+        else:
+            return True
+        if os.path.isabs(member.linkname):
+            return False
+        return os.path.commonpath([root, os.path.normpath(link_target)]) == root
+    
+    def upgrade_snapshot(self, repo_path: str) -> Dict[str, Any]:
+        """Turn a snapshot import into a git clone in place.
+        
+        History is fetched into a new ``.git`` directory and the index is
+        reset to the snapshot's commit without touching the working tree,
+        so edits made to the snapshot show up as local changes.
+        
+        Args:
+            repo_path: Path to local repository
+            
+        Returns:
+            Dictionary with upgrade status and information
+        """
+        marker_path = os.path.join(repo_path, SNAPSHOT_MARKER)
+        try:
+            with self._clone_lock(repo_path):
+                try:
+                    with open(marker_path, 'r', encoding='utf-8') as f:
+                        snapshot = json.load(f)
+                except OSError:
+                    return {
+                        'success': False,
+                        'error': 'Repository is not a snapshot'
+                    }
+                
+                owner, repo_name = snapshot['owner'], snapshot['repo']
+                ref, sha = snapshot['ref'], snapshot['sha']
+                options = self.clone_options()
+                
+                repo = Repo.init(repo_path)
+                try:
+                    repo.create_remote('origin', self._clone_url(owner, repo_name))
+                    fetch_kwargs = {'depth': options['depth']} if options['depth'] else {}
+                    if options['filter']:
+                        fetch_kwargs['filter'] = options['filter']
+                    repo.git.fetch('origin', sha, **fetch_kwargs)
+                    repo.git.fetch('origin', **fetch_kwargs)
+                    
+                    # Point HEAD at the snapshot commit and fill the index, leaving files alone
+                    remote_branches = [remote_ref.name for remote_ref in repo.remote('origin').refs]
+                    if f'origin/{ref}' in remote_branches:
+                        repo.git.checkout('--orphan', ref)
+                        repo.git.reset('--mixed', sha)
+                        repo.git.branch('--set-upstream-to', f'origin/{ref}')
+                    else:
+                        # Tags and commit SHAs end up as a detached HEAD
+                        repo.git.update_ref('--no-deref', 'HEAD', sha)
+                        repo.git.reset('--mixed', sha)
+                    repo.git.config('webagent.depth', str(options['depth']))
+                except Exception:
+                    # Leave a usable snapshot behind rather than a half-made clone
+                    shutil.rmtree(os.path.join(repo_path, '.git'), ignore_errors=True)
+                    raise
+                
+                os.remove(marker_path)
+                registered = repo_registry.register(owner, repo_name, repo_path)
+                
+                return {
+                    'success': True,
+                    'message': 'Snapshot upgraded to a git clone',
+                    'path': repo_path,
+                    'owner': owner,
+                    'repo': repo_name,
+                    'branch': registered['branch'],
+                    'commit': registered['commit']
+                }
+        
+        except GitCommandError as e:
+            return {
+                'success': False,
+                'error': f'Git error: {str(e)}'
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Failed to upgrade snapshot: {str(e)}'
+            }
+    
+    def _eviction_blocker(self, repo_path: str) -> Optional[str]:
+        """Get the reason a repository must not be evicted, or None if it can be.
+        
+        Anything that exists only locally blocks eviction: uncommitted or
+        untracked files, gitignored files such as .env, stashes,
+        commits on no remote branch, and edits to snapshot imports.
+        """
+        marker_path = os.path.join(repo_path, SNAPSHOT_MARKER)
+        if os.path.exists(marker_path):
+            try:
+                with open(marker_path, 'r', encoding='utf-8') as f:
+                    snapshot = json.load(f)
+                marker_mtime = os.stat(marker_path).st_mtime
+            except (OSError, ValueError):
+                return 'unreadable snapshot manifest'
+            
+            file_count = 0
+            for root, _, files in os.walk(repo_path):
+                for name in files:
+                    full_path = os.path.join(root, name)
+                    if full_path == marker_path or os.path.islink(full_path):
+                        continue
+                    file_count += 1
+                    if os.lstat(full_path).st_mtime > marker_mtime:
+                        return 'edited snapshot files'
+            if file_count != snapshot.get('files'):
+                return 'added or deleted snapshot files'
+            return None
+        
+        try:
+            repo = Repo(repo_path)
+            if repo.git.status('--porcelain'):
+                return 'uncommitted changes'
+            if self._local_ignored_files(repo):
+                return 'gitignored local files'
+            if repo.git.stash('list'):
+                return 'stashed changes'
+            if int(repo.git.rev_list('--count', 'HEAD', '--branches', '--not', '--remotes')):
+                return 'unpushed commits'
+        except (GitCommandError, ValueError) as e:
+            return f'could not inspect repository: {str(e)}'
+        return None
+    
+    @staticmethod
+    def _local_ignored_files(repo: Repo) -> List[str]:
+        """Get the gitignored paths that may hold local edits, such as .env files.
+        
+        Clones never contain ignored files, so these were all made locally.
+        Dependency and cache directories (IGNORED_NAMES) can be rebuilt and
+        are left out.
+        """
+        output = repo.git.ls_files('--others', '--ignored', '--exclude-standard', '--directory', '-z')
+        return [
+            path for path in output.split('\0')
+            if path and not IGNORED_NAMES.intersection(path.rstrip('/').split('/'))
+        ]
+    
+    def _eviction_manifest(self, repo_path: str, owner: str, repo_name: str) -> Dict[str, Any]:
+        """Record what is needed to bring an evicted repository back."""
+        manifest = {'url': f"https://github.com/{owner}/{repo_name}"}
+        
+        marker_path = os.path.join(repo_path, SNAPSHOT_MARKER)
+        if os.path.exists(marker_path):
+            with open(marker_path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            manifest.update(snapshot=True, ref=snapshot['ref'], sha=snapshot['sha'])
+            return manifest
+        
+        repo = Repo(repo_path)
+        
+        def git_config(*args: str) -> str:
+            try:
+                return repo.git.config(*args)
+            except GitCommandError:
+                return ''
+        
+        sparse_paths = []
+        if git_config('--bool', 'core.sparseCheckout') == 'true':
+            sparse_paths = [path for path in repo.git.sparse_checkout('list').splitlines() if path]
+        
+        manifest.update(
+            snapshot=False,
+            ref=None if repo.head.is_detached else repo.active_branch.name,
+            sha=repo.head.commit.hexsha,
+            depth=self._clone_depth(repo),
+            filter=git_config('--get', 'remote.origin.partialclonefilter') or None,
+            sparse_paths=sparse_paths,
+            shared_objects=os.path.exists(os.path.join(repo.git_dir, 'objects', 'info', 'alternates'))
+        )
+        return manifest
+    
+    def evict_repository(self, owner: str, repo_name: str) -> Dict[str, Any]:
+        """Delete a clone's files, keeping a manifest to restore it from.
+        
+        Args:
+            owner: Repository owner
+            repo_name: Repository name
+            
+        Returns:
+            Eviction result with the bytes freed
+        """
+        repo = repo_registry.get(owner, repo_name)
+        if repo is None or repo['evicted']:
+            return {
+                'success': False,
+                'error': 'Repository not found locally'
+            }
+        
+        repo_path = repo['path']
+        try:
+            with self._clone_lock(repo_path):
+                blocker = self._eviction_blocker(repo_path)
+                if blocker:
+                    return {
+                        'success': False,
+                        'error': f'Repository has {blocker}'
+                    }
+                
+                manifest = self._eviction_manifest(repo_path, owner, repo_name)
+                freed = self._disk_usage(repo_path)
+                
+                self._forget_local_caches(repo_path)
+                shutil.rmtree(repo_path)
+                repo_registry.mark_evicted(owner, repo_name, manifest)
+            
+            return {
+                'success': True,
+                'message': 'Repository evicted',
+                'path': repo_path,
+                'bytes_freed': freed
+            }
+        
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Failed to evict repository: {str(e)}'
+            }
+    
+    def rehydrate_repository(
+        self,
+        owner: str,
+        repo_name: str,
+        progress: Optional[RemoteProgress] = None
+    ) -> Dict[str, Any]:
+        """Clone or re-import an evicted repository from its manifest.
+        
+        Args:
+            owner: Repository owner
+            repo_name: Repository name
+            progress: Optional GitPython progress handler for the clone
+            
+        Returns:
+            Clone or import result
+        """
+        entry = next(
+            (item for item in repo_registry.entries()
+             if item['owner'] == owner and item['repo'] == repo_name and item['evicted']),
+            None
+        )
+        if entry is None:
+            return {
+                'success': False,
+                'error': 'Repository is not evicted'
+            }
+        
+        manifest = entry['manifest'] or {}
+        url = manifest.get('url', f"https://github.com/{owner}/{repo_name}")
+        if manifest.get('snapshot'):
+            return self.import_snapshot(url, ref=manifest.get('ref'))
+        
+        result = self.clone_repository(
+            url,
+            progress=progress,
+            depth=manifest.get('depth'),
+            filter_spec=manifest.get('filter'),
+            sparse_paths=manifest.get('sparse_paths'),
+            shared_objects=manifest.get('shared_objects')
+        )
+        
+        ref = manifest.get('ref')
+        if result.get('success') and ref and result.get('branch') != ref:
+            # Evicted while on another branch than the default one
+            try:
+                repo = Repo(result['path'])
+                fetch_kwargs = {'depth': manifest['depth']} if manifest.get('depth') else {}
+                repo.git.fetch('origin', f'+refs/heads/{ref}:refs/remotes/origin/{ref}', **fetch_kwargs)
+                repo.git.checkout('-B', ref, '--track', f'origin/{ref}')
+                result['branch'] = ref
+                result['commit'] = repo.head.commit.hexsha[:8]
+                repo_registry.register(owner, repo_name, result['path'])
+            except GitCommandError as e:
+                result['warning'] = f'Could not check out branch {ref}: {str(e)}'
+        return result
+    
+    def enforce_disk_budget(self) -> List[Dict[str, Any]]:
+        """Evict least recently used repositories until the budget is met.
+        
+        ``storage.disk_budget_mb`` sets the budget (0 disables eviction).
+        Repositories used within ``storage.min_idle_seconds``, those with
+        an open change feed and those with local-only changes are never
+        evicted.
+        
+        Returns:
+            Eviction results, least recently used first
+        """
+        budget = config.get('storage.disk_budget_mb', 0) * 1024 * 1024
+        if not budget:
+            return []
+        
+        from src.fs_watcher import file_watcher
+        
+        min_idle = config.get('storage.min_idle_seconds', 3600)
+        repos_dir = os.path.abspath(self.repos_dir)
+        # An open editor keeps its repository's file events subscribed
+        watched = {path for path, watch in file_watcher.stats().items() if watch['subscribers']}
+        entries = [
+            entry for entry in repo_registry.entries()
+            if not entry['evicted'] and os.path.dirname(os.path.abspath(entry['path'])) == repos_dir
+            and os.path.abspath(entry['path']) not in watched
+        ]
+        
+        sizes = {(entry['owner'], entry['repo']): self._disk_usage(entry['path']) for entry in entries}
+        total = sum(sizes.values())
+        
+        results = []
+        now = time.time()
+        for entry in sorted(entries, key=lambda item: item['last_accessed'] or 0):
+            if total <= budget:
+                break
+            if now - (entry['last_accessed'] or 0) < min_idle:
+                continue
+            
+            result = self.evict_repository(entry['owner'], entry['repo'])
+            result.update(owner=entry['owner'], repo=entry['repo'])
+            results.append(result)
+            if result['success']:
+                total -= sizes[(entry['owner'], entry['repo'])]
+        
+        return results
+    
+    def schedule_disk_budget(self) -> None:
+        """Enforce the disk budget in the background, once at a time."""
+        if not config.get('storage.disk_budget_mb', 0):
+            return
+        if not self._budget_lock.acquire(blocking=False):
+            return
+        
+        def run():
+            try:
+                for result in self.enforce_disk_budget():
+                    if result['success']:
+                        print(f"Evicted {result['owner']}/{result['repo']} ({result['bytes_freed']} bytes)")
+            except Exception as e:
+                print(f"Failed to enforce disk budget: {e}")
+            finally:
+                self._budget_lock.release()
+        
+        threading.Thread(target=run, daemon=True).start()
     
     def get_repository_info(self, owner: str, repo_name: str) -> Dict[str, Any]:
         """Get repository information from GitHub API.
@@ -122,59 +1248,68 @@ class GitHubClient:
         """
         try:
             url = f"{self.api_base_url}/repos/{owner}/{repo_name}"
-            response = requests.get(url, headers=self.headers, timeout=30)
+            status_code, body, _ = github_cache.get(self.session, url, timeout=30)
             
-            if response.status_code == 200:
-                return response.json()
+            if status_code == 200:
+                return body
             else:
                 return {
-                    'error': f'GitHub API error: {response.status_code}',
-                    'message': response.text
+                    'error': f'GitHub API error: {status_code}',
+                    'message': body
                 }
         
+        except GitHubRateLimited as e:
+            return {
+                'error': str(e),
+                'reset_at': e.reset_at
+            }
         except Exception as e:
             return {
                 'error': f'Failed to fetch repository info: {str(e)}'
             }
     
+    def connection_stats(self) -> Dict[str, Any]:
+        """Get connection reuse counters for GitHub API requests.
+        
+        Returns:
+            Dictionary with requests sent, connections opened and reused
+        """
+        return session_stats(self.session)
+    
     def list_local_repositories(self) -> List[Dict[str, Any]]:
         """List all locally cloned repositories.
         
         Returns:
             List of repository information dictionaries
         """
-        repos = []
-        
-        try:
-            for item in os.listdir(self.repos_dir):
-                repo_path = os.path.join(self.repos_dir, item)
-                if os.path.isdir(repo_path) and os.path.exists(os.path.join(repo_path, '.git')):
-                    try:
-                        repo = Repo(repo_path)
-                        
-                        # Parse owner and repo name from directory name
-                        if '_' in item:
-                            owner, repo_name = item.split('_', 1)
-                        else:
-                            owner, repo_name = 'unknown', item
-                        
-                        repos.append({
-                            'owner': owner,
-                            'repo': repo_name,
-                            'path': repo_path,
-                            'branch': repo.active_branch.name if repo.active_branch else 'unknown',
-                            'commit': repo.head.commit.hexsha[:8] if repo.head.commit else 'unknown',
-                            'last_modified': os.path.getmtime(repo_path)
-                        })
-                    
-                    except Exception as e:
-                        # Skip invalid repositories
-                        continue
+        repos = repo_registry.list_repositories(self.repos_dir)
+        return sorted(repos, key=lambda x: x.get('last_modified', 0), reverse=True)
+    
+    def find_repository(self, owner: str, repo_name: str) -> Optional[Dict[str, Any]]:
+        """Find a locally cloned repository by owner and name.
         
-        except Exception as e:
-            pass
+        Args:
+            owner: Repository owner
+            repo_name: Repository name
+            
+        Returns:
+            Repository information dictionary, or None if not cloned
+        """
+        repo = repo_registry.get(owner, repo_name)
+        if repo is None:
+            # Clones made before the registry existed are registered on listing
+            repo_registry.list_repositories(self.repos_dir)
+            repo = repo_registry.get(owner, repo_name)
+        return repo
+    
+    def touch_repository(self, owner: str, repo_name: str) -> None:
+        """Mark a repository as recently used so it is evicted last.
         
-        return sorted(repos, key=lambda x: x.get('last_modified', 0), reverse=True)
+        Args:
+            owner: Repository owner
+            repo_name: Repository name
+        """
+        repo_registry.touch(owner, repo_name)
     
     def get_file_tree(self, repo_path: str, max_depth: int = 10) -> List[Dict[str, Any]]:
         """Get file tree structure of a repository.
@@ -186,66 +1321,160 @@ class GitHubClient:
         Returns:
             List of file/directory information
         """
-        if not os.path.exists(repo_path):
-            return []
+        return file_tree_cache.get_tree(repo_path, max_depth=max_depth)
+    
+    def get_versioned_file_tree(self, repo_path: str, max_depth: int = 10) -> Tuple[int, List[Dict[str, Any]]]:
+        """Get file tree structure of a repository with its tree version.
         
-        file_tree = []
-        allowed_extensions = config.get('filesystem.allowed_extensions', [])
+        Args:
+            repo_path: Path to local repository
+            max_depth: Maximum directory depth to traverse
+            
+        Returns:
+            Tuple of (tree version, list of file/directory information)
+        """
+        return file_tree_cache.get_versioned_tree(repo_path, max_depth=max_depth)
+    
+    def get_file_tree_changes(self, repo_path: str, since: int) -> Optional[Dict[str, Any]]:
+        """Get file tree entries added, removed or resized after a tree version.
         
-        def should_include_file(file_path: str) -> bool:
-            """Check if file should be included based on extension."""
-            if not allowed_extensions:
-                return True
+        Args:
+            repo_path: Path to local repository
+            since: Tree version the caller holds
             
-            _, ext = os.path.splitext(file_path)
-            return ext.lower() in allowed_extensions
+        Returns:
+            Current version and changes, or None if the caller must reload
+        """
+        return file_tree_cache.changes_since(repo_path, since)
+    
+    def list_directory(
+        self,
+        repo_path: str,
+        dir_path: str = '',
+        cursor: Optional[str] = None,
+        limit: int = 500
+    ) -> Optional[Dict[str, Any]]:
+        """Get one page of a single directory's children.
         
-        def traverse_directory(dir_path: str, relative_path: str = "", depth: int = 0):
-            """Recursively traverse directory structure."""
-            if depth > max_depth:
-                return
+        Args:
+            repo_path: Path to local repository
+            dir_path: Relative directory path ('' for the root)
+            cursor: next_cursor of the previous page
+            limit: Maximum number of entries to return
             
-            try:
-                items = sorted(os.listdir(dir_path))
+        Returns:
+            Directory page, or None if the directory does not exist
+        """
+        return file_tree_cache.list_directory(repo_path, dir_path, cursor=cursor, limit=limit)
+    
+    def index_repository(self, repo_path: str) -> None:
+        """Build or refresh the search and retrieval indexes in the background.
+        
+        Args:
+            repo_path: Path to local repository
+        """
+        key = os.path.abspath(repo_path)
+        with self._indexing_lock:
+            if key in self._indexing:
+                # Changes may have landed after the running build listed the files
+                self._reindex.add(key)
+                return
+            self._indexing.add(key)
+        
+        def build():
+            while True:
+                try:
+                    file_paths = [
+                        item['path'] for item in self.get_file_tree(repo_path)
+                        if item['type'] == 'file'
+                    ]
+                    content_index.sync(repo_path, file_paths)
+                    retrieval_index.sync(repo_path, file_paths)
+                except Exception as e:
+                    print(f"Failed to index repository {repo_path}: {e}")
                 
-                for item in items:
-                    # Skip hidden files and common ignore patterns
-                    if item.startswith('.') and item not in ['.gitignore', '.env']:
-                        continue
-                    if item in ['node_modules', '__pycache__', '.git', 'venv', 'env']:
-                        continue
-                    
-                    item_path = os.path.join(dir_path, item)
-                    item_relative = os.path.join(relative_path, item) if relative_path else item
-                    
-                    if os.path.isdir(item_path):
-                        file_tree.append({
-                            'name': item,
-                            'path': item_relative,
-                            'type': 'directory',
-                            'size': None
-                        })
-                        traverse_directory(item_path, item_relative, depth + 1)
-                    
-                    elif os.path.isfile(item_path) and should_include_file(item):
-                        try:
-                            size = os.path.getsize(item_path)
-                            file_tree.append({
-                                'name': item,
-                                'path': item_relative,
-                                'type': 'file',
-                                'size': size
-                            })
-                        except OSError:
-                            # Skip files that can't be accessed
-                            continue
+                with self._indexing_lock:
+                    if key not in self._reindex:
+                        self._indexing.discard(key)
+                        return
+                    self._reindex.discard(key)
+        
+        threading.Thread(target=build, daemon=True).start()
+    
+    def index_paths(self, repo_path: str, paths: Optional[Iterable[str]]) -> None:
+        """Bring the search and retrieval indexes up to date with changed paths.
+        
+        Changed directories are walked for files that are new or changed
+        since they were indexed; missing paths are dropped together with
+        anything indexed below them. Unchanged files are never read again.
+        
+        Args:
+            repo_path: Path to local repository
+            paths: Relative paths of changed files and directories, or None
+                if they are not known and the whole repository is resynced
+        """
+        if paths is None:
+            self.index_repository(repo_path)
+            return
+        
+        updated = []
+        removed = []
+        for path in paths:
+            full_path = os.path.join(repo_path, path)
+            if os.path.isdir(full_path):
+                for root, dirs, files in os.walk(full_path):
+                    dirs[:] = [name for name in dirs if FileTreeCache.should_include(name, True)]
+                    rel_root = os.path.relpath(root, repo_path)
+                    updated.extend(
+                        name if rel_root == '.' else os.path.join(rel_root, name)
+                        for name in files if FileTreeCache.should_include(name, False)
+                    )
+            elif os.path.isfile(full_path):
+                updated.append(path)
+            else:
+                removed.append(path)
+        
+        try:
+            content_index.update_files(repo_path, updated)
+            retrieval_index.update_files(repo_path, updated)
+            for path in removed:
+                content_index.remove_file(repo_path, path)
+                retrieval_index.remove_file(repo_path, path)
+        except Exception as e:
+            print(f"Failed to index changes in {repo_path}: {e}")
+    
+    def _materialize(self, repo_path: str, file_path: str) -> bool:
+        """Check out a file left out of a sparse clone.
+        
+        The file's directory is added to the sparse checkout; in a partial
+        clone git fetches the missing blobs from the remote on demand.
+        
+        Args:
+            repo_path: Path to local repository
+            file_path: Relative path to file within repository
             
-            except PermissionError:
-                # Skip directories without permission
-                pass
+        Returns:
+            True if the file now exists in the working tree
+        """
+        try:
+            repo = Repo(repo_path)
+            if repo.git.config('--bool', 'core.sparseCheckout') != 'true':
+                return False
+            
+            rel_path = os.path.normpath(file_path).replace(os.sep, '/')
+            # Only widen the checkout for paths that exist at HEAD
+            repo.git.cat_file('-e', f'HEAD:{rel_path}')
+            
+            rel_dir = os.path.dirname(rel_path)
+            if not rel_dir:
+                return False
+            repo.git.sparse_checkout('add', rel_dir)
+        except (GitCommandError, ValueError, OSError):
+            return False
         
-        traverse_directory(repo_path)
-        return file_tree
+        file_tree_cache.file_written(repo_path, file_path)
+        self.index_repository(repo_path)
+        return os.path.isfile(os.path.join(repo_path, file_path))
     
     def read_file(self, repo_path: str, file_path: str) -> Dict[str, Any]:
         """Read content of a file in the repository.
@@ -266,7 +1495,7 @@ class GitHubClient:
                 'error': 'File path outside repository'
             }
         
-        if not os.path.exists(full_path):
+        if not os.path.exists(full_path) and not self._materialize(repo_path, file_path):
             return {
                 'success': False,
                 'error': 'File not found'
@@ -286,18 +1515,23 @@ class GitHubClient:
             if file_size > max_size:
                 return {
                     'success': False,
-                    'error': f'File too large ({file_size} bytes, max {max_size} bytes)'
+                    'error': f'File too large ({file_size} bytes, max {max_size} bytes)',
+                    # Still readable in line windows
+                    'large': True
                 }
             
             # Try to read as text
             try:
                 with open(full_path, 'r', encoding='utf-8') as f:
+                    # Tag of the version being read, not of an earlier stat
+                    etag = self.file_etag(os.fstat(f.fileno()))
                     content = f.read()
                 
                 return {
                     'success': True,
                     'content': content,
                     'size': file_size,
+                    'etag': etag,
                     'encoding': 'utf-8',
                     'binary': False
                 }
@@ -315,6 +1549,109 @@ class GitHubClient:
                 'error': f'Failed to read file: {str(e)}'
             }
     
+    @staticmethod
+    def file_etag(stat: os.stat_result) -> str:
+        """Get the entity tag of a working tree file from its inode, mtime and size."""
+        return f'{stat.st_ino:x}-{stat.st_mtime_ns:x}-{stat.st_size:x}'
+    
+    def stat_file(self, repo_path: str, file_path: str) -> Dict[str, Any]:
+        """Get the location, size and entity tag of a file without reading it.
+        
+        Args:
+            repo_path: Path to local repository
+            file_path: Relative path to file within repository
+            
+        Returns:
+            File metadata including its absolute 'full_path' and 'etag'
+        """
+        full_path = os.path.join(repo_path, file_path)
+        
+        # Security check: ensure file is within repository
+        if not os.path.abspath(full_path).startswith(os.path.join(os.path.abspath(repo_path), '')):
+            return {
+                'success': False,
+                'error': 'File path outside repository'
+            }
+        
+        if not os.path.exists(full_path) and not self._materialize(repo_path, file_path):
+            return {
+                'success': False,
+                'error': 'File not found'
+            }
+        
+        if not os.path.isfile(full_path):
+            return {
+                'success': False,
+                'error': 'Path is not a file'
+            }
+        
+        stat = os.stat(full_path)
+        return {
+            'success': True,
+            'full_path': os.path.abspath(full_path),
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'etag': self.file_etag(stat)
+        }
+    
+    def read_lines(self, repo_path: str, file_path: str, start: int, end: Optional[int] = None) -> Dict[str, Any]:
+        """Read a range of lines of a file, stopping at the last one requested.
+        
+        Args:
+            repo_path: Path to local repository
+            file_path: Relative path to file within repository
+            start: First line to read (1-based)
+            end: Last line to read, inclusive (None for the rest of the file)
+            
+        Returns:
+            The lines' content and range, and whether the file ends there
+        """
+        result = self.stat_file(repo_path, file_path)
+        if not result['success']:
+            return result
+        
+        max_size = config.get('filesystem.max_file_size', 10) * 1024 * 1024
+        lines = []
+        read_size = 0
+        eof = True
+        
+        try:
+            with open(result['full_path'], 'r', encoding='utf-8', newline='') as f:
+                for line_number, line in enumerate(f, 1):
+                    if end is not None and line_number > end:
+                        eof = False
+                        break
+                    if line_number < start:
+                        continue
+                    read_size += len(line)
+                    if read_size > max_size:
+                        return {
+                            'success': False,
+                            'error': f'Line range too large (max {max_size} bytes)'
+                        }
+                    lines.append(line)
+        except UnicodeDecodeError:
+            return {
+                'success': False,
+                'error': 'Binary file not supported for editing'
+            }
+        except OSError as e:
+            return {
+                'success': False,
+                'error': f'Failed to read file: {str(e)}'
+            }
+        
+        return {
+            'success': True,
+            'content': ''.join(lines),
+            'start_line': start,
+            'end_line': start + len(lines) - 1,
+            'eof': eof,
+            'size': result['size'],
+            'etag': result['etag'],
+            'encoding': 'utf-8'
+        }
+    
     def write_file(self, repo_path: str, file_path: str, content: str) -> Dict[str, Any]:
         """Write content to a file in the repository.
         
@@ -343,6 +1680,10 @@ class GitHubClient:
             with open(full_path, 'w', encoding='utf-8') as f:
                 f.write(content)
             
+            file_tree_cache.file_written(repo_path, file_path)
+            content_index.update_file(repo_path, file_path)
+            retrieval_index.update_file(repo_path, file_path)
+            
             return {
                 'success': True,
                 'message': 'File saved successfully',
@@ -354,6 +1695,54 @@ class GitHubClient:
                 'success': False,
                 'error': f'Failed to write file: {str(e)}'
             }
+    
+    def delete_file(self, repo_path: str, file_path: str) -> Dict[str, Any]:
+        """Delete a file in the repository.
+        
+        Args:
+            repo_path: Path to local repository
+            file_path: Relative path to file within repository
+        
+        Returns:
+            Delete operation result
+        """
+        full_path = os.path.join(repo_path, file_path)
+        
+        # Security check: ensure file is within repository
+        if not os.path.abspath(full_path).startswith(os.path.abspath(repo_path)):
+            return {
+                'success': False,
+                'error': 'File path outside repository'
+            }
+        
+        if not os.path.exists(full_path):
+            return {
+                'success': False,
+                'error': 'File not found'
+            }
+        
+        if not os.path.isfile(full_path):
+            return {
+                'success': False,
+                'error': 'Path is not a file'
+            }
+        
+        try:
+            os.remove(full_path)
+            file_tree_cache.file_deleted(repo_path, file_path)
+            content_index.remove_file(repo_path, file_path)
+            retrieval_index.remove_file(repo_path, file_path)
+            
+            return {
+                'success': True,
+                'message': 'File deleted successfully'
+            }
+        
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Failed to delete file: {str(e)}'
+            }
 
 
 # Global GitHub client instance
@@ -0,0 +1,96 @@
+"""Pooled keep-alive HTTP sessions for external API clients."""
+
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict, Any
+from src.config import config
+
+
+class CountingHTTPAdapter(HTTPAdapter):
+    """HTTP adapter that counts requests and opened connections.
+    
+    urllib3 counts the connections each host pool opens, so every request
+    beyond that number went over a reused keep-alive connection.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        self._requests_sent = 0
+        self._counter_lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+    
+    def send(self, request, *args, **kwargs):
+        """Send a request and count it."""
+        with self._counter_lock:
+            self._requests_sent += 1
+        return super().send(request, *args, **kwargs)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get request and connection counters.
+        
+        Returns:
+            Dictionary with requests sent, connections opened and reused
+        """
+        pools = self.poolmanager.pools
+        connections = 0
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                connections += pool.num_connections
+        
+        with self._counter_lock:
+            sent = self._requests_sent
+        
+        return {
+            'requests': sent,
+            'connections_opened': connections,
+            'connections_reused': max(sent - connections, 0)
+        }
+
+
+def create_session(headers: Dict[str, str]) -> requests.Session:
+    """Create a pooled session with keep-alive and retries.
+    
+    Pool sizes and the retry policy come from the ``http`` config section.
+    Only idempotent requests are retried on read errors and retryable
+    status codes; connection errors are retried for every method.
+    
+    Args:
+        headers: Default headers sent with every request
+    
+    Returns:
+        Configured requests session
+    """
+    retry = Retry(
+        total=config.get('http.max_retries', 3),
+        backoff_factor=config.get('http.backoff_factor', 0.5),
+        status_forcelist=(429, 500, 502, 503, 504),
+        raise_on_status=False
+    )
+    adapter = CountingHTTPAdapter(
+        pool_connections=config.get('http.pool_connections', 4),
+        pool_maxsize=config.get('http.pool_maxsize', 16),
+        max_retries=retry
+    )
+    
+    session = requests.Session()
+    session.headers.update(headers)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def session_stats(session: requests.Session) -> Dict[str, Any]:
+    """Get connection reuse counters of a session created by create_session.
+    
+    Args:
+        session: Session to inspect
+    
+    Returns:
+        Dictionary with requests sent, connections opened and reused
+    """
+    adapter = session.get_adapter('https://')
+    if isinstance(adapter, CountingHTTPAdapter):
+        return adapter.stats()
+    return {}
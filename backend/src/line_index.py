@@ -0,0 +1,272 @@
+"""Sparse line-offset indexes for reading windows of large files."""
+
+import hashlib
+import mmap
+import os
+import re
+import shutil
+import struct
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Tuple
+from src.config import config
+
+# Bytes inspected for NUL bytes before a file is treated as binary
+BINARY_SNIFF_BYTES = 8192
+
+# magic, format version, mtime_ns, size, stride, total lines, offset count
+INDEX_HEADER = struct.Struct('<4sIQQIQQ')
+INDEX_MAGIC = b'WALI'
+INDEX_VERSION = 1
+
+
+class _FileLines:
+    """Byte offsets of every stride-th line of one file version."""
+    
+    def __init__(self, mtime_ns: int, size: int, stride: int, total_lines: int, offsets: array):
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.stride = stride
+        self.total_lines = total_lines
+        # offsets[i] is where line i * stride + 1 starts
+        self.offsets = offsets
+
+
+class LineIndex:
+    """Serves line windows of files too large to read whole.
+    
+    The first request for a file scans it once through mmap and records
+    the byte offset of every ``large_files.index_stride``-th line. The
+    index is written next to the search index, keyed by the file's mtime
+    and size, so it survives restarts and is rebuilt when the file
+    changes. A window then seeks to the nearest recorded line and skips
+    at most one stride, so its cost depends on the window, not the file.
+    Only the small offset arrays are kept in memory.
+    """
+    
+    def __init__(self):
+        """Initialize line index with configuration."""
+        self.index_dir = os.path.abspath(config.index_directory)
+        self.stride = config.get('large_files.index_stride', 1000)
+        self.max_window_lines = config.get('large_files.max_window_lines', 5000)
+        self.max_line_length = config.get('large_files.max_line_length', 10000)
+        self.max_cached = config.get('large_files.max_cached_indexes', 32)
+        
+        self._indexes: "OrderedDict[str, _FileLines]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self._stride_pattern = re.compile(b'(?:[^\n]*\n){%d}' % self.stride)
+    
+    def _index_path(self, repo_path: str, file_path: str) -> str:
+        """Get path of the on-disk index of a file."""
+        digest = hashlib.sha1(os.path.normpath(file_path).encode('utf-8')).hexdigest()
+        return os.path.join(self.index_dir, os.path.basename(os.path.abspath(repo_path)), 'lines', f'{digest}.idx')
+    
+    def _load(self, index_path: str, stat: os.stat_result) -> Optional[_FileLines]:
+        """Read an on-disk index if it matches the file's current version."""
+        try:
+            with open(index_path, 'rb') as f:
+                header = f.read(INDEX_HEADER.size)
+                if len(header) != INDEX_HEADER.size:
+                    return None
+                magic, version, mtime_ns, size, stride, total_lines, count = INDEX_HEADER.unpack(header)
+                if (magic, version, mtime_ns, size, stride) != (
+                        INDEX_MAGIC, INDEX_VERSION, stat.st_mtime_ns, stat.st_size, self.stride):
+                    return None
+                offsets = array('Q')
+                offsets.fromfile(f, count)
+                return _FileLines(mtime_ns, size, stride, total_lines, offsets)
+        except (OSError, EOFError):
+            return None
+    
+    def _build(self, full_path: str, stat: os.stat_result) -> _FileLines:
+        """Scan a file for the offsets of every stride-th line."""
+        offsets = array('Q', [0])
+        total_lines = 0
+        
+        if stat.st_size:
+            with open(full_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if b'\0' in data[:BINARY_SNIFF_BYTES]:
+                    raise ValueError('Binary file not supported')
+                
+                # Each match covers exactly one stride of lines, matched in C.
+                # Anchored, so a short tail is tried once rather than at every byte.
+                end = 0
+                while True:
+                    match = self._stride_pattern.match(data, end)
+                    if match is None:
+                        break
+                    end = match.end()
+                    offsets.append(end)
+                total_lines = (len(offsets) - 1) * self.stride
+                
+                # Fewer than a stride of lines are left after the last match
+                pos = end
+                while True:
+                    newline = data.find(b'\n', pos)
+                    if newline == -1:
+                        break
+                    total_lines += 1
+                    pos = newline + 1
+                if pos < stat.st_size:
+                    total_lines += 1
+            
+            # The last offset is the end of the file when it ends on a stride
+            if offsets[-1] == stat.st_size:
+                offsets.pop()
+        
+        return _FileLines(stat.st_mtime_ns, stat.st_size, self.stride, total_lines, offsets)
+    
+    def _save(self, index_path: str, lines: _FileLines) -> None:
+        """Write an index to disk, replacing any older one atomically."""
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        tmp_path = f'{index_path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, lines.mtime_ns, lines.size,
+                                      lines.stride, lines.total_lines, len(lines.offsets)))
+            lines.offsets.tofile(f)
+        os.replace(tmp_path, index_path)
+    
+    def _get(self, repo_path: str, file_path: str, full_path: str) -> _FileLines:
+        """Get the current index of a file from memory, disk or a fresh scan."""
+        stat = os.stat(full_path)
+        key = os.path.abspath(full_path)
+        
+        with self._lock:
+            lines = self._indexes.get(key)
+            if lines and (lines.mtime_ns, lines.size) == (stat.st_mtime_ns, stat.st_size):
+                self._indexes.move_to_end(key)
+                return lines
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+        
+        # One scan per file even when several windows are requested at once
+        with build_lock:
+            with self._lock:
+                lines = self._indexes.get(key)
+            if not lines or (lines.mtime_ns, lines.size) != (stat.st_mtime_ns, stat.st_size):
+                index_path = self._index_path(repo_path, file_path)
+                lines = self._load(index_path, stat)
+                if lines is None:
+                    lines = self._build(full_path, stat)
+                    try:
+                        self._save(index_path, lines)
+                    except OSError as e:
+                        print(f"Failed to save line index of {full_path}: {e}")
+        
+        with self._lock:
+            self._indexes[key] = lines
+            self._indexes.move_to_end(key)
+            while len(self._indexes) > self.max_cached:
+                self._indexes.popitem(last=False)
+            # Threads already waiting hold the lock; later ones find the index
+            if self._build_locks.get(key) is build_lock:
+                del self._build_locks[key]
+        return lines
+    
+    def _decode_line(self, data, start: int, end: int) -> Tuple[str, bool]:
+        """Decode a line, cut at the maximum length."""
+        truncated = end - start > self.max_line_length
+        raw = bytes(data[start:start + self.max_line_length if truncated else end])
+        return raw.decode('utf-8', errors='replace').rstrip('\r'), truncated
+    
+    def read_window(
+        self,
+        repo_path: str,
+        file_path: str,
+        start: int,
+        end: Optional[int] = None,
+        query: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Read a window of lines of a file through its line index.
+        
+        Args:
+            repo_path: Path to local repository
+            file_path: Relative path to file within repository
+            start: First line to read (1-based)
+            end: Last line to read, inclusive (capped at
+                large_files.max_window_lines lines)
+            query: Case-insensitive text to find within the window
+        
+        Returns:
+            The window's content and range, the file's total line count
+            and, with a query, the matching lines and columns
+        """
+        full_path = os.path.join(repo_path, file_path)
+        try:
+            lines = self._get(repo_path, file_path, full_path)
+        except ValueError as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+        except OSError as e:
+            return {
+                'success': False,
+                'error': f'Failed to index file: {str(e)}'
+            }
+        
+        last = start + self.max_window_lines - 1
+        if end is not None:
+            last = min(end, last)
+        last = min(last, lines.total_lines)
+        
+        window: List[str] = []
+        truncated = False
+        matches: List[Dict[str, int]] = []
+        needle = query.lower() if query else None
+        
+        if start <= last:
+            with open(full_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                # Jump to the closest indexed line, then skip less than a stride
+                slot = min((start - 1) // lines.stride, len(lines.offsets) - 1)
+                pos = lines.offsets[slot]
+                skip = start - 1 - slot * lines.stride
+                if skip:
+                    match = re.compile(b'(?:[^\n]*\n){%d}' % skip).match(data, pos)
+                    pos = match.end() if match else len(data)
+                
+                for line_number in range(start, last + 1):
+                    line_end = data.find(b'\n', pos)
+                    if line_end == -1:
+                        line_end = len(data)
+                    text, cut = self._decode_line(data, pos, line_end)
+                    truncated = truncated or cut
+                    window.append(text)
+                    
+                    if needle:
+                        column = text.lower().find(needle)
+                        if column != -1:
+                            matches.append({'line': line_number, 'column': column + 1})
+                    pos = line_end + 1
+        
+        result = {
+            'success': True,
+            'content': '\n'.join(window) + ('\n' if window else ''),
+            'start_line': start,
+            'end_line': start + len(window) - 1,
+            'total_lines': lines.total_lines,
+            'eof': start + len(window) > lines.total_lines,
+            'truncated': truncated,
+            'size': lines.size,
+            'encoding': 'utf-8'
+        }
+        if query:
+            result['matches'] = matches
+        return result
+    
+    def drop(self, repo_path: str) -> None:
+        """Delete the line indexes of a repository's files.
+        
+        Args:
+            repo_path: Path to local repository
+        """
+        prefix = os.path.join(os.path.abspath(repo_path), '')
+        with self._lock:
+            for key in [key for key in self._indexes if key.startswith(prefix)]:
+                del self._indexes[key]
+        shutil.rmtree(os.path.dirname(self._index_path(repo_path, '.')), ignore_errors=True)
+
+
+# Global line index instance
+line_index = LineIndex()
@@ -3,6 +3,7 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
+import click
 from flask import Flask, send_from_directory
 from flask_cors import CORS
 from src.models.user import db
@@ -10,6 +11,8 @@ from src.routes.user import user_bp
 from src.routes.chat import chat_bp
 from src.routes.repository import repo_bp
 from src.routes.files import files_bp
+from src.routes.status import status_bp
+from src.github_client import github_client
 from src.config import config
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
@@ -25,6 +28,7 @@ app.register_blueprint(user_bp, url_prefix='/api')
 app.register_blueprint(chat_bp, url_prefix='/api')
 app.register_blueprint(repo_bp, url_prefix='/api')
 app.register_blueprint(files_bp, url_prefix='/api')
+app.register_blueprint(status_bp, url_prefix='/api')
 
 # Database configuration
 app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
@@ -33,6 +37,17 @@ db.init_app(app)
 with app.app_context():
     db.create_all()
 
+@app.cli.command('maintain-mirrors')
+@click.option('--no-fetch', is_flag=True, help='Skip fetching the mirrors before collecting them.')
+def maintain_mirrors(no_fetch):
+    """Garbage collect shared object mirrors and repack the clones using them."""
+    for result in github_client.maintain_mirrors(fetch=not no_fetch):
+        if result['success']:
+            click.echo(f"{result['kind']} {result['path']}: "
+                       f"{result['bytes_before']} -> {result['bytes_after']} bytes")
+        else:
+            click.echo(f"{result['kind']} {result['path']}: {result['error']}", err=True)
+
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
@@ -0,0 +1,30 @@
+from datetime import datetime
+from src.models.user import db
+
+class ChatMessage(db.Model):
+    __table_args__ = (
+        db.Index('ix_chat_message_conversation', 'conversation_id', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    conversation_id = db.Column(db.String(32), nullable=False)
+    role = db.Column(db.String(20), nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f'<ChatMessage {self.id} {self.role}>'
+
+    def to_message(self):
+        return {
+            'role': self.role,
+            'content': self.content
+        }
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'role': self.role,
+            'content': self.content,
+            'created_at': self.created_at.isoformat()
+        }
@@ -1,9 +1,15 @@
 """OpenRouter.ai API client for AI-powered code assistance."""
 
+import hashlib
 import requests
 import json
-from typing import List, Dict, Any, Optional
+import threading
+import time
+from typing import List, Dict, Any, Optional, Iterator, Tuple
 from src.config import config
+from src.http_session import create_session, session_stats
+from src.token_counter import token_counter, MESSAGE_OVERHEAD
+from src.completion_cache import completion_cache
 
 
 class OpenRouterClient:
@@ -23,6 +29,19 @@ class OpenRouterClient:
             'HTTP-Referer': 'http://localhost:5000',  # Required by OpenRouter
             'X-Title': 'Web Agent IDE'  # Optional but recommended
         }
+        
+        # Keep-alive connection pool shared by all requests to OpenRouter
+        self.session = create_session(self.headers)
+        
+        # Model catalog cache, refreshed in the background once stale
+        self.models_ttl = config.get('openrouter.models_ttl', 3600)
+        self._models_lock = threading.Lock()
+        self._models_fetch_lock = threading.Lock()
+        self._models_body: Optional[bytes] = None
+        self._models_etag: Optional[str] = None
+        self._models_fetched_at = 0.0
+        self._models_refreshing = False
+        self._context_lengths: Dict[str, int] = {}
     
     def chat_completion(
         self,
@@ -56,9 +75,8 @@ class OpenRouterClient:
         }
         
         try:
-            response = requests.post(
+            response = self.session.post(
                 f'{self.base_url}/chat/completions',
-                headers=self.headers,
                 json=payload,
                 timeout=60
             )
@@ -70,6 +88,125 @@ class OpenRouterClient:
         except json.JSONDecodeError as e:
             raise Exception(f"Failed to parse OpenRouter API response: {str(e)}")
     
+    def cache_key(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None
+    ) -> str:
+        """Get the completion cache key of a request after applying defaults.
+        
+        Args:
+            messages: List of message objects with 'role' and 'content'
+            model: Model to use (defaults to configured model)
+            max_tokens: Maximum tokens in response
+            temperature: Sampling temperature
+            
+        Returns:
+            Cache key
+        """
+        return completion_cache.make_key(
+            messages,
+            model or self.default_model,
+            temperature or self.temperature,
+            max_tokens or self.max_tokens
+        )
+    
+    def cached_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        bypass_cache: bool = False
+    ) -> Tuple[Dict[str, Any], str]:
+        """Send chat completion request, answering repeats from the cache.
+        
+        Args:
+            messages: List of message objects with 'role' and 'content'
+            model: Model to use (defaults to configured model)
+            max_tokens: Maximum tokens in response
+            temperature: Sampling temperature
+            bypass_cache: Skip the cache lookup and refresh the entry
+            
+        Returns:
+            Tuple of (API response, cache status 'hit', 'miss', 'bypass' or 'disabled')
+        """
+        if not completion_cache.enabled:
+            return self.chat_completion(messages, model, max_tokens, temperature), 'disabled'
+        
+        key = self.cache_key(messages, model, max_tokens, temperature)
+        if not bypass_cache:
+            cached = completion_cache.get(key)
+            if cached is not None:
+                return cached, 'hit'
+        
+        response = self.chat_completion(messages, model, max_tokens, temperature)
+        if response.get('choices'):
+            completion_cache.put(key, response)
+        return response, 'bypass' if bypass_cache else 'miss'
+    
+    def stream_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Stream chat completion chunks from OpenRouter as they arrive.
+        
+        Args:
+            messages: List of message objects with 'role' and 'content'
+            model: Model to use (defaults to configured model)
+            max_tokens: Maximum tokens in response
+            temperature: Sampling temperature
+            
+        Yields:
+            Parsed completion chunk dictionaries
+        """
+        if not self.api_key:
+            raise ValueError("OpenRouter API key not configured")
+        
+        payload = {
+            'model': model or self.default_model,
+            'messages': messages,
+            'max_tokens': max_tokens or self.max_tokens,
+            'temperature': temperature or self.temperature,
+            'stream': True
+        }
+        
+        try:
+            with self.session.post(
+                f'{self.base_url}/chat/completions',
+                json=payload,
+                timeout=60,
+                stream=True
+            ) as response:
+                response.raise_for_status()
+                
+                for line in response.iter_lines():
+                    # Skip keep-alive blank lines and SSE comments
+                    if not line or line.startswith(b':'):
+                        continue
+                    if not line.startswith(b'data:'):
+                        continue
+                    
+                    data = line[len(b'data:'):].strip()
+                    if data == b'[DONE]':
+                        break
+                    
+                    chunk = json.loads(data.decode('utf-8'))
+                    if 'error' in chunk:
+                        message = chunk['error'].get('message', chunk['error'])
+                        raise Exception(f"OpenRouter API stream error: {message}")
+                    yield chunk
+        
+        except requests.exceptions.RequestException as e:
+            raise Exception(f"OpenRouter API request failed: {str(e)}")
+        except json.JSONDecodeError as e:
+            raise Exception(f"Failed to parse OpenRouter API response: {str(e)}")
+    
     def get_models(self) -> List[Dict[str, Any]]:
         """Get list of available models from OpenRouter.
         
@@ -77,9 +214,8 @@ class OpenRouterClient:
             List of model information dictionaries
         """
         try:
-            response = requests.get(
+            response = self.session.get(
                 f'{self.base_url}/models',
-                headers=self.headers,
                 timeout=30
             )
             response.raise_for_status()
@@ -88,6 +224,68 @@ class OpenRouterClient:
         except requests.exceptions.RequestException as e:
             raise Exception(f"Failed to fetch models: {str(e)}")
     
+    def _refresh_model_catalog(self) -> None:
+        """Fetch the model catalog and store its serialized form."""
+        try:
+            models = self.get_models()
+        except Exception as e:
+            with self._models_lock:
+                self._models_refreshing = False
+                if self._models_body is not None:
+                    # Keep serving the stale catalog; retry in a minute
+                    print(f"Warning: model catalog refresh failed: {e}")
+                    self._models_fetched_at = time.monotonic() - self.models_ttl + 60
+                    return
+            raise
+        
+        body = json.dumps({'models': models}).encode('utf-8')
+        context_lengths = {
+            model['id']: model['context_length']
+            for model in models
+            if model.get('id') and isinstance(model.get('context_length'), int)
+        }
+        
+        with self._models_lock:
+            self._models_body = body
+            self._models_etag = hashlib.sha1(body).hexdigest()
+            self._models_fetched_at = time.monotonic()
+            self._models_refreshing = False
+            self._context_lengths = context_lengths
+    
+    def get_model_catalog(self) -> Tuple[bytes, str]:
+        """Get the cached model catalog as a JSON body with its ETag.
+        
+        A stale catalog (older than ``openrouter.models_ttl``) is still
+        returned while a background thread fetches a fresh one.
+        
+        Returns:
+            Tuple of (JSON body of {'models': [...]}, ETag)
+        """
+        with self._models_lock:
+            if self._models_body is not None:
+                age = time.monotonic() - self._models_fetched_at
+                if age >= self.models_ttl and not self._models_refreshing:
+                    self._models_refreshing = True
+                    threading.Thread(target=self._refresh_model_catalog, daemon=True).start()
+                return self._models_body, self._models_etag
+        
+        # First request: fetch once, other callers wait for the result
+        with self._models_fetch_lock:
+            with self._models_lock:
+                if self._models_body is not None:
+                    return self._models_body, self._models_etag
+            self._refresh_model_catalog()
+            with self._models_lock:
+                return self._models_body, self._models_etag
+    
+    def connection_stats(self) -> Dict[str, Any]:
+        """Get connection reuse counters for OpenRouter requests.
+        
+        Returns:
+            Dictionary with requests sent, connections opened and reused
+        """
+        return session_stats(self.session)
+    
     def create_system_message(self, context: Optional[str] = None) -> Dict[str, str]:
         """Create system message with optional code context.
         
@@ -108,46 +306,244 @@ class OpenRouterClient:
             'content': system_prompt
         }
     
+    def prompt_budget(self, model: Optional[str] = None) -> int:
+        """Get the prompt token budget of a model.
+        
+        The budget is the model's context window (from config, else the
+        cached model catalog) minus the tokens reserved for the completion,
+        capped by ``chat.max_prompt_tokens``.
+        
+        Args:
+            model: Model identifier (defaults to configured model)
+            
+        Returns:
+            Maximum number of prompt tokens
+        """
+        model = model or self.default_model
+        windows = config.get('chat.context_windows', {}) or {}
+        with self._models_lock:
+            catalog_window = self._context_lengths.get(model)
+        window = windows.get(model) or catalog_window or config.get('chat.context_window', 32768)
+        
+        budget = window - self.max_tokens
+        max_prompt_tokens = config.get('chat.max_prompt_tokens')
+        if max_prompt_tokens:
+            budget = min(budget, max_prompt_tokens)
+        return max(budget, 0)
+    
+    def _cursor_region(
+        self,
+        file_content: str,
+        cursor_line: Optional[int],
+        token_budget: int,
+        model: str
+    ) -> Optional[str]:
+        """Get the lines around the cursor that fit into a token budget."""
+        lines = file_content.split('\n')
+        total = len(lines)
+        center = min(max((cursor_line or 1) - 1, 0), total - 1)
+        
+        header = f"File content (lines 1-{total} of {total}):\n```\n```"
+        remaining = token_budget - token_counter.count(header, model)
+        
+        start, end = center, center
+        cost = token_counter.count(lines[center] + '\n', model)
+        if cost > remaining:
+            return None
+        remaining -= cost
+        end += 1
+        
+        # Grow the window alternately below and above the cursor
+        while start > 0 or end < len(lines):
+            grew = False
+            if end < len(lines):
+                cost = token_counter.count(lines[end] + '\n', model)
+                if cost <= remaining:
+                    remaining -= cost
+                    end += 1
+                    grew = True
+            if start > 0:
+                cost = token_counter.count(lines[start - 1] + '\n', model)
+                if cost <= remaining:
+                    remaining -= cost
+                    start -= 1
+                    grew = True
+            if not grew:
+                break
+        
+        region = '\n'.join(lines[start:end])
+        if start == 0 and end == len(lines):
+            return f"File content:\n```\n{region}\n```"
+        return f"File content (lines {start + 1}-{end} of {len(lines)}):\n```\n{region}\n```"
+    
+    def _assemble_context(
+        self,
+        token_budget: int,
+        model: str,
+        current_file: Optional[str] = None,
+        file_content: Optional[str] = None,
+        file_tree: Optional[List[str]] = None,
+        selected_text: Optional[str] = None,
+        cursor_line: Optional[int] = None,
+        history: Optional[List[Dict[str, str]]] = None,
+        snippets: Optional[List[Dict[str, Any]]] = None
+    ) -> Tuple[str, List[Dict[str, str]]]:
+        """Fill a token budget with context by priority.
+        
+        Selected text comes first, then the region around the cursor and the
+        retrieved repository snippets (each at most half of what is left
+        when something of lower priority remains), then the most recent
+        history, then the repository map.
+        """
+        remaining = token_budget
+        sections: Dict[str, str] = {}
+        
+        if current_file:
+            sections['file'] = f"Current file: {current_file}"
+            remaining -= token_counter.count(sections['file'], model)
+        
+        if selected_text:
+            wrapper = token_counter.count("Selected text:\n```\n\n```", model)
+            text = token_counter.truncate(selected_text, remaining - wrapper, model)
+            if text:
+                sections['selection'] = f"Selected text:\n```\n{text}\n```"
+                remaining -= token_counter.count(sections['selection'], model)
+        
+        if file_content and remaining > 0:
+            region_budget = remaining // 2 if history or snippets else remaining
+            region = self._cursor_region(file_content, cursor_line, region_budget, model)
+            if region:
+                sections['content'] = region
+                remaining -= token_counter.count(region, model)
+        
+        if snippets and remaining > 0:
+            snippet_budget = remaining // 2 if history else remaining
+            parts = []
+            for snippet in snippets:
+                text = (f"{snippet['path']} (lines {snippet['start_line']}-{snippet['end_line']}):\n"
+                        f"```\n{snippet['body']}\n```")
+                cost = token_counter.count(text, model)
+                if cost > snippet_budget:
+                    continue
+                parts.append(text)
+                snippet_budget -= cost
+                remaining -= cost
+            if parts:
+                sections['snippets'] = "Relevant code from the repository:\n\n" + "\n\n".join(parts)
+        
+        kept_history: List[Dict[str, str]] = []
+        for msg in reversed(history or []):
+            cost = token_counter.count(msg['content'], model) + MESSAGE_OVERHEAD
+            if cost > remaining:
+                break
+            kept_history.append(msg)
+            remaining -= cost
+        kept_history.reverse()
+        
+        if file_tree and remaining > 0:
+            header = "Repository structure:\n"
+            remaining -= token_counter.count(header, model) + token_counter.count(f"... and {len(file_tree)} more files", model)
+            paths = []
+            for path in file_tree:
+                cost = token_counter.count(path + '\n', model)
+                if cost > remaining:
+                    break
+                paths.append(path)
+                remaining -= cost
+            if paths:
+                sections['tree'] = header + "\n".join(paths)
+                if len(paths) < len(file_tree):
+                    sections['tree'] += f"\n... and {len(file_tree) - len(paths)} more files"
+        
+        context = "\n\n".join(
+            sections[key] for key in ('file', 'tree', 'selection', 'content', 'snippets') if key in sections
+        )
+        return context, kept_history
+    
     def format_code_context(
         self,
         current_file: Optional[str] = None,
         file_content: Optional[str] = None,
         file_tree: Optional[List[str]] = None,
-        selected_text: Optional[str] = None
+        selected_text: Optional[str] = None,
+        cursor_line: Optional[int] = None,
+        token_budget: Optional[int] = None
     ) -> str:
-        """Format code context for AI assistant.
+        """Format code context for AI assistant within a token budget.
         
         Args:
             current_file: Path of currently open file
             file_content: Content of current file
             file_tree: List of files in repository
             selected_text: Currently selected text in editor
+            cursor_line: 1-based line of the editor cursor
+            token_budget: Maximum context tokens (defaults to the model's prompt budget)
             
         Returns:
             Formatted context string
         """
-        context_parts = []
+        if token_budget is None:
+            token_budget = self.prompt_budget()
         
-        if current_file:
-            context_parts.append(f"Current file: {current_file}")
+        context, _ = self._assemble_context(
+            token_budget,
+            self.default_model,
+            current_file=current_file,
+            file_content=file_content,
+            file_tree=file_tree,
+            selected_text=selected_text,
+            cursor_line=cursor_line
+        )
+        return context
+    
+    def build_messages(
+        self,
+        user_message: str,
+        history: Optional[List[Dict[str, str]]] = None,
+        model: Optional[str] = None,
+        current_file: Optional[str] = None,
+        file_content: Optional[str] = None,
+        file_tree: Optional[List[str]] = None,
+        selected_text: Optional[str] = None,
+        cursor_line: Optional[int] = None,
+        snippets: Optional[List[Dict[str, Any]]] = None
+    ) -> List[Dict[str, str]]:
+        """Build the message list for a chat turn within the model's budget.
+        
+        Args:
+            user_message: Message typed by the user
+            history: Previous conversation messages, oldest first
+            model: Model to budget for (defaults to configured model)
+            current_file: Path of currently open file
+            file_content: Content of current file
+            file_tree: List of files in repository
+            selected_text: Currently selected text in editor
+            cursor_line: 1-based line of the editor cursor
+            snippets: Retrieved code chunks relevant to the message, best first
+            
+        Returns:
+            Messages with system context, kept history and the user message
+        """
+        model = model or self.default_model
+        user_msg = {'role': 'user', 'content': user_message}
         
-        if file_tree:
-            context_parts.append(f"Repository structure:\n" + "\n".join(file_tree[:20]))
-            if len(file_tree) > 20:
-                context_parts.append(f"... and {len(file_tree) - 20} more files")
+        # The system prompt and the question itself are never cut
+        fixed = token_counter.count_messages([self.create_system_message(), user_msg], model)
+        budget = self.prompt_budget(model) - fixed - token_counter.count("\n\nCurrent context:\n", model)
         
-        if selected_text:
-            context_parts.append(f"Selected text:\n```\n{selected_text}\n```")
-        elif file_content:
-            # Include first 100 lines of file content if no selection
-            lines = file_content.split('\n')
-            if len(lines) > 100:
-                content_preview = '\n'.join(lines[:100]) + '\n... (truncated)'
-            else:
-                content_preview = file_content
-            context_parts.append(f"File content:\n```\n{content_preview}\n```")
-        
-        return "\n\n".join(context_parts)
+        context, kept_history = self._assemble_context(
+            budget,
+            model,
+            current_file=current_file,
+            file_content=file_content,
+            file_tree=file_tree,
+            selected_text=selected_text,
+            cursor_line=cursor_line,
+            history=history,
+            snippets=snippets
+        )
+        
+        return [self.create_system_message(context), *kept_history, user_msg]
 
 
 # Global OpenRouter client instance
@@ -0,0 +1,400 @@
+"""Persistent registry of locally cloned repositories."""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Any, Optional, Tuple
+from src.config import config
+
+# Written into tarball snapshot imports in place of a .git directory
+SNAPSHOT_MARKER = '.webagent-snapshot.json'
+
+# Seconds between recorded accesses of the same repository
+TOUCH_INTERVAL = 60
+
+
+class RepoRegistry:
+    """Owner/repo keyed metadata of local clones.
+    
+    Entries are kept in memory and mirrored to ``registry.db`` in the index
+    directory. Branch and commit are read straight from ``.git/HEAD`` and
+    the ref files, and only re-read when one of their mtimes changed, so
+    listing repositories never opens them with GitPython. Tarball snapshot
+    imports are listed alongside clones.
+    """
+    
+    def __init__(self):
+        """Initialize repository registry with configuration."""
+        self.db_path = os.path.join(os.path.abspath(config.index_directory), 'registry.db')
+        self._entries: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._migrated = False
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open the registry database, creating the schema if needed."""
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS repositories ('
+            'owner TEXT NOT NULL, repo TEXT NOT NULL, path TEXT NOT NULL, '
+            'branch TEXT, git_commit TEXT, head_state TEXT, '
+            'last_accessed REAL, evicted INTEGER NOT NULL DEFAULT 0, manifest TEXT, '
+            'PRIMARY KEY (owner, repo))'
+        )
+        if not self._migrated:
+            # Registries written before eviction support lack these columns
+            columns = {row[1] for row in conn.execute('PRAGMA table_info(repositories)')}
+            for column, definition in (('last_accessed', 'REAL'),
+                                       ('evicted', 'INTEGER NOT NULL DEFAULT 0'),
+                                       ('manifest', 'TEXT')):
+                if column not in columns:
+                    conn.execute(f'ALTER TABLE repositories ADD COLUMN {column} {definition}')
+            conn.commit()
+            self._migrated = True
+        return conn
+    
+    def _load(self) -> None:
+        """Read persisted entries into memory on first use."""
+        if self._loaded:
+            return
+        
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                'SELECT owner, repo, path, branch, git_commit, head_state, '
+                'last_accessed, evicted, manifest FROM repositories'
+            ).fetchall()
+        finally:
+            conn.close()
+        
+        for owner, repo, path, branch, commit, head_state, last_accessed, evicted, manifest in rows:
+            self._entries[(owner, repo)] = {
+                'owner': owner,
+                'repo': repo,
+                'path': path,
+                'branch': branch,
+                'commit': commit,
+                'head_state': head_state,
+                'last_accessed': last_accessed or 0.0,
+                'evicted': bool(evicted),
+                'manifest': json.loads(manifest) if manifest else None
+            }
+        self._loaded = True
+    
+    def _save(self, entry: Dict[str, Any]) -> None:
+        """Persist a single entry."""
+        conn = self._connect()
+        try:
+            conn.execute(
+                'INSERT OR REPLACE INTO repositories '
+                '(owner, repo, path, branch, git_commit, head_state, last_accessed, evicted, manifest) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (entry['owner'], entry['repo'], entry['path'],
+                 entry['branch'], entry['commit'], entry['head_state'],
+                 entry['last_accessed'], int(entry['evicted']),
+                 json.dumps(entry['manifest']) if entry['manifest'] else None)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+    
+    def _delete(self, key: Tuple[str, str]) -> None:
+        """Remove a persisted entry."""
+        conn = self._connect()
+        try:
+            conn.execute('DELETE FROM repositories WHERE owner = ? AND repo = ?', key)
+            conn.commit()
+        finally:
+            conn.close()
+    
+    @staticmethod
+    def _git_dir(repo_path: str) -> Optional[str]:
+        """Get the git directory of a working tree, following ``.git`` files."""
+        dot_git = os.path.join(repo_path, '.git')
+        if os.path.isdir(dot_git):
+            return dot_git
+        try:
+            with open(dot_git, 'r', encoding='utf-8') as f:
+                line = f.readline().strip()
+        except OSError:
+            return None
+        if line.startswith('gitdir:'):
+            return os.path.join(repo_path, line[len('gitdir:'):].strip())
+        return None
+    
+    @staticmethod
+    def _mtime(path: str) -> int:
+        """Get a file's mtime in nanoseconds, or 0 if it does not exist."""
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return 0
+    
+    @classmethod
+    def read_head(cls, repo_path: str) -> Tuple[str, str, str]:
+        """Read the branch and commit of a working tree from its git files.
+        
+        Snapshot imports report the ref and commit they were downloaded at.
+        
+        Args:
+            repo_path: Path to local repository
+        
+        Returns:
+            Tuple of (branch, short commit, head state); the head state
+            changes whenever HEAD or the branch ref is rewritten
+        """
+        git_dir = cls._git_dir(repo_path)
+        if git_dir is None:
+            return cls._read_snapshot(repo_path)
+        
+        head_path = os.path.join(git_dir, 'HEAD')
+        packed_path = os.path.join(git_dir, 'packed-refs')
+        try:
+            with open(head_path, 'r', encoding='utf-8') as f:
+                head = f.read().strip()
+        except OSError:
+            return 'unknown', 'unknown', ''
+        
+        if not head.startswith('ref:'):
+            # Detached HEAD holds the commit itself
+            state = f'{cls._mtime(head_path)}'
+            return 'unknown', head[:8], state
+        
+        ref = head[len('ref:'):].strip()
+        branch = ref[len('refs/heads/'):] if ref.startswith('refs/heads/') else ref
+        ref_path = os.path.join(git_dir, *ref.split('/'))
+        state = f'{cls._mtime(head_path)}:{cls._mtime(ref_path)}:{cls._mtime(packed_path)}'
+        
+        commit = None
+        try:
+            with open(ref_path, 'r', encoding='utf-8') as f:
+                commit = f.read().strip()
+        except OSError:
+            # Ref may only exist in packed-refs
+            try:
+                with open(packed_path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        parts = line.split()
+                        if len(parts) == 2 and parts[1] == ref:
+                            commit = parts[0]
+                            break
+            except OSError:
+                pass
+        
+        return branch, commit[:8] if commit else 'unknown', state
+    
+    @classmethod
+    def _read_snapshot(cls, repo_path: str) -> Tuple[str, str, str]:
+        """Read the ref and commit recorded in a snapshot import."""
+        marker_path = os.path.join(repo_path, SNAPSHOT_MARKER)
+        try:
+            with open(marker_path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return 'unknown', 'unknown', ''
+        
+        state = f'snapshot:{cls._mtime(marker_path)}'
+        return snapshot.get('ref') or 'unknown', (snapshot.get('sha') or 'unknown')[:8], state
+    
+    def _refreshed(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """Re-read branch and commit of an entry if its git files changed."""
+        if entry['evicted']:
+            return entry
+        
+        branch, commit, state = self.read_head(entry['path'])
+        if state != entry['head_state']:
+            entry.update(branch=branch, commit=commit, head_state=state)
+            self._save(entry)
+        return entry
+    
+    @staticmethod
+    def _public(entry: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the repository dictionary returned to callers."""
+        path = entry['path']
+        return {
+            'owner': entry['owner'],
+            'repo': entry['repo'],
+            'path': path,
+            'branch': entry['branch'],
+            'commit': entry['commit'],
+            'snapshot': (entry['head_state'] or '').startswith('snapshot:'),
+            'evicted': entry['evicted'],
+            'last_accessed': entry['last_accessed'],
+            'last_modified': entry['last_accessed'] if entry['evicted'] else os.path.getmtime(path)
+        }
+    
+    def register(self, owner: str, repo: str, path: str) -> Dict[str, Any]:
+        """Add or refresh a repository after it was cloned or updated.
+        
+        Args:
+            owner: Repository owner
+            repo: Repository name
+            path: Path to local repository
+        
+        Returns:
+            Repository information dictionary
+        """
+        branch, commit, state = self.read_head(path)
+        entry = {
+            'owner': owner,
+            'repo': repo,
+            'path': path,
+            'branch': branch,
+            'commit': commit,
+            'head_state': state,
+            'last_accessed': time.time(),
+            'evicted': False,
+            'manifest': None
+        }
+        with self._lock:
+            self._load()
+            self._entries[(owner, repo)] = entry
+            self._save(entry)
+            return self._public(entry)
+    
+    def touch(self, owner: str, repo: str) -> None:
+        """Record that a repository was opened.
+        
+        Args:
+            owner: Repository owner
+            repo: Repository name
+        """
+        now = time.time()
+        with self._lock:
+            self._load()
+            entry = self._entries.get((owner, repo))
+            # Called on every request, so only written once per interval
+            if entry is not None and now - (entry['last_accessed'] or 0) >= TOUCH_INTERVAL:
+                entry['last_accessed'] = now
+                self._save(entry)
+    
+    def mark_evicted(self, owner: str, repo: str, manifest: Dict[str, Any]) -> None:
+        """Keep an evicted repository listed together with how to restore it.
+        
+        Args:
+            owner: Repository owner
+            repo: Repository name
+            manifest: URL, ref and clone options needed to bring it back
+        """
+        with self._lock:
+            self._load()
+            entry = self._entries.get((owner, repo))
+            if entry is not None:
+                entry.update(evicted=True, manifest=manifest)
+                self._save(entry)
+    
+    def entries(self) -> List[Dict[str, Any]]:
+        """Get a copy of every registry entry, including eviction state.
+        
+        Returns:
+            List of raw entry dictionaries
+        """
+        with self._lock:
+            self._load()
+            return [dict(entry) for entry in self._entries.values()]
+    
+    def remove(self, path: str) -> None:
+        """Forget the repository cloned at a path.
+        
+        Args:
+            path: Path to local repository
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            self._load()
+            for key, entry in list(self._entries.items()):
+                if os.path.abspath(entry['path']) == path:
+                    del self._entries[key]
+                    self._delete(key)
+    
+    def get(self, owner: str, repo: str) -> Optional[Dict[str, Any]]:
+        """Look up a repository by owner and name.
+        
+        Args:
+            owner: Repository owner
+            repo: Repository name
+        
+        Returns:
+            Repository information dictionary, or None if not cloned;
+            evicted repositories are returned with 'evicted' set
+        """
+        with self._lock:
+            self._load()
+            entry = self._entries.get((owner, repo))
+            if entry is None:
+                return None
+            if entry['evicted']:
+                return self._public(entry)
+            if not os.path.isdir(entry['path']):
+                del self._entries[(owner, repo)]
+                self._delete((owner, repo))
+                return None
+            return self._public(self._refreshed(entry))
+    
+    def list_repositories(self, repos_dir: str) -> List[Dict[str, Any]]:
+        """List repositories, reconciling the registry with the clone directory.
+        
+        Clones made before the registry existed are picked up here, and
+        entries whose directory disappeared are dropped.
+        
+        Args:
+            repos_dir: Directory holding the clones
+        
+        Returns:
+            List of repository information dictionaries
+        """
+        try:
+            names = [
+                name for name in os.listdir(repos_dir)
+                if os.path.exists(os.path.join(repos_dir, name, '.git'))
+                or os.path.exists(os.path.join(repos_dir, name, SNAPSHOT_MARKER))
+            ]
+        except OSError:
+            names = []
+        
+        with self._lock:
+            self._load()
+            known = {os.path.abspath(entry['path']): key for key, entry in self._entries.items()}
+            present = set()
+            repos = []
+            
+            for name in names:
+                path = os.path.join(repos_dir, name)
+                key = known.get(os.path.abspath(path))
+                if key is None:
+                    # Parse owner and repo name from directory name
+                    if '_' in name:
+                        owner, repo_name = name.split('_', 1)
+                    else:
+                        owner, repo_name = 'unknown', name
+                    repos.append(self.register(owner, repo_name, path))
+                    present.add((owner, repo_name))
+                    continue
+                
+                present.add(key)
+                if self._entries[key]['evicted']:
+                    # Brought back outside the backend
+                    repos.append(self.register(key[0], key[1], path))
+                    continue
+                try:
+                    repos.append(self._public(self._refreshed(self._entries[key])))
+                except OSError:
+                    continue
+            
+            for key, entry in list(self._entries.items()):
+                if key in present or os.path.dirname(os.path.abspath(entry['path'])) != os.path.abspath(repos_dir):
+                    continue
+                if entry['evicted']:
+                    repos.append(self._public(entry))
+                else:
+                    del self._entries[key]
+                    self._delete(key)
+            
+            return repos
+
+
+# Global repository registry instance
+repo_registry = RepoRegistry()
@@ -0,0 +1,275 @@
+"""BM25 retrieval over repository code chunks for chat context."""
+
+import ast
+import os
+import re
+import sqlite3
+from typing import Dict, List, Any, Optional, Tuple
+from src.config import config
+from src.file_index import FileIndex
+
+IDENTIFIER_RE = re.compile(r'[A-Za-z_][A-Za-z0-9_]*|\d+')
+CAMEL_CASE_RE = re.compile(r'[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+')
+
+# Top-level declarations that start a new chunk in JavaScript/TypeScript
+JS_DECLARATION_RE = re.compile(
+    r'^(export\s+)?(default\s+)?(async\s+)?(function\b|class\b|const\b|let\b|var\b|interface\b|type\b)'
+)
+JS_EXTENSIONS = {'.js', '.jsx', '.ts', '.tsx', '.mjs', '.cjs'}
+
+# Words that carry no signal in questions about code
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'can', 'do', 'does', 'for',
+    'from', 'how', 'i', 'in', 'is', 'it', 'me', 'my', 'of', 'on', 'or', 'so',
+    'that', 'the', 'this', 'to', 'was', 'we', 'what', 'when', 'where', 'which',
+    'who', 'why', 'with', 'you', 'your'
+}
+
+# (start_line, end_line), 1-based and inclusive
+Span = Tuple[int, int]
+
+
+def extract_terms(text: str) -> List[str]:
+    """Split text into lowercase search terms.
+    
+    Identifiers are kept whole and also split on underscores and camelCase,
+    so ``getFileTree`` matches a question about the "file tree".
+    
+    Args:
+        text: Code or question text
+    
+    Returns:
+        List of terms in order of appearance
+    """
+    terms = []
+    for identifier in IDENTIFIER_RE.findall(text):
+        parts = [p for chunk in identifier.split('_') for p in CAMEL_CASE_RE.findall(chunk)]
+        whole = identifier.replace('_', '').lower()
+        terms.append(whole)
+        if len(parts) > 1:
+            terms.extend(part.lower() for part in parts)
+    return terms
+
+
+class RetrievalIndex(FileIndex):
+    """Per-repository BM25 index of code chunks, stored next to the clone.
+    
+    Python files are chunked by top-level function and class (large
+    classes by method), JavaScript/TypeScript files by top-level
+    declaration, and everything else by line windows. Chunks live in an
+    SQLite FTS5 table, whose built-in ``bm25()`` ranking keeps queries in
+    native code.
+    """
+    
+    db_name = 'retrieval.db'
+    
+    def __init__(self):
+        """Initialize retrieval index with configuration."""
+        super().__init__()
+        self.chunk_lines = config.get('retrieval.chunk_lines', 60)
+        self.window_overlap = config.get('retrieval.window_overlap', 10)
+        self.available = self._fts5_available()
+    
+    @staticmethod
+    def _fts5_available() -> bool:
+        """Check whether the SQLite build supports FTS5."""
+        try:
+            conn = sqlite3.connect(':memory:')
+            conn.execute('CREATE VIRTUAL TABLE probe USING fts5(terms)')
+            conn.close()
+            return True
+        except sqlite3.OperationalError:
+            print("Warning: SQLite FTS5 not available, chat retrieval disabled")
+            return False
+    
+    def _create_schema(self, conn: sqlite3.Connection) -> None:
+        """Create the files, chunks and full-text tables."""
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS files ('
+            'path TEXT PRIMARY KEY, mtime REAL, size INTEGER)'
+        )
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS chunks ('
+            'id INTEGER PRIMARY KEY, path TEXT NOT NULL, start_line INTEGER, end_line INTEGER, body TEXT)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS chunks_path ON chunks(path)')
+        conn.execute('CREATE VIRTUAL TABLE IF NOT EXISTS chunk_terms USING fts5(terms)')
+    
+    def _windows(self, start: int, end: int) -> List[Span]:
+        """Split a line range into overlapping windows of chunk_lines."""
+        spans = []
+        step = max(self.chunk_lines - self.window_overlap, 1)
+        line = start
+        while line <= end:
+            spans.append((line, min(line + self.chunk_lines - 1, end)))
+            if line + self.chunk_lines - 1 >= end:
+                break
+            line += step
+        return spans
+    
+    def _fill_gaps(self, spans: List[Span], total: int) -> List[Span]:
+        """Cover lines between declaration spans with line windows."""
+        result = []
+        line = 1
+        for start, end in sorted(spans):
+            if start > line:
+                result.extend(self._windows(line, start - 1))
+            result.append((start, end))
+            line = max(line, end + 1)
+        if line <= total:
+            result.extend(self._windows(line, total))
+        return result
+    
+    def _python_spans(self, content: str, total: int) -> Optional[List[Span]]:
+        """Chunk Python source by top-level function and class."""
+        try:
+            tree = ast.parse(content)
+        except (SyntaxError, ValueError):
+            return None
+        
+        spans = []
+        for node in tree.body:
+            if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                continue
+            start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+            end = node.end_lineno or node.lineno
+            
+            if isinstance(node, ast.ClassDef) and end - start + 1 > self.chunk_lines:
+                # Split large classes into a header chunk and one chunk per method
+                methods = [n for n in node.body if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))]
+                if methods:
+                    method_spans = [
+                        (min([m.lineno] + [d.lineno for d in m.decorator_list]), m.end_lineno or m.lineno)
+                        for m in methods
+                    ]
+                    spans.append((start, method_spans[0][0] - 1))
+                    spans.extend(method_spans)
+                    continue
+            spans.append((start, end))
+        
+        return self._fill_gaps([s for s in spans if s[0] <= s[1]], total)
+    
+    def _js_spans(self, lines: List[str]) -> List[Span]:
+        """Chunk JavaScript/TypeScript source at top-level declarations."""
+        starts = [i + 1 for i, line in enumerate(lines) if JS_DECLARATION_RE.match(line)]
+        if not starts:
+            return self._windows(1, len(lines))
+        
+        spans = []
+        if starts[0] > 1:
+            spans.append((1, starts[0] - 1))
+        for i, start in enumerate(starts):
+            end = starts[i + 1] - 1 if i + 1 < len(starts) else len(lines)
+            spans.append((start, end))
+        return spans
+    
+    def chunk(self, file_path: str, content: str) -> List[Dict[str, Any]]:
+        """Split a file into retrievable chunks.
+        
+        Args:
+            file_path: Relative path to file within repository
+            content: File content
+        
+        Returns:
+            List of chunk dictionaries with start_line, end_line and body
+        """
+        lines = content.split('\n')
+        total = len(lines)
+        _, ext = os.path.splitext(file_path)
+        
+        spans = None
+        if ext.lower() == '.py':
+            spans = self._python_spans(content, total)
+        elif ext.lower() in JS_EXTENSIONS:
+            spans = self._js_spans(lines)
+        if spans is None:
+            spans = self._windows(1, total)
+        
+        chunks = []
+        for start, end in spans:
+            # Declarations longer than a chunk are split into windows too
+            for window_start, window_end in self._windows(start, end):
+                body = '\n'.join(lines[window_start - 1:window_end])
+                if body.strip():
+                    chunks.append({'start_line': window_start, 'end_line': window_end, 'body': body})
+        return chunks
+    
+    def _index_file(self, conn: sqlite3.Connection, repo_path: str, file_path: str) -> None:
+        """Replace the chunks of a single file inside an open transaction."""
+        self._delete_file(conn, file_path)
+        
+        full_path = os.path.join(repo_path, file_path)
+        max_size = config.get('filesystem.max_file_size', 10) * 1024 * 1024
+        try:
+            stat = os.stat(full_path)
+        except OSError:
+            return
+        
+        # Recorded even if it cannot be chunked, so sync skips it until it changes
+        conn.execute('INSERT INTO files (path, mtime, size) VALUES (?, ?, ?)',
+                     (file_path, stat.st_mtime, stat.st_size))
+        try:
+            if stat.st_size > max_size:
+                return
+            with open(full_path, 'r', encoding='utf-8') as f:
+                content = f.read()
+        except (OSError, UnicodeDecodeError):
+            return
+        
+        path_terms = ' '.join(extract_terms(file_path))
+        for chunk in self.chunk(file_path, content):
+            cursor = conn.execute(
+                'INSERT INTO chunks (path, start_line, end_line, body) VALUES (?, ?, ?, ?)',
+                (file_path, chunk['start_line'], chunk['end_line'], chunk['body'])
+            )
+            terms = path_terms + ' ' + ' '.join(extract_terms(chunk['body']))
+            conn.execute('INSERT INTO chunk_terms (rowid, terms) VALUES (?, ?)', (cursor.lastrowid, terms))
+    
+    def _delete_file(self, conn: sqlite3.Connection, file_path: str) -> None:
+        """Remove a file and its chunks inside an open transaction."""
+        conn.execute('DELETE FROM chunk_terms WHERE rowid IN (SELECT id FROM chunks WHERE path = ?)', (file_path,))
+        conn.execute('DELETE FROM chunks WHERE path = ?', (file_path,))
+        conn.execute('DELETE FROM files WHERE path = ?', (file_path,))
+    
+    def search(self, repo_path: str, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        """Get the chunks that best match a question.
+        
+        Args:
+            repo_path: Path to local repository
+            query: Question or search text
+            top_k: Maximum number of chunks to return
+        
+        Returns:
+            Chunks ordered by BM25 score, best first; empty if the index
+            is not ready
+        """
+        if not self.available or not self.is_ready(repo_path):
+            return []
+        
+        terms = []
+        for term in extract_terms(query):
+            if len(term) > 1 and term not in STOPWORDS and term not in terms:
+                terms.append(term)
+        if not terms:
+            return []
+        
+        match = ' OR '.join(f'"{term}"' for term in terms[:32])
+        conn = self._connect(repo_path)
+        try:
+            rows = conn.execute(
+                'SELECT c.path, c.start_line, c.end_line, c.body, m.score FROM ('
+                'SELECT rowid, rank AS score FROM chunk_terms WHERE chunk_terms MATCH ? '
+                'ORDER BY rank LIMIT ?) m JOIN chunks c ON c.id = m.rowid ORDER BY m.score',
+                (match, top_k)
+            ).fetchall()
+        finally:
+            conn.close()
+        
+        return [
+            {'path': path, 'start_line': start, 'end_line': end, 'body': body, 'score': -score}
+            for path, start, end, body, score in rows
+        ]
+
+
+# Global retrieval index instance
+retrieval_index = RetrievalIndex()
@@ -1,13 +1,144 @@
 """Chat API routes for AI-powered assistance."""
 
-from flask import Blueprint, request, jsonify, session
-from typing import List, Dict, Any
+import json
+import uuid
+from flask import Blueprint, Response, request, jsonify, session, stream_with_context
+from typing import List, Dict, Any, Optional
 from src.openrouter_client import openrouter_client
+from src.token_counter import token_counter
+from src.github_client import github_client
+from src.retrieval_index import retrieval_index
+from src.completion_cache import completion_cache
+from src.models.user import db
+from src.models.chat import ChatMessage
 from src.config import config
 
 chat_bp = Blueprint('chat', __name__)
 
 
+@chat_bp.before_request
+def _touch_current_repo():
+    """Keep the repository being worked on from being evicted as idle."""
+    current_repo = session.get('current_repo')
+    if current_repo:
+        github_client.touch_repository(current_repo['owner'], current_repo['repo'])
+
+
+def _conversation_id(create: bool = True) -> Optional[str]:
+    """Get the conversation id of the current session.
+    
+    The session cookie only carries this id; messages live in the database.
+    History left in the cookie by older versions is moved over once.
+    """
+    conversation_id = session.get('chat_id')
+    if not conversation_id and (create or session.get('chat_history')):
+        conversation_id = uuid.uuid4().hex
+        session['chat_id'] = conversation_id
+    
+    legacy_history = session.pop('chat_history', None)
+    if legacy_history and conversation_id:
+        db.session.add_all([
+            ChatMessage(conversation_id=conversation_id, role=msg['role'], content=msg['content'])
+            for msg in legacy_history
+        ])
+        db.session.commit()
+    
+    return conversation_id
+
+
+def _recent_messages(conversation_id: str, limit: int) -> List[Dict[str, str]]:
+    """Get the most recent messages of a conversation in chronological order."""
+    rows = (ChatMessage.query
+            .filter_by(conversation_id=conversation_id)
+            .order_by(ChatMessage.id.desc())
+            .limit(limit)
+            .all())
+    return [row.to_message() for row in reversed(rows)]
+
+
+def _append_turn(conversation_id: str, user_message: str, assistant_message: str) -> None:
+    """Append a user/assistant exchange to a conversation."""
+    db.session.add_all([
+        ChatMessage(conversation_id=conversation_id, role='user', content=user_message),
+        ChatMessage(conversation_id=conversation_id, role='assistant', content=assistant_message)
+    ])
+    db.session.commit()
+
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format a server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _stream_reply(
+    messages: List[Dict[str, str]],
+    conversation_id: str,
+    user_message: str,
+    bypass_cache: bool = False
+) -> Response:
+    """Relay OpenRouter token deltas to the client as server-sent events."""
+    cache_key = openrouter_client.cache_key(messages) if completion_cache.enabled else None
+    cached = completion_cache.get(cache_key) if cache_key and not bypass_cache else None
+    if not cache_key:
+        cache_status = 'disabled'
+    elif cached is not None:
+        cache_status = 'hit'
+    else:
+        cache_status = 'bypass' if bypass_cache else 'miss'
+    
+    def generate():
+        if cached is not None:
+            # Replay a cached completion as a single delta
+            reply = cached['choices'][0]['message']['content']
+            _append_turn(conversation_id, user_message, reply)
+            yield _sse_event('delta', {'content': reply})
+            yield _sse_event('done', {
+                'usage': cached.get('usage', {}),
+                'model': cached.get('model', openrouter_client.default_model),
+                'cache': cache_status
+            })
+            return
+        
+        reply_parts = []
+        usage = {}
+        model = openrouter_client.default_model
+        
+        try:
+            for chunk in openrouter_client.stream_chat_completion(messages):
+                model = chunk.get('model', model)
+                usage = chunk.get('usage') or usage
+                
+                choices = chunk.get('choices') or []
+                delta = choices[0].get('delta', {}).get('content') if choices else None
+                if delta:
+                    reply_parts.append(delta)
+                    yield _sse_event('delta', {'content': delta})
+            
+            if not reply_parts:
+                yield _sse_event('error', {'error': 'No response from AI model'})
+                return
+            
+            # Add messages to history once the full reply has arrived
+            reply = ''.join(reply_parts)
+            _append_turn(conversation_id, user_message, reply)
+            token_counter.calibrate(openrouter_client.default_model, messages, usage.get('prompt_tokens'))
+            if cache_key:
+                completion_cache.put(cache_key, {
+                    'choices': [{'message': {'role': 'assistant', 'content': reply}}],
+                    'usage': usage,
+                    'model': model
+                })
+            yield _sse_event('done', {'usage': usage, 'model': model, 'cache': cache_status})
+        
+        except Exception as e:
+            yield _sse_event('error', {'error': f'Failed to process message: {str(e)}'})
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
 @chat_bp.route('/chat/message', methods=['POST'])
 def send_message():
     """Send a message to the AI assistant and get a response."""
@@ -25,53 +156,61 @@ def send_message():
         file_content = data.get('file_content')
         file_tree = data.get('file_tree')
         selected_text = data.get('selected_text')
+        cursor_line = data.get('cursor_line')
         
-        # Get or initialize conversation history
-        if 'chat_history' not in session:
-            session['chat_history'] = []
+        # Get or initialize conversation
+        conversation_id = _conversation_id()
         
-        chat_history = session['chat_history']
+        # Retrieve repository code related to the question
+        snippets = []
+        current_repo = session.get('current_repo')
+        if current_repo and config.get('retrieval.enabled', True):
+            repo_path = current_repo['path']
+            if retrieval_index.is_ready(repo_path):
+                snippets = [
+                    snippet for snippet in retrieval_index.search(
+                        repo_path, user_message, top_k=config.get('retrieval.top_k', 5))
+                    if snippet['path'] != current_file
+                ]
+            else:
+                github_client.index_repository(repo_path)
         
-        # Create context for the AI
-        context = openrouter_client.format_code_context(
+        # Fill the model's prompt budget with context and recent history
+        max_history = config.get('chat.max_history', 50)
+        messages = openrouter_client.build_messages(
+            user_message,
+            history=_recent_messages(conversation_id, max_history),
             current_file=current_file,
             file_content=file_content,
             file_tree=file_tree,
-            selected_text=selected_text
+            selected_text=selected_text,
+            cursor_line=cursor_line,
+            snippets=snippets
         )
         
-        # Prepare messages for API call
-        messages = []
-        
-        # Add system message with context
-        system_message = openrouter_client.create_system_message(context)
-        messages.append(system_message)
-        
-        # Add conversation history (limit to recent messages)
-        max_history = config.get('chat.max_history', 50)
-        recent_history = chat_history[-max_history:] if len(chat_history) > max_history else chat_history
-        messages.extend(recent_history)
-        
-        # Add current user message
-        user_msg = {'role': 'user', 'content': user_message}
-        messages.append(user_msg)
+        bypass_cache = bool(data.get('no_cache'))
+        if data.get('stream'):
+            return _stream_reply(messages, conversation_id, user_message, bypass_cache)
         
-        # Call OpenRouter API
-        response = openrouter_client.chat_completion(messages)
+        # Call OpenRouter API, answering identical requests from the cache
+        response, cache_status = openrouter_client.cached_chat_completion(messages, bypass_cache=bypass_cache)
         
         # Extract assistant response
         if 'choices' in response and len(response['choices']) > 0:
             assistant_message = response['choices'][0]['message']['content']
+            model = response.get('model', openrouter_client.default_model)
+            if cache_status != 'hit':
+                token_counter.calibrate(openrouter_client.default_model, messages,
+                                        response.get('usage', {}).get('prompt_tokens'))
             
             # Add messages to history
-            chat_history.append(user_msg)
-            chat_history.append({'role': 'assistant', 'content': assistant_message})
-            session['chat_history'] = chat_history
+            _append_turn(conversation_id, user_message, assistant_message)
             
             return jsonify({
                 'response': assistant_message,
                 'usage': response.get('usage', {}),
-                'model': response.get('model', openrouter_client.default_model)
+                'model': model,
+                'cache': cache_status
             })
         else:
             return jsonify({'error': 'No response from AI model'}), 500
@@ -82,10 +221,32 @@ def send_message():
 
 @chat_bp.route('/chat/history', methods=['GET'])
 def get_chat_history():
-    """Get the current chat conversation history."""
+    """Get a page of the current chat conversation history.
+    
+    Pages run backwards from the most recent message; pass ``next_before``
+    from a response as ``before`` to get the previous page.
+    """
     try:
-        chat_history = session.get('chat_history', [])
-        return jsonify({'history': chat_history})
+        limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+        before = request.args.get('before', type=int)
+        
+        conversation_id = _conversation_id(create=False)
+        if not conversation_id:
+            return jsonify({'history': [], 'has_more': False, 'next_before': None})
+        
+        query = ChatMessage.query.filter_by(conversation_id=conversation_id)
+        if before is not None:
+            query = query.filter(ChatMessage.id < before)
+        rows = query.order_by(ChatMessage.id.desc()).limit(limit + 1).all()
+        
+        has_more = len(rows) > limit
+        page = list(reversed(rows[:limit]))
+        
+        return jsonify({
+            'history': [row.to_dict() for row in page],
+            'has_more': has_more,
+            'next_before': page[0].id if has_more else None
+        })
     
     except Exception as e:
         return jsonify({'error': f'Failed to get chat history: {str(e)}'}), 500
@@ -95,7 +256,10 @@ def get_chat_history():
 def clear_chat_history():
     """Clear the chat conversation history."""
     try:
-        session['chat_history'] = []
+        conversation_id = _conversation_id(create=False)
+        if conversation_id:
+            ChatMessage.query.filter_by(conversation_id=conversation_id).delete()
+            db.session.commit()
         return jsonify({'message': 'Chat history cleared successfully'})
     
     except Exception as e:
@@ -104,10 +268,17 @@ def clear_chat_history():
 
 @chat_bp.route('/chat/models', methods=['GET'])
 def get_available_models():
-    """Get list of available AI models."""
+    """Get list of available AI models.
+    
+    The catalog is served from an in-process cache with an ETag, so the
+    browser can revalidate with If-None-Match and get a 304.
+    """
     try:
-        models = openrouter_client.get_models()
-        return jsonify({'models': models})
+        body, etag = openrouter_client.get_model_catalog()
+        response = Response(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
     
     except Exception as e:
         return jsonify({'error': f'Failed to fetch models: {str(e)}'}), 500
@@ -1,11 +1,32 @@
 """File operations API routes."""
 
-from flask import Blueprint, request, jsonify, session
+import hashlib
+import io
+import json
+import mimetypes
+import os
+from typing import Dict, List, Optional, Tuple
+from flask import Blueprint, Response, request, jsonify, session, send_file
 from src.github_client import github_client
+from src.content_index import content_index
+from src.content_search import content_search
+from src.fs_watcher import file_watcher
+from src.git_objects import git_objects
+from src.file_tree_cache import encode_compact
+from src.line_index import line_index
+from src.config import config
 
 files_bp = Blueprint('files', __name__)
 
 
+@files_bp.before_request
+def _touch_current_repo():
+    """Keep the repository being worked on from being evicted as idle."""
+    current_repo = session.get('current_repo')
+    if current_repo:
+        github_client.touch_repository(current_repo['owner'], current_repo['repo'])
+
+
 @files_bp.route('/files/tree', methods=['GET'])
 def get_file_tree():
     """Get file tree structure of current repository."""
@@ -16,21 +37,153 @@ def get_file_tree():
         
         repo_path = current_repo['path']
         max_depth = request.args.get('max_depth', 10, type=int)
+        ref = request.args.get('ref')
+        compact = request.args.get('format') == 'compact'
+        
+        since = request.args.get('since', type=int)
+        if since is not None and not ref:
+            changes = github_client.get_file_tree_changes(repo_path, since)
+            if changes is not None:
+                changes.update(since=since, reset=False, repository=current_repo)
+                return jsonify(changes)
+            # Version unknown or too old for the change log, send everything
+        
+        if request.args.get('lazy', 'false').lower() in ('true', '1'):
+            return _directory_page(current_repo, ref, compact, reset=since is not None and not ref)
+        
+        if ref:
+            # Read-only listing straight from the object database
+            try:
+                result = git_objects.get_tree(repo_path, ref, max_depth=max_depth)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 404
+            
+            response = {'ref': ref, 'commit': result['commit'], 'repository': current_repo}
+            file_tree = result['file_tree']
+        else:
+            version, file_tree = github_client.get_versioned_file_tree(repo_path, max_depth=max_depth)
+            response = {'version': version, 'repository': current_repo}
+            if since is not None:
+                response['reset'] = True
         
-        file_tree = github_client.get_file_tree(repo_path, max_depth=max_depth)
-        
-        return jsonify({
-            'file_tree': file_tree,
-            'repository': current_repo
-        })
+        if compact:
+            response.update(encode_compact(file_tree))
+        else:
+            response['file_tree'] = file_tree
+        return jsonify(response)
     
     except Exception as e:
         return jsonify({'error': f'Failed to get file tree: {str(e)}'}), 500
 
 
+def _directory_page(current_repo: dict, ref: Optional[str], compact: bool, reset: bool = False):
+    """Respond with one page of a single directory's children."""
+    dir_path = request.args.get('path', '').strip('/')
+    cursor = request.args.get('cursor') or None
+    limit = max(1, min(request.args.get('limit', config.get('filesystem.tree_page_size', 500), type=int), 5000))
+    
+    if ref:
+        try:
+            page = git_objects.list_directory(current_repo['path'], ref, dir_path, cursor=cursor, limit=limit)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 404
+    else:
+        page = github_client.list_directory(current_repo['path'], dir_path, cursor=cursor, limit=limit)
+    
+    if page is None:
+        return jsonify({'error': 'Directory not found'}), 404
+    
+    rows = page.pop('rows')
+    if compact:
+        page['fields'] = ['name', 'directory', 'size', 'children']
+        page['entries'] = [[name, int(is_dir), size, children] for name, is_dir, size, children in rows]
+    else:
+        page['entries'] = [
+            {
+                'name': name,
+                'path': f'{dir_path}/{name}' if dir_path else name,
+                'type': 'directory' if is_dir else 'file',
+                'size': size,
+                'children': children
+            }
+            for name, is_dir, size, children in rows
+        ]
+    
+    page['path'] = dir_path
+    if reset:
+        page['reset'] = True
+    page['repository'] = current_repo
+    if ref:
+        page['ref'] = ref
+    return jsonify(page)
+
+
+@files_bp.route('/files/events', methods=['GET'])
+def stream_file_events():
+    """Stream debounced file system change batches of the current repository as server-sent events."""
+    current_repo = session.get('current_repo')
+    if not current_repo:
+        return jsonify({'error': 'No repository selected'}), 400
+    if not file_watcher.enabled:
+        return jsonify({'error': 'File watching is disabled'}), 404
+    
+    repo_path = current_repo['path']
+    # Resume after the last batch a reconnecting EventSource saw
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('after')
+    
+    def generate():
+        watch = file_watcher.subscribe(repo_path)
+        try:
+            batch_id, batches = file_watcher.resume(watch, last_event_id)
+            yield f"event: ready\ndata: {json.dumps({'last_id': watch.event_id(batch_id)})}\n\n"
+            while True:
+                for batch in batches:
+                    batch_id = batch['id']
+                    yield f"id: {watch.event_id(batch_id)}\nevent: changes\ndata: {json.dumps(batch)}\n\n"
+                if watch.stopped:
+                    yield f"event: error\ndata: {json.dumps({'error': 'Stopped watching repository'})}\n\n"
+                    return
+                batches = file_watcher.wait_for_batches(watch, batch_id, timeout=15)
+                if not batches and not watch.stopped:
+                    # Keep idle proxies from closing the connection
+                    yield ': keep-alive\n\n'
+        finally:
+            file_watcher.unsubscribe(watch)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
+def _parse_line_range(value: str) -> Tuple[int, Optional[int]]:
+    """Parse a 'start-end' line range; either end may be left out."""
+    start, _, end = value.partition('-')
+    first = int(start) if start else 1
+    last = int(end) if end else None
+    if first < 1 or (last is not None and last < first):
+        raise ValueError(f'Invalid line range: {value}')
+    return first, last
+
+
+def _conditional(response: Response, etag: str) -> Response:
+    """Tag a response and turn it into a 304 if the client's copy is current."""
+    response.set_etag(etag)
+    # Cached copies may be reused, but only after revalidating the tag
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+
 @files_bp.route('/files/content', methods=['GET'])
 def get_file_content():
-    """Get content of a specific file."""
+    """Get content of a specific file.
+    
+    Responses carry an ETag and honor If-None-Match. With raw=true the file
+    is streamed as-is and Range requests are honored; lines=start-end
+    returns only those lines and cannot be combined with raw. Files over
+    filesystem.max_file_size are read through their line index, one window
+    at a time, and q=text finds the matching lines of the window.
+    """
     try:
         current_repo = session.get('current_repo')
         if not current_repo:
@@ -41,16 +194,94 @@ def get_file_content():
             return jsonify({'error': 'File path is required'}), 400
         
         repo_path = current_repo['path']
-        result = github_client.read_file(repo_path, file_path)
+        ref = request.args.get('ref')
+        raw = request.args.get('raw', 'false').lower() in ('true', '1')
+        
+        line_range = None
+        if request.args.get('lines'):
+            try:
+                line_range = _parse_line_range(request.args['lines'])
+            except ValueError:
+                return jsonify({'error': f"Invalid line range: {request.args['lines']}"}), 400
+            if raw:
+                return jsonify({'error': 'A line range cannot be read raw'}), 400
+        
+        if ref:
+            if raw:
+                result = git_objects.read_bytes(repo_path, ref, file_path)
+                if not result['success']:
+                    return jsonify(result), 400
+                return send_file(io.BytesIO(result['data']), mimetype=_mimetype(file_path), etag=result['sha'])
+            
+            result = git_objects.read_file(repo_path, ref, file_path)
+            if result['success']:
+                body = {
+                    'content': result['content'],
+                    'size': result['size'],
+                    'encoding': result['encoding'],
+                    'file_path': file_path,
+                    'ref': ref,
+                    'commit': result['commit'],
+                    'repository': current_repo
+                }
+                etag = result['sha']
+                if line_range:
+                    lines = result['content'].splitlines(keepends=True)
+                    start, end = line_range
+                    selected = lines[start - 1:end]
+                    body.update(
+                        content=''.join(selected),
+                        start_line=start,
+                        end_line=start + len(selected) - 1,
+                        eof=end is None or end >= len(lines)
+                    )
+                    etag = f'{etag}-{start}-{end or ""}'
+                return _conditional(jsonify(body), etag)
+            return jsonify(result), 400
+        
+        stat = github_client.stat_file(repo_path, file_path)
+        if not stat['success']:
+            return jsonify(stat), 400
+        
+        query = request.args.get('q') if line_range else None
+        large = stat['size'] > config.get('filesystem.max_file_size', 10) * 1024 * 1024
+        etag = stat['etag'] if not line_range else f"{stat['etag']}-{line_range[0]}-{line_range[1] or ''}"
+        if query:
+            etag = f"{etag}-{hashlib.sha1(query.encode('utf-8')).hexdigest()[:16]}"
+        if request.if_none_match.contains(etag):
+            # Unchanged since the client's copy, skip reading the file
+            return _conditional(Response(status=304), etag)
+        
+        if raw:
+            # Streamed from disk in chunks, with Range support
+            return send_file(stat['full_path'], mimetype=_mimetype(file_path), etag=stat['etag'])
+        
+        if line_range and large:
+            result = line_index.read_window(repo_path, file_path, *line_range, query=query)
+        elif line_range:
+            result = github_client.read_lines(repo_path, file_path, *line_range)
+        else:
+            result = github_client.read_file(repo_path, file_path)
         
         if result['success']:
-            return jsonify({
+            body = {
                 'content': result['content'],
                 'size': result['size'],
                 'encoding': result['encoding'],
                 'file_path': file_path,
                 'repository': current_repo
-            })
+            }
+            if not large:
+                # The file may have changed since it was stat'ed
+                etag = etag.replace(stat['etag'], result['etag'], 1)
+            if line_range:
+                body.update(start_line=result['start_line'], end_line=result['end_line'], eof=result['eof'])
+                if large:
+                    body.update(total_lines=result['total_lines'], truncated=result['truncated'])
+                if query:
+                    body['matches'] = result['matches'] if large else _line_matches(
+                        result['content'], result['start_line'], query)
+            return _conditional(jsonify(body), etag)
         else:
             return jsonify(result), 400
     
@@ -58,6 +289,22 @@ def get_file_content():
         return jsonify({'error': f'Failed to read file: {str(e)}'}), 500
 
 
+def _line_matches(content: str, start_line: int, query: str) -> List[Dict[str, int]]:
+    """Find the lines of a window containing a case-insensitive query."""
+    needle = query.lower()
+    matches = []
+    for line_number, line in enumerate(content.splitlines(), start_line):
+        column = line.lower().find(needle)
+        if column != -1:
+            matches.append({'line': line_number, 'column': column + 1})
+    return matches
+
+
+def _mimetype(file_path: str) -> str:
+    """Guess the content type of a raw file download."""
+    return mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+
+
 @files_bp.route('/files/save', methods=['POST'])
 def save_file():
     """Save content to a file."""
@@ -117,7 +364,6 @@ def create_file():
         repo_path = current_repo['path']
         
         # Check if file already exists
-        import os
         full_path = os.path.join(repo_path, file_path)
         if os.path.exists(full_path):
             return jsonify({'error': 'File already exists'}), 400
@@ -151,23 +397,14 @@ def delete_file():
             return jsonify({'error': 'File path is required'}), 400
         
         repo_path = current_repo['path']
-        import os
-        full_path = os.path.join(repo_path, file_path)
+        result = github_client.delete_file(repo_path, file_path)
         
-        # Security check: ensure file is within repository
-        if not os.path.abspath(full_path).startswith(os.path.abspath(repo_path)):
-            return jsonify({'error': 'File path outside repository'}), 400
-        
-        if not os.path.exists(full_path):
-            return jsonify({'error': 'File not found'}), 404
-        
-        if not os.path.isfile(full_path):
-            return jsonify({'error': 'Path is not a file'}), 400
-        
-        os.remove(full_path)
+        if not result['success']:
+            status = 404 if result['error'] == 'File not found' else 400
+            return jsonify(result), status
         
         return jsonify({
-            'message': 'File deleted successfully',
+            'message': result['message'],
             'file_path': file_path,
             'repository': current_repo
         })
@@ -176,6 +413,19 @@ def delete_file():
         return jsonify({'error': f'Failed to delete file: {str(e)}'}), 500
 
 
+def _content_candidates(repo_path: str, query: str) -> Tuple[List[str], bool]:
+    """Get the files a content search has to scan and whether the index narrowed them."""
+    # Narrow the search down to files containing every query trigram
+    candidates = content_index.candidates(repo_path, query)
+    if candidates is not None:
+        return candidates, True
+    
+    if not content_index.is_ready(repo_path):
+        github_client.index_repository(repo_path)
+    file_tree = github_client.get_file_tree(repo_path)
+    return [item['path'] for item in file_tree if item['type'] == 'file'], False
+
+
 @files_bp.route('/files/search', methods=['GET'])
 def search_files():
     """Search for files by name or content."""
@@ -192,12 +442,12 @@ def search_files():
         max_results = request.args.get('max_results', 50, type=int)
         
         repo_path = current_repo['path']
-        file_tree = github_client.get_file_tree(repo_path)
-        
         results = []
+        indexed = False
         
         if search_type == 'name':
             # Search by filename
+            file_tree = github_client.get_file_tree(repo_path)
             for item in file_tree:
                 if item['type'] == 'file' and query.lower() in item['name'].lower():
                     results.append(item)
@@ -205,25 +455,65 @@ def search_files():
                         break
         
         elif search_type == 'content':
-            # Search by file content
-            for item in file_tree:
-                if item['type'] == 'file':
-                    file_result = github_client.read_file(repo_path, item['path'])
-                    if file_result['success'] and query.lower() in file_result['content'].lower():
-                        results.append({
-                            **item,
-                            'matches': file_result['content'].lower().count(query.lower())
-                        })
-                        if len(results) >= max_results:
-                            break
+            candidates, indexed = _content_candidates(repo_path, query)
+            context_lines = request.args.get('context', 2, type=int)
+            max_lines = request.args.get('max_lines', type=int)
+            
+            # Search by file content, max_results counts matching files
+            for record in content_search.search(repo_path, query, candidates, max_results=None,
+                                                context_lines=context_lines, max_files=max_results,
+                                                max_lines_per_file=max_lines):
+                if record['type'] == 'file':
+                    results.append(record)
         
         return jsonify({
             'results': results,
             'query': query,
             'search_type': search_type,
+            'indexed': indexed,
             'total_found': len(results)
         })
     
     except Exception as e:
         return jsonify({'error': f'Failed to search files: {str(e)}'}), 500
 
+
+@files_bp.route('/files/search/stream', methods=['GET'])
+def stream_search():
+    """Stream content search matches as newline-delimited JSON while files are scanned."""
+    try:
+        current_repo = session.get('current_repo')
+        if not current_repo:
+            return jsonify({'error': 'No repository selected'}), 400
+        
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({'error': 'Search query is required'}), 400
+        
+        max_results = request.args.get('max_results', 200, type=int)
+        context_lines = request.args.get('context', 2, type=int)
+        max_lines = request.args.get('max_lines', type=int)
+        
+        repo_path = current_repo['path']
+        candidates, indexed = _content_candidates(repo_path, query)
+        records = content_search.search(repo_path, query, candidates, max_results=max_results,
+                                        context_lines=context_lines, max_lines_per_file=max_lines)
+    except Exception as e:
+        return jsonify({'error': f'Failed to search files: {str(e)}'}), 500
+    
+    def generate():
+        try:
+            for record in records:
+                if record['type'] == 'done':
+                    record['indexed'] = indexed
+                yield json.dumps(record) + '\n'
+        except Exception as e:
+            yield json.dumps({'type': 'error', 'error': f'Failed to search files: {str(e)}'}) + '\n'
+        finally:
+            records.close()
+    
+    return Response(generate(), mimetype='application/x-ndjson', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
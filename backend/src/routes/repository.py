@@ -1,7 +1,10 @@
 """Repository management API routes."""
 
-from flask import Blueprint, request, jsonify, session
+import json
+import time
+from flask import Blueprint, Response, request, jsonify, session
 from src.github_client import github_client
+from src.clone_jobs import clone_jobs, CloneQueueFull, ACTIVE_STATUSES
 
 repo_bp = Blueprint('repository', __name__)
 
@@ -20,7 +23,49 @@ def clone_repository():
         
         force = data.get('force', False)
         
-        result = github_client.clone_repository(repo_url, force=force)
+        if data.get('mode') == 'snapshot':
+            # Read-only tarball import; no git history is downloaded
+            result = github_client.import_snapshot(repo_url, ref=data.get('ref'), force=force)
+            if result['success']:
+                session['current_repo'] = {
+                    'owner': result['owner'],
+                    'repo': result['repo'],
+                    'path': result['path']
+                }
+                return jsonify(result)
+            return jsonify(result), 400
+        
+        # Shallow, partial and sparse clone options; omitted ones use config defaults
+        try:
+            options = github_client.clone_options(
+                depth=data.get('depth'),
+                filter_spec=data.get('filter'),
+                sparse_paths=data.get('sparse_paths'),
+                shared_objects=data.get('shared_objects'),
+                dissociate=data.get('dissociate')
+            )
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        if data.get('background', False):
+            # Queue the clone and let the client follow the job
+            try:
+                job = clone_jobs.submit(repo_url, force=force, options=options)
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+            except CloneQueueFull as e:
+                return jsonify({'success': False, 'error': str(e)}), 429
+            return jsonify({'success': True, 'job': job.to_dict()}), 202
+        
+        result = github_client.clone_repository(
+            repo_url,
+            force=force,
+            depth=options['depth'],
+            filter_spec=options['filter'],
+            sparse_paths=options['sparse_paths'],
+            shared_objects=options['shared_objects'],
+            dissociate=options['dissociate']
+        )
         
         if result['success']:
             # Store current repository in session
@@ -37,6 +82,69 @@ def clone_repository():
         return jsonify({'error': f'Failed to clone repository: {str(e)}'}), 500
 
 
+@repo_bp.route('/repo/clone/jobs', methods=['GET'])
+def list_clone_jobs():
+    """List background clone jobs."""
+    try:
+        return jsonify({'jobs': clone_jobs.list_jobs()})
+    
+    except Exception as e:
+        return jsonify({'error': f'Failed to list clone jobs: {str(e)}'}), 500
+
+
+@repo_bp.route('/repo/clone/jobs/<job_id>', methods=['GET'])
+def get_clone_job(job_id):
+    """Get the state of a background clone job."""
+    try:
+        job = clone_jobs.get(job_id)
+        if not job:
+            return jsonify({'error': 'Clone job not found'}), 404
+        
+        return jsonify({'job': job.to_dict()})
+    
+    except Exception as e:
+        return jsonify({'error': f'Failed to get clone job: {str(e)}'}), 500
+
+
+@repo_bp.route('/repo/clone/jobs/<job_id>/events', methods=['GET'])
+def stream_clone_job(job_id):
+    """Stream the progress of a background clone job as server-sent events."""
+    job = clone_jobs.get(job_id)
+    if not job:
+        return jsonify({'error': 'Clone job not found'}), 404
+    
+    def generate():
+        version = -1
+        last_sent = 0.0
+        while True:
+            snapshot = clone_jobs.wait_for_change(job, version, timeout=15)
+            if snapshot['version'] == version:
+                # Keep idle proxies from closing the connection
+                yield ': keep-alive\n\n'
+                continue
+            
+            if snapshot['status'] in ACTIVE_STATUSES:
+                # Progress callbacks fire per line of git output; throttle them
+                delay = last_sent + 0.25 - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                    # Send the state reached meanwhile rather than skipping it
+                    snapshot = clone_jobs.wait_for_change(job, -1, timeout=0)
+            
+            version = snapshot.pop('version')
+            if snapshot['status'] not in ACTIVE_STATUSES:
+                yield f"event: {snapshot['status']}\ndata: {json.dumps(snapshot)}\n\n"
+                return
+            
+            last_sent = time.monotonic()
+            yield f"event: progress\ndata: {json.dumps(snapshot)}\n\n"
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
 @repo_bp.route('/repo/list', methods=['GET'])
 def list_repositories():
     """List all locally cloned repositories."""
@@ -50,7 +158,12 @@ def list_repositories():
 
 @repo_bp.route('/repo/switch', methods=['POST'])
 def switch_repository():
-    """Switch to a different repository."""
+    """Switch to a different repository.
+    
+    An evicted repository is restored by a background clone job instead:
+    the response is then 202 with the job, and the switch is repeated
+    once the job succeeded.
+    """
     try:
         data = request.get_json()
         if not data:
@@ -62,18 +175,21 @@ def switch_repository():
         if not owner or not repo_name:
             return jsonify({'error': 'Owner and repo name are required'}), 400
         
-        # Find repository in local list
-        repos = github_client.list_local_repositories()
-        target_repo = None
-        
-        for repo in repos:
-            if repo['owner'] == owner and repo['repo'] == repo_name:
-                target_repo = repo
-                break
-        
+        target_repo = github_client.find_repository(owner, repo_name)
         if not target_repo:
             return jsonify({'error': 'Repository not found locally'}), 404
         
+        if target_repo['evicted']:
+            # Evicted to stay under the disk budget; restore it in the background
+            # and let the client switch again once the job has finished
+            try:
+                job = clone_jobs.rehydrate(owner, repo_name)
+            except CloneQueueFull as e:
+                return jsonify({'success': False, 'error': str(e)}), 429
+            return jsonify({'success': True, 'rehydrating': True, 'job': job.to_dict()}), 202
+        
+        github_client.touch_repository(owner, repo_name)
+        
         # Update session
         session['current_repo'] = {
             'owner': owner,
@@ -81,6 +197,9 @@ def switch_repository():
             'path': target_repo['path']
         }
         
+        # Bring search and retrieval indexes up to date in the background
+        github_client.index_repository(target_repo['path'])
+        
         return jsonify({
             'success': True,
             'message': 'Switched repository successfully',
@@ -91,6 +210,128 @@ def switch_repository():
         return jsonify({'error': f'Failed to switch repository: {str(e)}'}), 500
 
 
+@repo_bp.route('/repo/update', methods=['POST'])
+def update_repository():
+    """Fetch upstream changes into a cloned repository."""
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        owner = data.get('owner')
+        repo_name = data.get('repo')
+        
+        if owner and repo_name:
+            target_repo = github_client.find_repository(owner, repo_name)
+            if not target_repo:
+                return jsonify({'error': 'Repository not found locally'}), 404
+            if target_repo['evicted']:
+                return jsonify({'error': 'Repository was evicted, switch to it to restore it'}), 409
+            repo_path = target_repo['path']
+        else:
+            current_repo = session.get('current_repo')
+            if not current_repo:
+                return jsonify({'error': 'No repository selected'}), 400
+            repo_path = current_repo['path']
+        
+        result = github_client.update_repository(repo_path, rebase=data.get('rebase', False))
+        
+        if result['success']:
+            return jsonify(result)
+        else:
+            return jsonify(result), 400
+    
+    except Exception as e:
+        return jsonify({'error': f'Failed to update repository: {str(e)}'}), 500
+
+
+@repo_bp.route('/repo/upgrade', methods=['POST'])
+def upgrade_repository():
+    """Turn a snapshot import into a git clone in place."""
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        owner = data.get('owner')
+        repo_name = data.get('repo')
+        
+        if owner and repo_name:
+            target_repo = github_client.find_repository(owner, repo_name)
+            if not target_repo:
+                return jsonify({'error': 'Repository not found locally'}), 404
+            if target_repo['evicted']:
+                return jsonify({'error': 'Repository was evicted, switch to it to restore it'}), 409
+            repo_path = target_repo['path']
+        else:
+            current_repo = session.get('current_repo')
+            if not current_repo:
+                return jsonify({'error': 'No repository selected'}), 400
+            repo_path = current_repo['path']
+        
+        result = github_client.upgrade_snapshot(repo_path)
+        
+        if result['success']:
+            return jsonify(result)
+        else:
+            return jsonify(result), 400
+    
+    except Exception as e:
+        return jsonify({'error': f'Failed to upgrade repository: {str(e)}'}), 500
+
+
+@repo_bp.route('/repo/status', methods=['GET'])
+def get_repository_status():
+    """Get the changed files of the current repository."""
+    try:
+        current_repo = session.get('current_repo')
+        if not current_repo:
+            return jsonify({'error': 'No repository selected'}), 400
+        
+        result = github_client.get_status(current_repo['path'])
+        
+        if result['success']:
+            return jsonify(result)
+        else:
+            return jsonify(result), 400
+    
+    except Exception as e:
+        return jsonify({'error': f'Failed to get repository status: {str(e)}'}), 500
+
+
+@repo_bp.route('/repo/diff', methods=['GET'])
+def get_repository_diff():
+    """Stream the working tree diff of the current repository as NDJSON."""
+    current_repo = session.get('current_repo')
+    if not current_repo:
+        return jsonify({'error': 'No repository selected'}), 400
+    
+    base = request.args.get('base', 'HEAD')
+    paths = request.args.getlist('path')
+    if base.startswith('-'):
+        return jsonify({'error': f'Invalid base: {base}'}), 400
+    
+    try:
+        records = github_client.iter_diff(current_repo['path'], base=base, paths=paths)
+        # Start git before the response so bad refs and paths become errors
+        first = next(records, None)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Failed to diff repository: {str(e)}'}), 500
+    
+    def generate():
+        if first is None:
+            return
+        yield json.dumps(first) + '\n'
+        try:
+            for record in records:
+                yield json.dumps(record) + '\n'
+        except Exception as e:
+            yield json.dumps({'type': 'error', 'error': f'Failed to diff repository: {str(e)}'}) + '\n'
+    
+    return Response(generate(), mimetype='application/x-ndjson', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
 @repo_bp.route('/repo/current', methods=['GET'])
 def get_current_repository():
     """Get current repository information."""
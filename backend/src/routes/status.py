@@ -0,0 +1,39 @@
+"""Application status API routes."""
+
+from flask import Blueprint, jsonify
+from src.openrouter_client import openrouter_client
+from src.github_client import github_client
+from src.completion_cache import completion_cache
+from src.github_cache import github_cache
+from src.git_objects import git_objects
+from src.fs_watcher import file_watcher
+
+status_bp = Blueprint('status', __name__)
+
+
+@status_bp.route('/status/http', methods=['GET'])
+def get_http_stats():
+    """Get connection reuse counters of the external API clients."""
+    try:
+        return jsonify({
+            'openrouter': openrouter_client.connection_stats(),
+            'github': github_client.connection_stats()
+        })
+    
+    except Exception as e:
+        return jsonify({'error': f'Failed to get HTTP stats: {str(e)}'}), 500
+
+
+@status_bp.route('/status/cache', methods=['GET'])
+def get_cache_stats():
+    """Get hit/miss counters of the server-side caches."""
+    try:
+        return jsonify({
+            'completions': completion_cache.stats(),
+            'github': github_cache.stats(),
+            'git_objects': git_objects.stats(),
+            'watchers': file_watcher.stats()
+        })
+    
+    except Exception as e:
+        return jsonify({'error': f'Failed to get cache stats: {str(e)}'}), 500
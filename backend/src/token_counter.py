@@ -0,0 +1,111 @@
+"""Token counting for prompt budgeting."""
+
+import math
+import threading
+from typing import Dict, List, Optional
+from src.config import config
+
+# Approximate tokens a chat message costs beyond its content (role, separators)
+MESSAGE_OVERHEAD = 4
+
+
+class TokenCounter:
+    """Calibrated characters-per-token estimator.
+    
+    Counts start from ``chat.chars_per_token`` and are corrected per model
+    with the ``prompt_tokens`` usage OpenRouter reports for each request,
+    so estimates converge on the model's real tokenizer without shipping it.
+    """
+    
+    MIN_RATIO = 1.5
+    MAX_RATIO = 8.0
+    SMOOTHING = 0.2
+    
+    def __init__(self):
+        """Initialize token counter with configuration."""
+        self.default_ratio = config.get('chat.chars_per_token', 3.5)
+        self._ratios: Dict[str, float] = {}
+        self._lock = threading.Lock()
+    
+    def ratio(self, model: Optional[str] = None) -> float:
+        """Get the characters-per-token ratio for a model.
+        
+        Args:
+            model: Model identifier
+        
+        Returns:
+            Estimated characters per token
+        """
+        with self._lock:
+            return self._ratios.get(model, self.default_ratio)
+    
+    def count(self, text: str, model: Optional[str] = None) -> int:
+        """Estimate the number of tokens in a text.
+        
+        Args:
+            text: Text to count
+            model: Model identifier
+        
+        Returns:
+            Estimated token count
+        """
+        if not text:
+            return 0
+        return math.ceil(len(text) / self.ratio(model))
+    
+    def count_messages(self, messages: List[Dict[str, str]], model: Optional[str] = None) -> int:
+        """Estimate the prompt tokens of a message list.
+        
+        Args:
+            messages: List of message objects with 'role' and 'content'
+            model: Model identifier
+        
+        Returns:
+            Estimated token count
+        """
+        return sum(self.count(msg['content'], model) + MESSAGE_OVERHEAD for msg in messages)
+    
+    def truncate(self, text: str, max_tokens: int, model: Optional[str] = None) -> str:
+        """Cut a text down to roughly a token budget.
+        
+        Args:
+            text: Text to truncate
+            max_tokens: Token budget
+            model: Model identifier
+        
+        Returns:
+            The text itself if it fits, otherwise its head with a marker
+        """
+        if max_tokens <= 0:
+            return ''
+        if self.count(text, model) <= max_tokens:
+            return text
+        
+        marker = '\n... (truncated)'
+        keep = int(max_tokens * self.ratio(model)) - len(marker)
+        return text[:max(keep, 0)] + marker
+    
+    def calibrate(self, model: str, messages: List[Dict[str, str]], prompt_tokens: Optional[int]) -> None:
+        """Correct a model's ratio with the prompt tokens reported for a request.
+        
+        Args:
+            model: Model identifier
+            messages: Messages that were sent
+            prompt_tokens: Prompt token count reported by the API
+        """
+        if not prompt_tokens:
+            return
+        
+        content_tokens = prompt_tokens - MESSAGE_OVERHEAD * len(messages)
+        characters = sum(len(msg['content']) for msg in messages)
+        if content_tokens <= 0 or characters <= 0:
+            return
+        
+        observed = min(max(characters / content_tokens, self.MIN_RATIO), self.MAX_RATIO)
+        with self._lock:
+            current = self._ratios.get(model, self.default_ratio)
+            self._ratios[model] = current + self.SMOOTHING * (observed - current)
+
+
+# Global token counter instance
+token_counter = TokenCounter()
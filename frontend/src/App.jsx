@@ -12,6 +12,7 @@ function App() {
   const [currentFile, setCurrentFile] = useState(null);
   const [fileContent, setFileContent] = useState('');
   const [selectedText, setSelectedText] = useState('');
+  const [cursorLine, setCursorLine] = useState(null);
 
   useEffect(() => {
     // Check if there's a current repository on app load
@@ -45,6 +46,7 @@ function App() {
   const handleFileSelect = (file) => {
     setCurrentFile(file);
     setSelectedText(''); // Clear selection when switching files
+    setCursorLine(null);
   };
 
   const handleContentChange = (content) => {
@@ -59,8 +61,9 @@ function App() {
     // Refresh file explorer when needed
   };
 
-  const handleTextSelection = (text) => {
+  const handleTextSelection = (text, line) => {
     setSelectedText(text);
+    setCursorLine(line ?? null);
   };
 
   return (
@@ -132,6 +135,7 @@ function App() {
               currentFile={currentFile}
               fileContent={fileContent}
               selectedText={selectedText}
+              cursorLine={cursorLine}
             />
           </ResizablePanel>
         </ResizablePanelGroup>
@@ -5,13 +5,15 @@ import { Input } from '@/components/ui/input';
 import { Textarea } from '@/components/ui/textarea';
 import { ScrollArea } from '@/components/ui/scroll-area';
 
-const ChatInterface = ({ currentRepo, currentFile, fileContent, selectedText }) => {
+const ChatInterface = ({ currentRepo, currentFile, fileContent, selectedText, cursorLine }) => {
   const [messages, setMessages] = useState([]);
   const [inputMessage, setInputMessage] = useState('');
   const [loading, setLoading] = useState(false);
   const [chatHistory, setChatHistory] = useState([]);
   const scrollAreaRef = useRef(null);
   const inputRef = useRef(null);
+  // Paths of the current repository's tree at a tree version, kept in sync with deltas
+  const fileTreeCache = useRef({ repo: null, version: null, paths: null });
 
   useEffect(() => {
     loadChatHistory();
@@ -62,7 +64,9 @@ const ChatInterface = ({ currentRepo, currentFile, fileContent, selectedText })
         current_file: currentFile?.path,
         file_content: fileContent,
         selected_text: selectedText,
-        file_tree: currentRepo ? await getFileTree() : null
+        cursor_line: cursorLine,
+        file_tree: currentRepo ? await getFileTree() : null,
+        stream: true
       };
 
       const response = await fetch('/api/chat/message', {
@@ -75,9 +79,7 @@ const ChatInterface = ({ currentRepo, currentFile, fileContent, selectedText })
       });
 
       if (response.ok) {
-        const data = await response.json();
-        const assistantMessage = { role: 'assistant', content: data.response };
-        setMessages(prev => [...prev, assistantMessage]);
+        await readReplyStream(response);
       } else {
         const error = await response.json();
         const errorMessage = { 
@@ -98,15 +100,75 @@ const ChatInterface = ({ currentRepo, currentFile, fileContent, selectedText })
     }
   };
 
+  const readReplyStream = async (response) => {
+    // Show the assistant reply as token deltas arrive over server-sent events
+    setMessages(prev => [...prev, { role: 'assistant', content: '' }]);
+    const updateReply = (update) => {
+      setMessages(prev => {
+        const last = prev[prev.length - 1];
+        return [...prev.slice(0, -1), { ...last, content: update(last.content) }];
+      });
+    };
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+
+      buffer += decoder.decode(value, { stream: true });
+      const events = buffer.split('\n\n');
+      buffer = events.pop();
+
+      for (const rawEvent of events) {
+        let event = 'message';
+        let data = '';
+        for (const line of rawEvent.split('\n')) {
+          if (line.startsWith('event:')) event = line.slice(6).trim();
+          else if (line.startsWith('data:')) data += line.slice(5).trim();
+        }
+        if (!data) continue;
+
+        const payload = JSON.parse(data);
+        if (event === 'delta') {
+          updateReply(content => content + payload.content);
+        } else if (event === 'error') {
+          updateReply(content => `${content}${content ? '\n\n' : ''}Error: ${payload.error}`);
+        }
+      }
+    }
+  };
+
   const getFileTree = async () => {
+    const cache = fileTreeCache.current;
+    const repoPath = currentRepo?.path;
+    const cached = cache.repo === repoPath && cache.version !== null;
+
     try {
-      const response = await fetch('/api/files/tree', {
+      const url = cached ? `/api/files/tree?since=${cache.version}` : '/api/files/tree';
+      const response = await fetch(url, {
         credentials: 'include'
       });
       
       if (response.ok) {
         const data = await response.json();
-        return data.file_tree?.map(file => file.path) || [];
+        if (cached && !data.reset) {
+          data.changes.forEach(({ change, path }) => {
+            if (change === 'added') {
+              cache.paths.add(path);
+            } else if (change === 'removed') {
+              cache.paths.delete(path);
+              cache.paths.forEach(item => item.startsWith(`${path}/`) && cache.paths.delete(item));
+            }
+          });
+        } else {
+          cache.paths = new Set(data.file_tree?.map(file => file.path) || []);
+        }
+        cache.repo = repoPath;
+        cache.version = data.version ?? null;
+        return [...cache.paths];
       }
     } catch (error) {
       console.error('Error fetching file tree:', error);
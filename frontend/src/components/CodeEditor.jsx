@@ -1,8 +1,11 @@
 import React, { useState, useEffect, useRef } from 'react';
 import Editor from '@monaco-editor/react';
-import { Save, FileText, AlertCircle, CheckCircle } from 'lucide-react';
+import { Save, FileText, AlertCircle, CheckCircle, ChevronLeft, ChevronRight } from 'lucide-react';
 import { Button } from '@/components/ui/button';
 
+// Lines shown at once for files too large to open whole
+const WINDOW_LINES = 1000;
+
 const CodeEditor = ({ currentFile, onContentChange, onSave, onTextSelection }) => {
   const [content, setContent] = useState('');
   const [originalContent, setOriginalContent] = useState('');
@@ -10,7 +13,9 @@ const CodeEditor = ({ currentFile, onContentChange, onSave, onTextSelection }) =
   const [saving, setSaving] = useState(false);
   const [saveStatus, setSaveStatus] = useState(null); // 'success', 'error', null
   const [isDirty, setIsDirty] = useState(false);
+  const [largeFile, setLargeFile] = useState(null); // { start, end, total } of the shown window
   const editorRef = useRef(null);
+  const windowStartRef = useRef(1);
 
   useEffect(() => {
     if (currentFile) {
@@ -19,6 +24,7 @@ const CodeEditor = ({ currentFile, onContentChange, onSave, onTextSelection }) =
       setContent('');
       setOriginalContent('');
       setIsDirty(false);
+      setLargeFile(null);
     }
   }, [currentFile]);
 
@@ -31,6 +37,8 @@ const CodeEditor = ({ currentFile, onContentChange, onSave, onTextSelection }) =
     
     setLoading(true);
     setSaveStatus(null);
+    setLargeFile(null);
+    windowStartRef.current = 1;
     
     try {
       const response = await fetch(`/api/files/content?path=${encodeURIComponent(currentFile.path)}`, {
@@ -44,6 +52,11 @@ const CodeEditor = ({ currentFile, onContentChange, onSave, onTextSelection }) =
         setIsDirty(false);
       } else {
         const error = await response.json();
+        if (error.large) {
+          // Too large to edit, show it read-only a window at a time
+          await loadWindow(1);
+          return;
+        }
         console.error('Failed to load file:', error.error);
         setContent('// Error loading file: ' + error.error);
         setOriginalContent('');
@@ -57,8 +70,38 @@ const CodeEditor = ({ currentFile, onContentChange, onSave, onTextSelection }) =
     }
   };
 
+  const loadWindow = async (start) => {
+    const end = start + WINDOW_LINES - 1;
+    const response = await fetch(
+      `/api/files/content?path=${encodeURIComponent(currentFile.path)}&lines=${start}-${end}`,
+      { credentials: 'include' }
+    );
+    const data = await response.json();
+    if (!response.ok) {
+      throw new Error(data.error || 'Failed to load lines');
+    }
+    
+    windowStartRef.current = data.start_line;
+    setLargeFile({ start: data.start_line, end: data.end_line, total: data.total_lines });
+    setContent(data.content || '');
+    setOriginalContent(data.content || '');
+    setIsDirty(false);
+    editorRef.current?.setScrollTop(0);
+  };
+
+  const moveWindow = async (start) => {
+    setLoading(true);
+    try {
+      await loadWindow(Math.max(1, start));
+    } catch (error) {
+      console.error('Error loading lines:', error);
+    } finally {
+      setLoading(false);
+    }
+  };
+
   const saveFile = async () => {
-    if (!currentFile || !isDirty) return;
+    if (!currentFile || !isDirty || largeFile) return;
     
     setSaving(true);
     setSaveStatus(null);
@@ -115,7 +158,7 @@ const CodeEditor = ({ currentFile, onContentChange, onSave, onTextSelection }) =
       const model = editor.getModel();
       if (model && onTextSelection) {
         const selectedText = model.getValueInRange(e.selection);
-        onTextSelection(selectedText);
+        onTextSelection(selectedText, e.selection.positionLineNumber + windowStartRef.current - 1);
       }
     });
   };
@@ -179,6 +222,29 @@ const CodeEditor = ({ currentFile, onContentChange, onSave, onTextSelection }) =
         </div>
         
         <div className="flex items-center space-x-2">
+          {largeFile && (
+            <div className="flex items-center text-xs text-gray-600 dark:text-gray-400">
+              <Button
+                variant="ghost"
+                size="sm"
+                onClick={() => moveWindow(largeFile.start - WINDOW_LINES)}
+                disabled={loading || largeFile.start <= 1}
+              >
+                <ChevronLeft className="w-4 h-4" />
+              </Button>
+              <span>
+                Lines {largeFile.start}-{largeFile.end} of {largeFile.total} (read-only)
+              </span>
+              <Button
+                variant="ghost"
+                size="sm"
+                onClick={() => moveWindow(largeFile.end + 1)}
+                disabled={loading || largeFile.end >= largeFile.total}
+              >
+                <ChevronRight className="w-4 h-4" />
+              </Button>
+            </div>
+          )}
           {saveStatus === 'success' && (
             <div className="flex items-center text-green-600 text-sm">
               <CheckCircle className="w-4 h-4 mr-1" />
@@ -196,7 +262,7 @@ const CodeEditor = ({ currentFile, onContentChange, onSave, onTextSelection }) =
             variant="outline"
             size="sm"
             onClick={saveFile}
-            disabled={!currentFile || !isDirty || saving}
+            disabled={!currentFile || !isDirty || saving || !!largeFile}
           >
             <Save className={`w-4 h-4 mr-1 ${saving ? 'animate-pulse' : ''}`} />
             {saving ? 'Saving...' : 'Save'}
@@ -244,7 +310,9 @@ const CodeEditor = ({ currentFile, onContentChange, onSave, onTextSelection }) =
             options={{
               minimap: { enabled: true },
               fontSize: 14,
-              lineNumbers: 'on',
+              readOnly: !!largeFile,
+              // Number lines by their place in the file, not the window
+              lineNumbers: largeFile ? (n) => String(n + largeFile.start - 1) : 'on',
               roundedSelection: false,
               scrollBeyondLastLine: false,
               automaticLayout: true,
@@ -1,34 +1,94 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { ChevronRight, ChevronDown, File, Folder, GitBranch, RefreshCw } from 'lucide-react';
 import { Button } from '@/components/ui/button';
 
 const FileExplorer = ({ onFileSelect, currentRepo, onRefresh }) => {
-  const [fileTree, setFileTree] = useState([]);
+  // Directory path ('' for the root) -> { entries, nextCursor }
+  const [directories, setDirectories] = useState({});
   const [expandedFolders, setExpandedFolders] = useState(new Set());
+  const [loadingFolders, setLoadingFolders] = useState(new Set());
   const [loading, setLoading] = useState(false);
   const [selectedFile, setSelectedFile] = useState(null);
+  // Tree version the loaded listings are current at, for delta updates
+  const treeVersion = useRef(null);
+  // Read by the change event handler, which outlives the render that started it
+  const expandedRef = useRef(expandedFolders);
+  expandedRef.current = expandedFolders;
 
   useEffect(() => {
+    setExpandedFolders(new Set());
+    setDirectories({});
+    treeVersion.current = null;
     if (currentRepo) {
-      fetchFileTree();
+      fetchFileTree(['']);
+      // The server pushes a batch whenever files change on disk (git pull, editors, ...)
+      const events = new EventSource('/api/files/events', { withCredentials: true });
+      events.addEventListener('changes', (event) => {
+        const batch = JSON.parse(event.data);
+        if (batch.overflow) {
+          fetchFileTree();
+        } else {
+          syncFileTree();
+        }
+      });
+      return () => events.close();
     }
   }, [currentRepo]);
 
-  const fetchFileTree = async () => {
+  const fetchDirectory = async (dirPath, cursor = null) => {
+    const params = new URLSearchParams({ lazy: 'true', path: dirPath });
+    if (cursor) {
+      params.set('cursor', cursor);
+    }
+
+    const response = await fetch(`/api/files/tree?${params}`, {
+      credentials: 'include'
+    });
+    if (!response.ok) {
+      throw new Error(`Failed to list ${dirPath || 'repository root'}`);
+    }
+    return response.json();
+  };
+
+  const loadDirectory = async (dirPath, cursor = null) => {
+    setLoadingFolders(prev => new Set(prev).add(dirPath));
+    try {
+      const data = await fetchDirectory(dirPath, cursor);
+      setDirectories(prev => ({
+        ...prev,
+        [dirPath]: {
+          entries: [...(cursor ? prev[dirPath]?.entries || [] : []), ...data.entries],
+          nextCursor: data.next_cursor
+        }
+      }));
+    } catch (error) {
+      console.error('Error fetching directory:', error);
+    } finally {
+      setLoadingFolders(prev => {
+        const next = new Set(prev);
+        next.delete(dirPath);
+        return next;
+      });
+    }
+  };
+
+  // Reloads the root and every open folder, one small request each
+  const fetchFileTree = async (paths = ['', ...expandedRef.current]) => {
     if (!currentRepo) return;
     
     setLoading(true);
     try {
-      const response = await fetch('/api/files/tree', {
-        credentials: 'include'
+      const pages = await Promise.all(paths.map(path => fetchDirectory(path).catch(() => null)));
+      const loaded = {};
+      pages.forEach((data, index) => {
+        if (data) {
+          loaded[paths[index]] = { entries: data.entries, nextCursor: data.next_cursor };
+        }
       });
-      
-      if (response.ok) {
-        const data = await response.json();
-        setFileTree(data.file_tree || []);
-      } else {
-        console.error('Failed to fetch file tree');
-      }
+      setDirectories(loaded);
+      // Changes are idempotent, so syncing from the oldest page is safe
+      const versions = pages.filter(Boolean).map(data => data.version);
+      treeVersion.current = versions.length ? Math.min(...versions) : null;
     } catch (error) {
       console.error('Error fetching file tree:', error);
     } finally {
@@ -36,12 +96,96 @@ const FileExplorer = ({ onFileSelect, currentRepo, onRefresh }) => {
     }
   };
 
+  const applyTreeChanges = (dirs, changes) => {
+    const next = { ...dirs };
+    const splitPath = (path) => {
+      const slash = path.lastIndexOf('/');
+      return slash === -1 ? ['', path] : [path.slice(0, slash), path.slice(slash + 1)];
+    };
+    const updateEntry = (path, update) => {
+      const [parent, name] = splitPath(path);
+      if (next[parent]) {
+        next[parent] = {
+          ...next[parent],
+          entries: next[parent].entries.map(entry => (entry.name === name ? update(entry) : entry))
+        };
+      }
+    };
+    const countChild = (parent, delta) => {
+      if (parent) {
+        updateEntry(parent, entry => ({ ...entry, children: Math.max((entry.children || 0) + delta, 0) }));
+      }
+    };
+
+    changes.forEach(({ change, path, type, size }) => {
+      const [parent, name] = splitPath(path);
+      const listing = next[parent];
+      const exists = listing?.entries.some(entry => entry.name === name);
+
+      if (change === 'added') {
+        if (listing) {
+          const entry = { name, path, type, size, children: type === 'directory' ? 0 : null };
+          next[parent] = {
+            ...listing,
+            entries: [...listing.entries.filter(item => item.name !== name), entry]
+          };
+        }
+        if (!exists) {
+          countChild(parent, 1);
+        }
+      } else if (change === 'removed') {
+        if (listing) {
+          next[parent] = { ...listing, entries: listing.entries.filter(item => item.name !== name) };
+        }
+        Object.keys(next)
+          .filter(dir => dir === path || dir.startsWith(`${path}/`))
+          .forEach(dir => delete next[dir]);
+        if (exists || !listing) {
+          countChild(parent, -1);
+        }
+      } else if (change === 'resized') {
+        updateEntry(path, entry => ({ ...entry, size }));
+      }
+    });
+    return next;
+  };
+
+  // Catches up with changes since the loaded version, a few bytes per change
+  const syncFileTree = async () => {
+    if (treeVersion.current === null) {
+      fetchFileTree();
+      return;
+    }
+
+    try {
+      const response = await fetch(`/api/files/tree?since=${treeVersion.current}&lazy=true`, {
+        credentials: 'include'
+      });
+      if (!response.ok) return;
+
+      const data = await response.json();
+      if (data.reset) {
+        fetchFileTree();
+      } else if (data.changes.length > 0) {
+        setDirectories(prev => applyTreeChanges(prev, data.changes));
+        treeVersion.current = data.version;
+      } else {
+        treeVersion.current = data.version;
+      }
+    } catch (error) {
+      console.error('Error syncing file tree:', error);
+    }
+  };
+
   const toggleFolder = (folderPath) => {
     const newExpanded = new Set(expandedFolders);
     if (newExpanded.has(folderPath)) {
       newExpanded.delete(folderPath);
     } else {
       newExpanded.add(folderPath);
+      if (!directories[folderPath]) {
+        loadDirectory(folderPath);
+      }
     }
     setExpandedFolders(newExpanded);
   };
@@ -55,34 +199,43 @@ const FileExplorer = ({ onFileSelect, currentRepo, onRefresh }) => {
     }
   };
 
-  const buildFileTree = (files) => {
-    const tree = {};
-    
-    files.forEach(file => {
-      const parts = file.path.split('/');
-      let current = tree;
-      
-      parts.forEach((part, index) => {
-        if (!current[part]) {
-          current[part] = {
-            name: part,
-            path: parts.slice(0, index + 1).join('/'),
-            type: index === parts.length - 1 ? file.type : 'directory',
-            size: file.size,
-            children: {}
-          };
-        }
-        current = current[part].children;
-      });
-    });
-    
-    return tree;
+  const sortEntries = (entries) => [...entries].sort((a, b) => {
+    if (a.type !== b.type) {
+      return a.type === 'directory' ? -1 : 1;
+    }
+    return a.name.localeCompare(b.name);
+  });
+
+  const renderDirectory = (dirPath, depth) => {
+    const listing = directories[dirPath];
+    if (!listing) {
+      return loadingFolders.has(dirPath) ? (
+        <div className="py-1 text-xs text-gray-400" style={{ paddingLeft: `${depth * 16 + 8}px` }}>
+          Loading...
+        </div>
+      ) : null;
+    }
+
+    return (
+      <div>
+        {sortEntries(listing.entries).map(child => renderTreeNode(child, depth))}
+        {listing.nextCursor && (
+          <div
+            className="py-1 text-xs text-blue-500 cursor-pointer hover:underline"
+            style={{ paddingLeft: `${depth * 16 + 8}px` }}
+            onClick={() => loadDirectory(dirPath, listing.nextCursor)}
+          >
+            {loadingFolders.has(dirPath) ? 'Loading...' : 'Show more'}
+          </div>
+        )}
+      </div>
+    );
   };
 
   const renderTreeNode = (node, depth = 0) => {
     const isExpanded = expandedFolders.has(node.path);
     const isSelected = selectedFile === node.path;
-    const hasChildren = Object.keys(node.children).length > 0;
+    const hasChildren = node.children > 0;
 
     return (
       <div key={node.path}>
@@ -120,18 +273,7 @@ const FileExplorer = ({ onFileSelect, currentRepo, onRefresh }) => {
           )}
         </div>
         
-        {node.type === 'directory' && isExpanded && hasChildren && (
-          <div>
-            {Object.values(node.children)
-              .sort((a, b) => {
-                if (a.type !== b.type) {
-                  return a.type === 'directory' ? -1 : 1;
-                }
-                return a.name.localeCompare(b.name);
-              })
-              .map(child => renderTreeNode(child, depth + 1))}
-          </div>
-        )}
+        {node.type === 'directory' && isExpanded && hasChildren && renderDirectory(node.path, depth + 1)}
       </div>
     );
   };
@@ -144,7 +286,7 @@ const FileExplorer = ({ onFileSelect, currentRepo, onRefresh }) => {
     return parseFloat((bytes / Math.pow(k, i)).toFixed(1)) + ' ' + sizes[i];
   };
 
-  const tree = buildFileTree(fileTree);
+  const rootEntries = directories['']?.entries || [];
 
   return (
     <div className="h-full flex flex-col bg-white dark:bg-gray-900 border-r border-gray-200 dark:border-gray-700">
@@ -158,7 +300,7 @@ const FileExplorer = ({ onFileSelect, currentRepo, onRefresh }) => {
             variant="ghost"
             size="sm"
             onClick={() => {
-              fetchFileTree();
+              syncFileTree();
               onRefresh?.();
             }}
             disabled={loading}
@@ -190,21 +332,14 @@ const FileExplorer = ({ onFileSelect, currentRepo, onRefresh }) => {
             <p className="text-sm">No repository selected</p>
             <p className="text-xs mt-1">Clone a repository to start</p>
           </div>
-        ) : fileTree.length === 0 ? (
+        ) : rootEntries.length === 0 ? (
           <div className="p-4 text-center text-gray-500">
             <File className="w-8 h-8 mx-auto mb-2 opacity-50" />
             <p className="text-sm">No files found</p>
           </div>
         ) : (
           <div className="py-2">
-            {Object.values(tree)
-              .sort((a, b) => {
-                if (a.type !== b.type) {
-                  return a.type === 'directory' ? -1 : 1;
-                }
-                return a.name.localeCompare(b.name);
-              })
-              .map(node => renderTreeNode(node))}
+            {renderDirectory('', 0)}
           </div>
         )}
       </div>
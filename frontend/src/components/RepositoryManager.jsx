@@ -10,6 +10,7 @@ const RepositoryManager = ({ currentRepo, onRepoChange }) => {
   const [showCloneForm, setShowCloneForm] = useState(false);
   const [repoUrl, setRepoUrl] = useState('');
   const [cloneError, setCloneError] = useState('');
+  const [cloneProgress, setCloneProgress] = useState('');
 
   useEffect(() => {
     fetchRepositories();
@@ -35,6 +36,28 @@ const RepositoryManager = ({ currentRepo, onRepoChange }) => {
     }
   };
 
+  const waitForCloneJob = async (jobId) => {
+    // Poll the background clone job until it finishes
+    while (true) {
+      const response = await fetch(`/api/repo/clone/jobs/${jobId}`, {
+        credentials: 'include'
+      });
+      const data = await response.json();
+      if (!response.ok) {
+        throw new Error(data.error || 'Failed to get clone progress');
+      }
+
+      const job = data.job;
+      if (job.status === 'succeeded' || job.status === 'failed') {
+        return job;
+      }
+
+      const stage = job.stage ? `${job.stage} ${Math.round(job.progress)}%` : job.status;
+      setCloneProgress(stage);
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+    }
+  };
+
   const cloneRepository = async () => {
     if (!repoUrl.trim()) {
       setCloneError('Please enter a repository URL');
@@ -43,6 +66,7 @@ const RepositoryManager = ({ currentRepo, onRepoChange }) => {
 
     setCloning(true);
     setCloneError('');
+    setCloneProgress('');
 
     try {
       const response = await fetch('/api/repo/clone', {
@@ -53,24 +77,27 @@ const RepositoryManager = ({ currentRepo, onRepoChange }) => {
         credentials: 'include',
         body: JSON.stringify({
           url: repoUrl.trim(),
-          force: false
+          force: false,
+          background: true
         })
       });
 
       const data = await response.json();
 
       if (response.ok) {
+        const job = await waitForCloneJob(data.job.id);
+        if (job.status === 'failed') {
+          setCloneError(job.error || 'Failed to clone repository');
+          return;
+        }
+
         // Successfully cloned
         setRepoUrl('');
         setShowCloneForm(false);
         await fetchRepositories();
         
         // Switch to the newly cloned repository
-        onRepoChange({
-          owner: data.owner,
-          repo: data.repo,
-          path: data.path
-        });
+        await switchRepository(job.result);
       } else {
         setCloneError(data.error || 'Failed to clone repository');
       }
@@ -78,6 +105,7 @@ const RepositoryManager = ({ currentRepo, onRepoChange }) => {
       setCloneError('Error cloning repository: ' + error.message);
     } finally {
       setCloning(false);
+      setCloneProgress('');
     }
   };
 
@@ -95,7 +123,17 @@ const RepositoryManager = ({ currentRepo, onRepoChange }) => {
         })
       });
 
-      if (response.ok) {
+      if (response.status === 202) {
+        // Evicted to save disk space, wait for it to be restored and switch again
+        const data = await response.json();
+        const job = await waitForCloneJob(data.job.id);
+        setCloneProgress('');
+        if (job.status === 'failed') {
+          console.error('Failed to restore repository:', job.error);
+          return;
+        }
+        await switchRepository(repo);
+      } else if (response.ok) {
         onRepoChange({
           owner: repo.owner,
           repo: repo.repo,
@@ -153,6 +191,9 @@ const RepositoryManager = ({ currentRepo, onRepoChange }) => {
             {cloneError && (
               <p className="text-xs text-red-600">{cloneError}</p>
             )}
+            {cloneProgress && (
+              <p className="text-xs text-gray-500">{cloneProgress}</p>
+            )}
             <div className="flex space-x-2">
               <Button
                 size="sm"
@@ -222,6 +263,11 @@ const RepositoryManager = ({ currentRepo, onRepoChange }) => {
                             <span className="mr-3">
                               {repo.commit || 'unknown'}
                             </span>
+                            {repo.evicted && (
+                              <span className="mr-3 italic">
+                                evicted
+                              </span>
+                            )}
                           </div>
                         </div>
                       </div>